@@ -0,0 +1,94 @@
+"""
+Embedding throughput and parity: each LogEmbedder configuration against the original one
+(torch backend, one process, fixed EMBEDDING_BATCH_SIZE batches).
+
+    python benchmarks/bench_embedding.py              # 20,000 synthetic log lines
+    python benchmarks/bench_embedding.py --texts 5000 --processes 1,4 --backends torch,onnx
+
+Parity is the cosine similarity of every vector to the baseline's vector for the same text. Torch
+configurations should match to float rounding; int8 ONNX typically stays above 0.98.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from embedding.embedder import LogEmbedder
+
+SHORT = [
+    "Request {order} to db-1 timed out after {ms} ms",
+    "Service X restarted after OOM, heap usage {ms} MB",
+    "Calling billing API returned 500 for order {order}",
+    "Connection reset by peer while reading from redis-{a}",
+]
+LONG = (
+    "Unhandled exception in worker {a} while processing order {order}: "
+    "Traceback (most recent call last): "
+    "File \"/app/billing/service.py\", line {ms}, in charge; "
+    "File \"/app/billing/client.py\", line {b}, in post; "
+    "requests.exceptions.ReadTimeout: HTTPSConnectionPool(host='payments.internal', port=443): "
+    "Read timed out. "
+    "(read timeout={b})"
+)
+
+def synthetic_texts(n: int):
+    # Mostly one-line errors with some stack traces, like a day of error logs
+    rng = random.Random(0)
+    texts = []
+    for _ in range(n):
+        template = LONG if rng.random() < 0.15 else rng.choice(SHORT)
+        texts.append(template.format(order=rng.randint(10**6, 10**7), ms=rng.randint(1, 5000),
+                                     a=rng.randint(0, 255), b=rng.randint(0, 255)))
+    return texts
+
+def bench(name, embedder, texts, baseline=None):
+    embedder._model_encode(texts[:256])  # warm up: model load, pool start, ONNX session
+    start = time.perf_counter()
+    vectors = embedder._model_encode(texts)
+    elapsed = time.perf_counter() - start
+    line = f"{name:<36} {elapsed:>8.2f} s {len(texts) / elapsed:>10,.0f} texts/s"
+    if baseline is not None:
+        a = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        b = baseline / np.linalg.norm(baseline, axis=1, keepdims=True)
+        cosine = (a * b).sum(axis=1)
+        line += f"   cosine vs baseline min {cosine.min():.4f} mean {cosine.mean():.4f}"
+    print(line)
+    embedder.close()
+    return vectors, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark LogEmbedder backends: throughput and parity.")
+    parser.add_argument("--texts", type=int, default=20_000, help="Number of synthetic log lines")
+    parser.add_argument("--backends", default="torch,onnx",
+                        help="Comma-separated backends to compare")
+    parser.add_argument("--processes", default=f"1,{os.cpu_count() or 1}",
+                        help="Comma-separated worker process counts")
+    parser.add_argument("--batch-tokens", type=int, default=4096,
+                        help="Length-bucketed batch budget (0 = fixed batches)")
+    parser.add_argument("--model", default=None,
+                        help="Model name (default: EMBEDDING_MODEL or all-MiniLM-L6-v2)")
+    args = parser.parse_args()
+    texts = synthetic_texts(args.texts)
+    print(f"{len(texts):,} synthetic log lines, {os.cpu_count()} CPU cores\n")
+    baseline, base_time = bench("baseline (torch, 1 proc, fixed)",
+                                LogEmbedder(model_name=args.model, cache_path="", backend="torch",
+                                            processes=1, batch_tokens=0),
+                                texts)
+    for backend in args.backends.split(","):
+        for processes in sorted({int(p) for p in args.processes.split(",")}):
+            name = f"{backend}, {processes} proc, bucketed"
+            try:
+                embedder = LogEmbedder(model_name=args.model, cache_path="", backend=backend,
+                                       processes=processes, batch_tokens=args.batch_tokens)
+            except Exception as e:
+                print(f"{name:<36} skipped: {e}")
+                continue
+            _, elapsed = bench(name, embedder, texts, baseline)
+            print(f"{'':<36} speedup vs baseline: {base_time / elapsed:.2f}x")
+
+if __name__ == "__main__":
+    main()
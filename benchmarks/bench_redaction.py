@@ -0,0 +1,76 @@
+"""
+Redaction throughput: the shared single-pass Redactor vs the per-module re.sub loops it replaced.
+
+    python benchmarks/bench_redaction.py             # 1,000,000 synthetic log lines
+    python benchmarks/bench_redaction.py --lines 100000
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from redaction.redactor import Redactor
+
+TEMPLATES = [
+    "User {user}@example.com logged in from 10.0.{a}.{b}",
+    "Payment with card 4111 1111 1111 {last4} declined for order {order}",
+    "Request {order} to db-1 timed out after {ms} ms",
+    "Calling billing API with api_key={hexid} returned 500",
+    "Refreshing session token: {hexid} for tenant {a}",
+    "Service X restarted after OOM, heap usage {ms} MB",
+    "GET /v1/goals/{order} HTTP/1.1 200 {ms}ms",
+]
+
+def synthetic_lines(n: int):
+    rng = random.Random(0)
+    lines = []
+    for _ in range(n):
+        lines.append(rng.choice(TEMPLATES).format(
+            user=f"user{rng.randint(1, 9999)}", a=rng.randint(0, 255), b=rng.randint(0, 255),
+            last4=rng.randint(1000, 9999), order=rng.randint(10**6, 10**7), ms=rng.randint(1, 5000),
+            hexid="%032x" % rng.getrandbits(128)))
+    return lines
+
+def legacy_preprocessor_redact(msg):
+    for pattern, repl in [(r"[\w\.-]+@[\w\.-]+", "[REDACTED_EMAIL]"),
+                          (r"\b(?:\d[ -]*?){13,16}\b", "[REDACTED_CARD]")]:
+        msg = re.sub(pattern, repl, msg)
+    return msg
+
+def legacy_llm_redact(text):
+    import re
+    text = re.sub(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+", "[REDACTED_EMAIL]", text)
+    text = re.sub(r"(?i)api[_-]?key\s*[:=]\s*\w+", "api_key=[REDACTED]", text)
+    text = re.sub(r"(?i)token\s*[:=]\s*\w+", "token=[REDACTED]", text)
+    return text
+
+def legacy_pipeline(line):
+    # Before: LogPreprocessor.clean_log, then LLMProcessor._redact on the prompt line
+    return legacy_llm_redact(legacy_preprocessor_redact(line))
+
+def bench(name, fn, lines):
+    start = time.perf_counter()
+    for line in lines:
+        fn(line)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<34} {elapsed:>8.2f} s {len(lines) / elapsed:>12,.0f} lines/s")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark log redaction throughput.")
+    parser.add_argument("--lines", type=int, default=1_000_000,
+                        help="Number of synthetic log lines")
+    args = parser.parse_args()
+    lines = synthetic_lines(args.lines)
+    redactor = Redactor()
+    print(f"{len(lines):,} synthetic log lines, {len(redactor)} rules\n")
+    legacy = bench("legacy (5 x re.sub per line)", legacy_pipeline, lines)
+    bench("legacy preprocessor only", legacy_preprocessor_redact, lines)
+    single = bench("Redactor (1 pass per line)", redactor.redact, lines)
+    print(f"\nspeedup vs legacy pipeline: {legacy / single:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Startup cost of the entry points: per-module import time (``python -X importtime``) of ``main``
+and ``dashboard.app``, plus the wall time of ``python main.py --help``.
+
+    python benchmarks/bench_startup.py             # report, top 15 modules per entry point
+    python benchmarks/bench_startup.py --top 30 --budget-ms 1500
+
+Each measurement runs in a fresh interpreter, so nothing is already imported. Exits non-zero when
+an entry point imports one of the heavy modules (sentence_transformers, torch, transformers,
+faiss), which should only load on first use, or when its import time exceeds ``--budget-ms``.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+ENTRY_POINTS = ("main", "dashboard.app")
+HEAVY_MODULES = ("sentence_transformers", "torch", "transformers", "faiss")
+
+def import_times(module: str):
+    """
+    {top-level package: µs spent importing its modules} and the total, importing ``module`` in a
+    fresh interpreter.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, os.path.join(ROOT, "src")]))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    packages = {}
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, _, name = line[len("import time:"):].split("|")
+        # Self time summed per package, so e.g. everything numpy pulls in counts once, as numpy
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(own)
+    return packages, sum(packages.values())
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure per-module import cost of the CLI and dashboard.")
+    parser.add_argument("--top", type=int, default=15, help="Modules to list per entry point")
+    parser.add_argument("--budget-ms", type=float, default=0,
+                        help="Fail when an entry point takes longer to import (0 = no budget)")
+    args = parser.parse_args()
+    failed = False
+    for module in ENTRY_POINTS:
+        packages, total = import_times(module)
+        print(f"import {module}: {total / 1000:,.0f} ms")
+        for name, us in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"  {us / 1000:>8,.1f} ms  {name}")
+        heavy = sorted(set(packages) & set(HEAVY_MODULES))
+        if heavy:
+            print(f"  REGRESSION: imports {', '.join(heavy)} at startup")
+            failed = True
+        if args.budget_ms and total / 1000 > args.budget_ms:
+            print(f"  REGRESSION: over the {args.budget_ms:,.0f} ms budget")
+            failed = True
+        print()
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "main.py", "--help"], cwd=ROOT, capture_output=True, check=True)
+    print(f"python main.py --help: {(time.perf_counter() - start) * 1000:,.0f} ms wall")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
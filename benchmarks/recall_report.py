@@ -0,0 +1,98 @@
+"""
+Recall-vs-latency report for the FAISS index types supported by FaissVectorDB.
+
+Every configuration is measured against an exact IndexFlatL2 baseline over the same vectors:
+recall@k is the fraction of the exact top-k ids an approximate index returns.
+
+    python benchmarks/recall_report.py                  # vectors from FAISS_DB_PATH
+    python benchmarks/recall_report.py --synthetic 200000 --dim 384
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+from dotenv import load_dotenv
+load_dotenv()
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+import faiss
+from vector_db.faiss_db import FaissVectorDB
+from vector_db.index_factory import build_index, reconstruct_all, set_search_params, train_index
+
+def load_vectors(args) -> np.ndarray:
+    if args.synthetic:
+        # Clustered data is closer to real log embeddings than uniform noise
+        rng = np.random.default_rng(0)
+        centers = rng.standard_normal((max(args.synthetic // 500, 1), args.dim)).astype(np.float32)
+        labels = rng.integers(0, len(centers), args.synthetic)
+        noise = rng.standard_normal((args.synthetic, args.dim)).astype(np.float32)
+        vectors = centers[labels] + 0.3 * noise
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+    db = FaissVectorDB(db_path=args.db_path)
+    if db.index is None:
+        sys.exit(f"No FAISS index found at {db.db_path}; use --synthetic N instead.")
+    return reconstruct_all(db.index)
+
+def timed_search(index, queries: np.ndarray, k: int):
+    start = time.perf_counter()
+    _, ids = index.search(queries, k)
+    return ids, (time.perf_counter() - start) * 1000 / len(queries)
+
+def recall_at_k(ids: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(np.intersect1d(row, ref[ref >= 0])) for row, ref in zip(ids, truth))
+    return hits / max(int((truth >= 0).sum()), 1)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure recall@k and latency of FAISS index types against a flat baseline.")
+    parser.add_argument("--db-path", default=None,
+                        help="FAISS index to sample vectors from (default: FAISS_DB_PATH)")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Use N synthetic clustered vectors instead")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension of synthetic vectors")
+    parser.add_argument("--queries", type=int, default=1000, help="Number of query vectors")
+    parser.add_argument("--k", type=int, default=5, help="Neighbours per query (RAG_TOP_K)")
+    parser.add_argument("--nlist", type=int, default=None, help="IVF lists (default: ~4*sqrt(N))")
+    parser.add_argument("--pq-m", type=int, default=16, help="PQ sub-quantizers")
+    parser.add_argument("--hnsw-m", type=int, default=32, help="HNSW graph degree")
+    args = parser.parse_args()
+
+    vectors = load_vectors(args)
+    n, dim = vectors.shape
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(n, min(args.queries, n), replace=False)]
+    queries = queries + 0.01 * rng.standard_normal(queries.shape).astype(np.float32)
+    nlist = args.nlist or max(int(4 * np.sqrt(n)), 1)
+
+    flat = faiss.IndexFlatL2(dim)
+    flat.add(vectors)
+    truth, flat_ms = timed_search(flat, queries, args.k)
+
+    rows = [("flat", "-", 1.0, flat_ms, 0.0)]
+    configs = [("ivf_flat", "nprobe", [1, 4, 16, 64]),
+               ("ivf_pq", "nprobe", [1, 4, 16, 64]),
+               ("hnsw", "efSearch", [16, 32, 64, 128])]
+    for index_type, knob, values in configs:
+        index = build_index(index_type, dim, nlist, args.pq_m, args.hnsw_m)
+        start = time.perf_counter()
+        train_index(index, vectors, nlist)
+        index.add(vectors)
+        build_s = time.perf_counter() - start
+        for value in values:
+            if knob == "nprobe":
+                set_search_params(index, nprobe=value)
+            else:
+                set_search_params(index, ef_search=value)
+            ids, ms = timed_search(index, queries, args.k)
+            rows.append((index_type, f"{knob}={value}", recall_at_k(ids, truth), ms, build_s))
+
+    print(f"\n{n} vectors, dim {dim}, {len(queries)} queries, k={args.k}, nlist={nlist}\n")
+    print(f"{'index':<10} {'params':<14} {'recall@k':>9} {'ms/query':>9} {'speedup':>8} "
+          f"{'build s':>8}")
+    for index_type, params, recall, ms, build_s in rows:
+        print(f"{index_type:<10} {params:<14} {recall:>9.3f} {ms:>9.3f} {flat_ms / ms:>7.1f}x "
+              f"{build_s:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+@pytest.fixture(autouse=True)
+def local_state_paths(tmp_path, monkeypatch):
+    """Point every on-disk store at the test's tmp_path, so no run writes into the repo."""
+    monkeypatch.setenv("EMBEDDING_CACHE_PATH", str(tmp_path / "embedding_cache.sqlite"))
+    monkeypatch.setenv("RCA_CACHE_PATH", str(tmp_path / "rca_cache.faiss"))
+    monkeypatch.setenv("INGEST_WATERMARK_PATH", str(tmp_path / "ingest_watermarks.json"))
+    monkeypatch.setenv("DASHBOARD_HISTORY_DB", str(tmp_path / "rca_history.db"))
+    monkeypatch.setenv("FAISS_DB_PATH", str(tmp_path / "faiss_index.bin"))
+    monkeypatch.setenv("FAISS_SHARD_DIR", str(tmp_path / "faiss_shards"))
+
+@pytest.fixture
+def make_logs():
+    """
+    Factory for logs ``log <start>`` .. ``log <start + n - 1>`` with random ``dim``-d embeddings,
+    seeded by ``start`` so the same call always returns the same vectors, or the rows of
+    ``embeddings`` when given. Each log's timestamp is ``timestamp`` plus its number; extra keyword
+    arguments are set on every log.
+    """
+    def make(start, n, dim=8, timestamp=0, embeddings=None, **fields):
+        if embeddings is None:
+            embeddings = np.random.default_rng(start).random((n, dim))
+        return [
+            {"message": f"log {i}", "timestamp": timestamp + i,
+             "embedding": np.asarray(embedding).tolist(), **fields}
+            for i, embedding in zip(range(start, start + n), embeddings)
+        ]
+    return make
+
+@pytest.fixture
+def unit_vectors():
+    """Factory for ``n`` random unit-length float32 vectors of ``dim`` dimensions from ``rng``."""
+    def unit(rng, n, dim=8):
+        vectors = rng.standard_normal((n, dim)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return unit
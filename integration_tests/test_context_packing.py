@@ -0,0 +1,60 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from llm.context_packer import (
+    ContextPacker, estimate_tokens, truncate_message, rank_by_relevance_and_diversity,
+)
+
+def format_line(log):
+    line = (f"- {log.get('timestamp', '')} | {log.get('container_name', '')} | "
+            f"{log.get('level', '')} | {log.get('message', '')}")
+    if log.get("occurrences", 1) > 1:
+        line += (f" (x{log['occurrences']}, first {log.get('first_seen', '')}, "
+                 f"last {log.get('last_seen', '')})")
+    return line
+
+def test_prompt_stays_within_budget_and_collapses_repeats():
+    trace = "NullPointerException in handler\n" + "\n".join(
+        f"    at com.app.Frame{i}.call(Frame{i}.java:{i})" for i in range(200))
+    batch = [{"timestamp": i, "container_name": "billing", "level": "error", "message": trace}
+             for i in range(50)]
+    batch += [{"timestamp": 100 + i, "container_name": "goals", "level": "error",
+               "message": f"unique failure {i} " + "x" * 900} for i in range(50)]
+    similar = [{"timestamp": i, "container_name": "billing", "level": "error",
+                "message": f"past incident {i}", "distance": i / 10} for i in range(40)]
+    packer = ContextPacker(max_tokens=1000, max_message_chars=300, rag_share=0.3)
+    prompt, stats = packer.pack(batch, similar, format_line)
+    assert estimate_tokens(prompt) <= 1000 and stats["prompt_tokens"] <= 1000
+    # 50 identical stack traces become one line with a count, with the trace shortened to its
+    # last frames
+    assert prompt.count("NullPointerException") == 1 and "(x50, first 0, last 49)" in prompt
+    assert "197 lines omitted" in prompt and "Frame199" in prompt and "Frame100" not in prompt
+    assert "...[truncated]" in prompt
+    # RAG context keeps its share of the budget, closest hits first
+    assert "past incident 0" in prompt
+    assert prompt.index("past incident 0") < prompt.index("past incident 1")
+    assert prompt.startswith("\nGiven the following logs")
+    assert prompt.endswith("RCA and Fix Suggestion:")
+
+def test_similar_logs_ranked_by_distance_and_diversity():
+    similar = [
+        {"message": "db connection pool exhausted on primary", "distance": 0.10},
+        {"message": "db connection pool exhausted on primary", "distance": 0.11},
+        {"message": "kafka consumer lag growing on billing topic", "distance": 0.12},
+    ]
+    def ranked(diversity):
+        return [s["distance"] for s in rank_by_relevance_and_diversity(similar, diversity)]
+    assert ranked(0.0) == [0.10, 0.11, 0.12]
+    assert ranked(0.3) == [0.10, 0.12, 0.11]
+    assert truncate_message("short", 100) == "short"
+
+def test_ranking_stops_at_the_budget():
+    similar = [{"message": f"incident {i}", "distance": i / 10} for i in range(10)]
+    costs = []
+    def cost(log):
+        costs.append(log["distance"])
+        return 10
+    ranked = rank_by_relevance_and_diversity(similar, 0.0, cost, 35)
+    assert [s["distance"] for s in ranked] == [0.0, 0.1, 0.2]
+    # The pick that went over the budget is the last one costed
+    assert len(costs) == 4
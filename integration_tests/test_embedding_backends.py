@@ -0,0 +1,78 @@
+import os
+import sys
+import numpy as np
+import pytest
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import embedding.embedder as embedder_module
+from embedding.embedder import LogEmbedder, length_batches
+
+class RecordingModel:
+    """Stands in for SentenceTransformer; records each encode call's texts and batch size."""
+    calls = []
+    def __init__(self, name, **kwargs):
+        RecordingModel.kwargs = kwargs
+    def encode(self, texts, batch_size=32, show_progress_bar=False):
+        RecordingModel.calls.append((list(texts), batch_size))
+        return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+def test_length_buckets_pick_batch_sizes():
+    texts = ["oom"] * 3 + ["x" * 200] + ["disk full"] + ["y" * 4000]
+    batches = length_batches(texts, batch_tokens=4096)
+    assert batches == [([0, 1, 2, 4], 256), ([3], 64), ([5], 16)]
+
+def test_bucketed_encode_keeps_input_order(monkeypatch):
+    monkeypatch.setattr(embedder_module, "SentenceTransformer", RecordingModel)
+    RecordingModel.calls = []
+    embedder = LogEmbedder(fields_to_embed=["message"], cache_path="", batch_tokens=1024)
+    messages = ["short", "z" * 300, "tiny", "w" * 100]
+    batch = embedder.embed_logs([{"message": m} for m in messages])
+    assert batch.embeddings[:, 0].tolist() == [len(m) for m in messages]
+    assert RecordingModel.calls == [(["short", "tiny"], 64), (["w" * 100], 32), (["z" * 300], 8)]
+
+    # EMBEDDING_BATCH_TOKENS=0 keeps the fixed EMBEDDING_BATCH_SIZE batches
+    RecordingModel.calls = []
+    embedder = LogEmbedder(fields_to_embed=["message"], cache_path="", batch_tokens=0, batch_size=7)
+    embedder.embed_logs([{"message": m} for m in messages])
+    assert RecordingModel.calls == [(messages, 7)]
+
+def test_onnx_backend_loads_quantized_export(monkeypatch):
+    monkeypatch.setattr(embedder_module, "SentenceTransformer", RecordingModel)
+    monkeypatch.setenv("EMBEDDING_ONNX_FILE", "onnx/model_qint8_avx512_vnni.onnx")
+    embedder = LogEmbedder(cache_path="", backend="onnx")
+    embedder.model
+    assert RecordingModel.kwargs == {
+        "backend": "onnx", "model_kwargs": {"file_name": "onnx/model_qint8_avx512_vnni.onnx"}}
+    assert embedder.cache_model_name.endswith("#onnx:onnx/model_qint8_avx512_vnni.onnx")
+    with pytest.raises(ValueError):
+        LogEmbedder(cache_path="", backend="tensorflow")
+
+class PoolModel(RecordingModel):
+    """A sentence-transformers 5+ model: encode() takes the worker pool."""
+    def start_multi_process_pool(self, devices):
+        return {"processes": devices}
+    def stop_multi_process_pool(self, pool):
+        pass
+    def encode(self, texts, batch_size=32, show_progress_bar=False, pool=None, chunk_size=None):
+        RecordingModel.calls.append((pool, chunk_size))
+        return super().encode(texts, batch_size)
+
+class LegacyPoolModel(PoolModel):
+    """A pre-5.0 model: the pool goes through encode_multi_process()."""
+    def encode(self, texts, batch_size=32, show_progress_bar=False):
+        return RecordingModel.encode(self, texts, batch_size)
+    def encode_multi_process(self, texts, pool, batch_size=32, chunk_size=None):
+        RecordingModel.calls.append((pool, chunk_size))
+        return RecordingModel.encode(self, texts, batch_size)
+
+@pytest.mark.parametrize("model", [PoolModel, LegacyPoolModel])
+def test_large_encodes_go_through_the_worker_pool(monkeypatch, model):
+    monkeypatch.setattr(embedder_module, "SentenceTransformer", model)
+    RecordingModel.calls = []
+    embedder = LogEmbedder(cache_path="", processes=2, batch_tokens=0, batch_size=16)
+    messages = [f"log {i}" for i in range(200)]
+    batch = embedder.embed_logs([{"message": m} for m in messages])
+    assert batch.embeddings[:, 0].tolist() == [len(m) for m in messages]
+    pool_calls = [call for call in RecordingModel.calls if isinstance(call[0], dict)]
+    assert pool_calls == [({"processes": ["cpu", "cpu"]}, 25)]
+    embedder.close()
+    assert embedder._pool is None
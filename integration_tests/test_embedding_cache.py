@@ -0,0 +1,47 @@
+import os
+import sys
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+import embedding.embedder as embedder_module
+from embedding.embedder import LogEmbedder
+from embedding.embedding_cache import EmbeddingCache
+
+class CountingModel:
+    """Stands in for SentenceTransformer so cache behaviour can be checked offline."""
+    encoded = []
+    def __init__(self, name):
+        pass
+    def encode(self, texts, batch_size=32, show_progress_bar=False):
+        CountingModel.encoded.extend(texts)
+        return np.array([[len(t), t.count(" "), 1.0] for t in texts], dtype=np.float32)
+
+def test_only_cache_misses_reach_the_model(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedder_module, "SentenceTransformer", CountingModel)
+    CountingModel.encoded = []
+    cache_path = str(tmp_path / "embedding_cache.sqlite")
+    embedder = LogEmbedder(fields_to_embed=["message"], cache_path=cache_path)
+    first = embedder.embed_logs([{"message": "db timeout"}, {"message": "db timeout"},
+                                 {"message": "oom"}])
+    assert CountingModel.encoded == ["db timeout", "oom"]
+
+    embedder = LogEmbedder(fields_to_embed=["message"], cache_path=cache_path)
+    second = embedder.embed_logs([{"message": "oom"}, {"message": "disk full"}])
+    assert CountingModel.encoded == ["db timeout", "oom", "disk full"]
+    assert np.array_equal(second[0]["embedding"], first[2]["embedding"])
+    assert embedder.cache.hit_rate == 0.5
+
+    # Every text cached: the model is never loaded
+    embedder = LogEmbedder(fields_to_embed=["message"], cache_path=cache_path)
+    embedder.embed_logs([{"message": "oom"}, {"message": "db timeout"}])
+    assert embedder._model is None
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embedding_cache.sqlite"), max_entries=2)
+    keys = [EmbeddingCache.make_key("m", ["message"], text) for text in ("a", "b", "c")]
+    cache.put_many({keys[0]: np.ones(3)})
+    cache.put_many({keys[1]: np.ones(3) * 2})
+    cache.get_many([keys[0]])  # touch "a" so "b" is the LRU entry
+    cache.put_many({keys[2]: np.ones(3) * 3})
+    found = cache.get_many(keys)
+    assert set(found) == {keys[0], keys[2]}
+    assert found[keys[2]].dtype == np.float32
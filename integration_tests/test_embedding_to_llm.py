@@ -10,8 +10,10 @@ from preprocessing.preprocessor import LogPreprocessor
 def test_llm_processor_end_to_end():
     # Sample raw logs
     raw_logs = [
-        {"message": "Database connection timeout on service X", "timestamp": "2025-07-25T10:00:00Z", "container_name": "svc-db", "level": "error"},
-        {"message": "Service X restarted after OOM", "timestamp": "2025-07-25T10:05:00Z", "container_name": "svc-db", "level": "warning"}
+        {"message": "Database connection timeout on service X", "timestamp": "2025-07-25T10:00:00Z",
+         "container_name": "svc-db", "level": "error"},
+        {"message": "Service X restarted after OOM", "timestamp": "2025-07-25T10:05:00Z",
+         "container_name": "svc-db", "level": "warning"}
     ]
     # Preprocess
     preprocessor = LogPreprocessor()
@@ -4,12 +4,14 @@ import pytest
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 from preprocessing.preprocessor import LogPreprocessor
 from embedding.embedder import LogEmbedder
+from embedding.embedded_batch import EmbeddedBatch
 from vector_db.faiss_db import FaissVectorDB
 
 def test_embedding_to_vector_db():
     logs = [
         {"message": "User john.doe@email.com logged in", "timestamp": 123456, "event": "login"},
-        {"message": "Payment with card 4111 1111 1111 1111", "timestamp": 123457, "event": "payment"},
+        {"message": "Payment with card 4111 1111 1111 1111", "timestamp": 123457,
+         "event": "payment"},
         {"message": None, "timestamp": 123458, "event": "other"}
     ]
     pre = LogPreprocessor()
@@ -17,7 +19,9 @@ def test_embedding_to_vector_db():
     assert isinstance(cleaned, list)
     embedder = LogEmbedder(fields_to_embed=["message", "event"])
     logs_with_emb = embedder.embed_logs(cleaned)
-    assert isinstance(logs_with_emb, list)
+    # One (n, d) float32 matrix for the batch; indexing still yields dicts with an "embedding"
+    assert isinstance(logs_with_emb, EmbeddedBatch)
+    assert logs_with_emb.embeddings.shape == (len(cleaned), logs_with_emb.dim)
     assert all("embedding" in log for log in logs_with_emb)
     db = FaissVectorDB(dim=len(logs_with_emb[0]["embedding"]))
     db.add_logs(logs_with_emb)
@@ -0,0 +1,95 @@
+import os
+import sys
+import json
+import threading
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from history.history_store import HistoryStore
+
+def make_entry(i, service="billing", level="error", output=None):
+    return {
+        "timestamp": f"2025-07-{10 + i % 20:02d}T10:00:{i % 60:02d}",
+        "container_name": service,
+        "namespace_name": "payments",
+        "level": level,
+        "llm_output": output or f"Root cause {i}: connection pool exhausted",
+        "batch_logs": [{"timestamp": "2025-07-10T10:00:00",
+                        "message": f"db-{i} timeout after 30s"}],
+        "similar_logs": [],
+    }
+
+def test_search_filters_keyword_and_pagination(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    ids = []
+    for i in range(30):
+        service = "billing-api" if i % 2 else "goals-api"
+        ids.append(store.append(make_entry(i, service=service, level="error" if i % 3 else "warn")))
+    store.append(make_entry(30, output="Kafka consumer lag caused the outage"))
+
+    page1, has_next = store.search(service="billing", page_size=10)
+    page2, more = store.search(service="billing", page=2, page_size=10)
+    assert len(page1) == 10 and has_next and len(page2) == 6 and not more
+    assert all("billing" in e["container_name"] for e in page1 + page2)
+    stamps = [e["timestamp"] for e in page1 + page2]
+    assert stamps == sorted(stamps, reverse=True)
+    # Service and namespace filters are case-insensitive prefix matches on indexed columns
+    assert len(store.search(service="BILLING-", page_size=100)[0]) == 15
+    assert store.search(service="api")[0] == [] and store.search(service="billing%")[0] == []
+    assert len(store.search(namespace="pay", page_size=100)[0]) == 31
+
+    warn, _ = store.search(level="warn", page_size=100)
+    assert warn and all(e["level"] == "warn" for e in warn)
+
+    # Keyword search covers the RCA text and the log messages, case-insensitively
+    kafka, _ = store.search(keyword="KAFKA")
+    assert [e["llm_output"] for e in kafka] == ["Kafka consumer lag caused the outage"]
+    by_log, _ = store.search(keyword="db-7")
+    assert {e["id"] for e in by_log} == {ids[7]}
+    assert store.search(keyword='"unbalanced')[0] == []
+
+def test_feedback_updates_are_not_lost_and_json_import_keeps_ids(tmp_path):
+    legacy = [make_entry(i) for i in range(3)]
+    legacy[1]["feedback"] = {"vote": "up"}
+    json_path = tmp_path / "rca_history.json"
+    json_path.write_text(json.dumps(legacy))
+    store = HistoryStore(str(tmp_path / "history.db"))
+    assert store.import_json(str(json_path)) == 3
+    assert store.import_json(str(json_path)) == 0
+    assert store.get(1)["feedback"] == {"vote": "up"}
+    assert store.append(make_entry(3)) == 3
+
+    def vote(i):
+        HistoryStore(store.path).update_feedback(i % 3, vote="down", comment=f"comment {i}")
+    threads = [threading.Thread(target=vote, args=(i,)) for i in range(12)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for i in range(3):
+        assert store.get(i)["feedback"]["vote"] == "down"
+    assert store.get(0)["batch_logs"] == legacy[0]["batch_logs"]
+    assert not store.update_feedback(99, vote="up")
+
+def test_metrics_rollups_are_maintained_on_append(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    for i in range(6):
+        store.append({"timestamp": f"2025-07-2{i % 3}T1{i % 2}:15:00",
+                      "container_name": "billing-api" if i % 2 else "goals-api",
+                      "namespace_name": "payments", "level": "error", "llm_output": "rca"})
+    # Epoch-ms timestamps from New Relic land in the same buckets as ISO ones
+    store.append({"timestamp": 1753441200000, "container_name": "goals-api", "level": "warn"})
+
+    daily = store.metrics()
+    assert daily["timeline"] == [("2025-07-20", 2), ("2025-07-21", 2), ("2025-07-22", 2),
+                                 ("2025-07-25", 1)]
+    assert daily["container_name"] == [("goals-api", 4), ("billing-api", 3)]
+    assert dict(daily["namespace_name"]) == {"payments": 6, "unknown": 1}
+
+    ranged = store.metrics(since="2025-07-21", until="2025-07-22")
+    assert [b for b, _ in ranged["timeline"]] == ["2025-07-21", "2025-07-22"]
+    assert sum(c for _, c in ranged["level"]) == 4
+    hourly = store.metrics(since="2025-07-21", until="2025-07-21", granularity="hour")
+    assert hourly["timeline"] == [("2025-07-21T10", 1), ("2025-07-21T11", 1)]
+
+    # Rollups rebuilt from scratch agree with the incrementally maintained ones
+    store.rebuild_rollups()
+    assert store.metrics() == daily
@@ -0,0 +1,42 @@
+import os
+import sys
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from embedding.embedded_batch import EmbeddedBatch
+from clustering.incident_clusterer import IncidentClusterer, connected_components
+
+DIM = 32
+
+def make_incidents(sizes, seed=0):
+    """Logs from len(sizes) unrelated incidents, interleaved as if fetched in time order."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((len(sizes), DIM))
+    labels = np.concatenate([np.full(size, i) for i, size in enumerate(sizes)])
+    rng.shuffle(labels)
+    embeddings = centers[labels] + 0.05 * rng.standard_normal((len(labels), DIM))
+    logs = [{"message": f"incident {label} log {i}", "timestamp": i}
+            for i, label in enumerate(labels)]
+    return EmbeddedBatch(logs, embeddings.astype(np.float32)), labels
+
+def test_interleaved_logs_are_grouped_into_incidents():
+    batch, labels = make_incidents([40, 25, 3, 1])
+    incidents = IncidentClusterer(similarity=0.8).cluster(batch, sample_size=5)
+    assert len(incidents) == 4
+    assert sorted(i.size for i in incidents) == [1, 3, 25, 40]
+    for incident in incidents:
+        members = {int(log["message"].split()[1]) for log in incident.members.logs}
+        assert len(members) == 1
+        assert len(incident.sample) == min(incident.size, 5)
+        sampled = {log["message"] for log in incident.sample.logs}
+        assert sampled <= {log["message"] for log in incident.members.logs}
+    # Ordered by each incident's first log in fetch order
+    firsts = [incident.members.logs[0]["timestamp"] for incident in incidents]
+    assert firsts == sorted(firsts) and firsts[0] == 0
+
+def test_connected_components_follows_long_chains():
+    n = 1000
+    src = np.arange(n - 1)
+    labels = connected_components(n, src, src + 1)
+    assert (labels == 0).all()
+    labels = connected_components(6, np.array([0, 2, 4]), np.array([1, 3, 5]))
+    assert labels.tolist() == [0, 0, 2, 2, 4, 4]
@@ -16,6 +16,7 @@ def test_ingestion_to_preprocessing():
     # Optionally, check that cleaned logs are a subset or equal in length
     assert len(cleaned) <= len(logs)
     # Optionally, print for debug
-    print(f"Fetched {len(logs)} logs from New Relic. After preprocessing: {len(cleaned)} logs remain.")
+    print(f"Fetched {len(logs)} logs from New Relic. "
+          f"After preprocessing: {len(cleaned)} logs remain.")
     for log in cleaned[:3]:
         print(log)
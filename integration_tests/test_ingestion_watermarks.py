@@ -0,0 +1,47 @@
+import os
+import sys
+import datetime
+from types import SimpleNamespace
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from ingestion.watermark_store import WatermarkStore
+from utils.timestamps import newest_timestamp_ms, to_epoch_ms
+
+QUERY = "SELECT `message` FROM Log WHERE `level` = 'error' SINCE 24 hours ago LIMIT 1000"
+
+def test_watermark_is_persisted_per_account_and_query(tmp_path):
+    path = str(tmp_path / "ingest_watermarks.json")
+    store = WatermarkStore(path)
+    assert store.get("1", QUERY) is None
+    store.set("1", QUERY, 1700000000000)
+    store.set("1", QUERY, 1600000000000)  # never moves backwards
+
+    reopened = WatermarkStore(path)
+    # Only filters identify the query; the time window and limit may change between runs
+    rewindowed = QUERY.replace("24 hours ago LIMIT 1000", "1 hour ago LIMIT 5000")
+    assert reopened.get("1", rewindowed) == 1700000000000
+    assert reopened.get("2", QUERY) is None
+    assert reopened.get("1", QUERY.replace("error", "warn")) is None
+
+def test_newest_timestamp_accepts_epoch_and_iso():
+    logs = [{"timestamp": 1700000000000}, {"timestamp": "2023-11-14T22:13:21Z"},
+            {"message": "no ts"}]
+    assert to_epoch_ms("2023-11-14T22:13:21Z") == 1700000001000
+    assert newest_timestamp_ms(logs) == 1700000001000
+    assert newest_timestamp_ms([{}]) is None
+
+def test_incremental_run_resumes_before_the_watermark(tmp_path, monkeypatch):
+    import main
+    monkeypatch.setenv("INGEST_WATERMARK_OVERLAP", "60")
+    watermarks = WatermarkStore(str(tmp_path / "ingest_watermarks.json"))
+    mark = int(datetime.datetime.now(datetime.timezone.utc).timestamp() * 1000) - 600_000
+    watermarks.set("1", QUERY, mark)
+    requested = []
+    def fetch_logs_windowed(since, until):
+        requested.append(since)
+        return iter([])
+    fetcher = SimpleNamespace(account_id="1", nrql_query=QUERY, time_window="24 hours ago",
+                              fetch_logs_windowed=fetch_logs_windowed)
+    main.run_pipeline(None, None, context=SimpleNamespace(fetcher=fetcher, watermarks=watermarks))
+    # Logs ingested late with timestamps just before the watermark are fetched again
+    assert to_epoch_ms(requested[0].isoformat()) == mark - 60_000
@@ -0,0 +1,114 @@
+import os
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pytest
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from vector_db.faiss_db import FaissVectorDB
+from embedding.embedded_batch import EmbeddedBatch
+import llm.llm_processor as llm_processor_module
+from llm.llm_processor import LLMProcessor
+from llm.rca_cache import RCACache
+
+class SlowOllama(BaseHTTPRequestHandler):
+    """
+    Non-streaming /api/generate that takes a while, fails each prompt's first attempt, and tracks
+    concurrency.
+    """
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+    seen = set()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        cls = SlowOllama
+        with cls.lock:
+            first_attempt = body["prompt"] not in cls.seen
+            cls.seen.add(body["prompt"])
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+        time.sleep(0.1)
+        with cls.lock:
+            cls.active -= 1
+        if first_attempt:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        # Echo the batch's first log line so the test can check results come back in order
+        first_log = body["prompt"].split("Current Logs:\n")[1].splitlines()[0]
+        payload = json.dumps({"response": f"RCA for {first_log}", "done": True}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def slow_ollama(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowOllama)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("OLLAMA_URL", f"http://127.0.0.1:{server.server_port}/api/generate")
+    monkeypatch.setenv("OLLAMA_STREAM", "false")
+    monkeypatch.setenv("OLLAMA_RETRY_BACKOFF", "0.01")
+    monkeypatch.setenv("RCA_CACHE_PATH", "")
+    SlowOllama.active, SlowOllama.peak, SlowOllama.seen = 0, 0, set()
+    yield server
+    server.shutdown()
+
+def test_all_batches_processed_concurrently_and_in_order(slow_ollama, tmp_path):
+    rng = np.random.default_rng(0)
+    logs = [{"message": f"error {i}", "timestamp": i, "container_name": "billing", "level": "error"}
+            for i in range(40)]
+    batch = EmbeddedBatch(logs, rng.random((40, 8), dtype=np.float32))
+    db = FaissVectorDB(db_path=str(tmp_path / "faiss_index.bin"))
+    db.add_logs(batch)
+    processor = LLMProcessor(slack_enabled=False, db=db)
+
+    start = time.perf_counter()
+    results = list(processor.process_batches(batch, batch_size=5, concurrency=4))
+    elapsed = time.perf_counter() - start
+
+    assert len(results) == 8
+    for number, (chunk, result) in enumerate(results):
+        assert chunk.logs == logs[number * 5:(number + 1) * 5]
+        # Every batch's first attempt failed with a 503 and was retried
+        assert result["llm_output"].startswith("RCA for ")
+        assert f"| error {number * 5}" in result["llm_output"]
+        assert result["similar_logs"]
+    assert 2 <= SlowOllama.peak <= 4
+    # 16 requests of 0.1s each: sequential would take >= 1.6s
+    assert elapsed < 1.2
+
+def test_workers_share_one_lazily_built_rca_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("RCA_CACHE_PATH", str(tmp_path / "rca_cache.faiss"))
+    built = []
+    class SlowRCACache(RCACache):
+        def __init__(self, *args, **kwargs):
+            time.sleep(0.01)  # widen the window in which workers race to build the cache
+            built.append(self)
+            super().__init__(*args, history=None, **kwargs)
+    monkeypatch.setattr(llm_processor_module, "RCACache", SlowRCACache)
+    rng = np.random.default_rng(0)
+    logs = [{"message": f"error {i}", "timestamp": i, "container_name": "billing"}
+            for i in range(16)]
+    batch = EmbeddedBatch(logs, rng.random((16, 8), dtype=np.float32))
+    db = FaissVectorDB(db_path=str(tmp_path / "faiss_index.bin"))
+    db.add_logs(batch)
+    processor = LLMProcessor(slack_enabled=False, db=db)
+    processor.call_ollama = lambda prompt, max_retries=3, on_token=None: "RCA"
+
+    results = list(processor.process_batches(batch, batch_size=2, concurrency=4))
+    assert len(results) == 8 and len(built) == 1
+    ids = [result["rca_cache_id"] for _, result in results]
+    assert sorted(ids) == list(range(8))
+    assert set(RCACache(str(tmp_path / "rca_cache.faiss")).entries) == set(ids)
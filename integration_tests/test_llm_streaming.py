@@ -0,0 +1,95 @@
+import os
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from llm.llm_processor import LLMProcessor
+from history.history_store import HistoryStore
+
+TOKENS = ["Root", " cause", ":", " connection", " pool", " exhausted", "."]
+
+class FakeOllama(BaseHTTPRequestHandler):
+    """
+    Speaks Ollama's /api/generate protocol: chunked NDJSON when streaming, one JSON object
+    otherwise.
+    """
+    protocol_version = "HTTP/1.1"
+    requests = []
+
+    def write_chunk(self, obj):
+        data = (json.dumps(obj) + "\n").encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        FakeOllama.requests.append(body)
+        self.send_response(200)
+        self.send_header("Content-Type",
+                         "application/x-ndjson" if body["stream"] else "application/json")
+        if not body["stream"]:
+            payload = json.dumps({"response": "".join(TOKENS), "done": True,
+                                  "eval_count": len(TOKENS)}).encode()
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for token in TOKENS:
+            self.write_chunk({"response": token, "done": False})
+            time.sleep(0.02)
+        self.write_chunk({"response": "", "done": True, "eval_count": len(TOKENS),
+                          "eval_duration": 140_000_000})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def fake_ollama(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOllama)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("OLLAMA_URL", f"http://127.0.0.1:{server.server_port}/api/generate")
+    FakeOllama.requests = []
+    yield server
+    server.shutdown()
+
+def test_stream_yields_tokens_and_records_stats(fake_ollama):
+    processor = LLMProcessor(slack_enabled=False)
+    received = []
+    output = processor.call_ollama("prompt", on_token=received.append)
+    assert received == TOKENS and output == "".join(TOKENS)
+    assert FakeOllama.requests[-1]["stream"] is True
+    stats = processor.last_llm_stats
+    assert stats["tokens"] == len(TOKENS) and stats["tokens_per_sec"] == 50.0
+    assert 0 < stats["time_to_first_token_s"] < stats["total_s"]
+
+    processor.stream = False
+    assert processor.call_ollama("prompt") == "".join(TOKENS)
+    assert FakeOllama.requests[-1]["stream"] is False
+
+def test_dashboard_streams_rca_over_sse(fake_ollama, tmp_path, monkeypatch):
+    from dashboard import app as dashboard
+    store = HistoryStore(str(tmp_path / "history.db"))
+    monkeypatch.setattr(dashboard, "_history_store", store)
+    idx = store.append({"timestamp": "2025-07-25T10:00:00", "container_name": "billing",
+                        "level": "error", "llm_output": "old",
+                        "batch_logs": [{"message": "db timeout"}]})
+    response = dashboard.app.test_client().get(f"/rca/{idx}/stream")
+    assert response.mimetype == "text/event-stream"
+    blocks = response.get_data(as_text=True).strip().split("\n\n")
+    events = [block.split("\n", 1) for block in blocks]
+    names = [name.removeprefix("event: ") for name, _ in events]
+    data = [json.loads(payload.removeprefix("data: ")) for _, payload in events]
+    assert names == ["token"] * len(TOKENS) + ["done"]
+    assert "".join(d["text"] for d in data[:-1]) == "".join(TOKENS)
+    assert "db timeout" in FakeOllama.requests[-1]["prompt"]
+    saved = store.get(idx)
+    assert saved["llm_output"] == "".join(TOKENS) and saved["llm_stats"]["tokens"] == len(TOKENS)
+    assert store.search(keyword="exhausted")[0][0]["id"] == idx
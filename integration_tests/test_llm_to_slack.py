@@ -22,8 +22,10 @@ def test_llm_to_slack():
 
     # Sample raw logs
     raw_logs = [
-        {"message": "Service Y crashed due to OOM", "timestamp": "2025-07-25T12:00:00Z", "container_name": "svc-oom", "level": "error"},
-        {"message": "Restarted service Y after OOM", "timestamp": "2025-07-25T12:05:00Z", "container_name": "svc-oom", "level": "info"}
+        {"message": "Service Y crashed due to OOM", "timestamp": "2025-07-25T12:00:00Z",
+         "container_name": "svc-oom", "level": "error"},
+        {"message": "Restarted service Y after OOM", "timestamp": "2025-07-25T12:05:00Z",
+         "container_name": "svc-oom", "level": "info"}
     ]
     # Preprocess
     preprocessor = LogPreprocessor()
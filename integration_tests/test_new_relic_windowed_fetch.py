@@ -0,0 +1,68 @@
+import os
+import re
+import sys
+import json
+import datetime
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from ingestion.new_relic_fetcher import NewRelicLogFetcher, parse_time_window
+
+START = datetime.datetime(2025, 7, 25, 10, 0, 0, tzinfo=datetime.timezone.utc)
+START_MS = int(START.timestamp() * 1000)
+# 2500 logs spread over the hour plus a 2000-log storm inside a single minute
+LOGS = [{"timestamp": START_MS + i * 1440, "message": f"background {i}", "level": "error"}
+        for i in range(2500)]
+LOGS += [{"timestamp": START_MS + 600000 + i * 30, "message": f"storm {i}", "level": "error"}
+         for i in range(2000)]
+
+class StubNewRelic(BaseHTTPRequestHandler):
+    """Answers NerdGraph NRQL queries with the same response shape as api.newrelic.com/graphql."""
+    queries = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        m = re.search(r"SINCE (\d+) UNTIL (\d+) LIMIT (\d+)", body["query"])
+        since, until, limit = (int(g) for g in m.groups())
+        StubNewRelic.queries.append((since, until))
+        results = [log for log in LOGS if since <= log["timestamp"] < until][:limit]
+        payload = json.dumps(
+            {"data": {"actor": {"account": {"nrql": {"results": results}}}}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub_server(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubNewRelic)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("NEW_RELIC_API_KEY", "test-key")
+    monkeypatch.setenv("NEW_RELIC_ACCOUNT_ID", "1")
+    monkeypatch.setenv("NEW_RELIC_GRAPHQL_URL", f"http://127.0.0.1:{server.server_port}/graphql")
+    monkeypatch.setenv("NR_FETCH_WINDOW_MINUTES", "15")
+    monkeypatch.setenv("NR_FETCH_WORKERS", "4")
+    StubNewRelic.queries = []
+    yield server
+    server.shutdown()
+
+def test_windowed_fetch_splits_windows_that_hit_the_limit(stub_server):
+    fetcher = NewRelicLogFetcher()
+    pages = list(fetcher.fetch_logs_windowed(START, START + datetime.timedelta(hours=1),
+                                             limit=1000))
+    logs = [log for page in pages for log in page]
+    assert len(logs) == len(LOGS)
+    assert len({log["message"] for log in logs}) == len(LOGS)
+    # The storm window was split adaptively instead of being truncated at 1000 rows
+    assert len(StubNewRelic.queries) > 4
+
+def test_parse_time_window():
+    assert parse_time_window("24 hours ago") == datetime.timedelta(hours=24)
+    assert parse_time_window("30 minutes ago") == datetime.timedelta(minutes=30)
+    assert parse_time_window("1 day ago") == datetime.timedelta(days=1)
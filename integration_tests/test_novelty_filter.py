@@ -0,0 +1,69 @@
+import os
+import sys
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from embedding.embedded_batch import EmbeddedBatch
+from vector_db.faiss_db import FaissVectorDB
+from history.history_store import HistoryStore
+from clustering.novelty_filter import NoveltyFilter
+
+DIM = 16
+
+def test_novelty_scores_are_nearest_neighbour_distances(tmp_path, unit_vectors):
+    rng = np.random.default_rng(0)
+    db = FaissVectorDB(dim=DIM, db_path=str(tmp_path / "faiss_index.bin"))
+    known = unit_vectors(rng, 20, dim=DIM)
+    assert np.isinf(db.novelty_scores(known)).all()
+    db.add_logs(EmbeddedBatch([{"message": f"known {i}"} for i in range(20)], known))
+    queries = np.vstack([known[:3] + 0.01, unit_vectors(rng, 2, dim=DIM)])
+    scores = db.novelty_scores(queries)
+    assert scores.shape == (5,)
+    assert (scores[:3] < 0.01).all() and (scores[3:] > 0.3).all()
+    db.close()
+
+def test_only_novel_and_newly_rising_patterns_are_selected(tmp_path):
+    history = HistoryStore(str(tmp_path / "history.db"))
+    # A steady pattern: about 2 per day over the last week
+    history.bump_patterns({("Timeout calling <*>", "billing", f"2026-10-0{d}"): 2
+                           for d in range(1, 8)})
+    novelty = NoveltyFilter(threshold=0.15, rising_factor=3.0, rising_min=10, baseline_days=7,
+                            history=history)
+    day = "2026-10-08T12:00:00"
+    logs = [
+        {"message": "Timeout calling payments", "template": "Timeout calling <*>",
+         "container_name": "billing", "timestamp": day, "occurrences": 4},
+        {"message": "cache warmed", "container_name": "goals", "timestamp": day, "occurrences": 50},
+        {"message": "brand new segfault", "container_name": "goals", "timestamp": day},
+    ]
+    batch = EmbeddedBatch(logs, np.zeros((3, DIM), dtype=np.float32))
+    scores = np.array([0.01, 0.02, 0.9], dtype=np.float32)
+
+    selected, stats = novelty.select(batch, scores)
+    # 4 timeouts stay under the bar; 50 "cache warmed" cross it on their first day seen
+    assert selected == [1, 2]
+    assert stats == {"novel": 1, "rising": 1, "known": 1}
+
+    # The next poll: timeouts surge past 3x their baseline, while "cache warmed" was already
+    # reported today
+    logs[0]["occurrences"] = 20
+    selected, stats = novelty.select(batch, scores)
+    assert selected == [0, 2] and stats == {"novel": 1, "rising": 1, "known": 1}
+    trends = history.pattern_trends([("Timeout calling <*>", "billing")], "2026-10-08", 7)
+    assert trends[("Timeout calling <*>", "billing")] == (24, 2.0)
+
+def test_pattern_trends_for_many_keys(tmp_path):
+    history = HistoryStore(str(tmp_path / "history.db"))
+    # More keys than one query chunk; pattern i logged i times today and once a day before
+    counts = {}
+    for i in range(600):
+        counts[(f"pattern {i}", "billing", "2026-10-08")] = i
+        for d in range(1, 8):
+            counts[(f"pattern {i}", "billing", f"2026-10-0{d}")] = 1
+    counts[("pattern 1", "billing", "2026-09-30")] = 50  # outside the baseline window
+    history.bump_patterns(counts)
+    keys = [(f"pattern {i}", "billing") for i in range(600)] + [("never seen", "billing")]
+    trends = history.pattern_trends(keys, "2026-10-08", 7)
+    assert len(trends) == 601
+    assert all(trends[(f"pattern {i}", "billing")] == (i, 1.0) for i in range(600))
+    assert trends[("never seen", "billing")] == (0, 0.0)
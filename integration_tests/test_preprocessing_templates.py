@@ -0,0 +1,31 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from preprocessing.preprocessor import LogPreprocessor
+from preprocessing.template_miner import TemplateMiner
+
+def test_variable_tokens_collapse_into_one_template():
+    raw_logs = [
+        {"message": f"Request {rid} to db-1 timed out after {ms} ms", "timestamp": ts,
+         "container_name": "svc-db", "level": "error"}
+        for rid, ms, ts in [("a1b2c3d4e5f6a7b8", 3000, 1700000000300),
+                            ("ffee00112233aabb", 150, 1700000000100),
+                            ("0123456789abcdef", 42, 1700000000200)]
+    ] + [{"message": "Service X restarted after OOM", "timestamp": 1700000000400,
+          "container_name": "svc-db", "level": "warning"}]
+    cleaned = LogPreprocessor(mine_templates=True).preprocess_logs(raw_logs)
+    assert len(cleaned) == 2
+    timeout = cleaned[0]
+    assert timeout["template"] == "Request <*> to db-<*> timed out after <*> ms"
+    assert timeout["occurrences"] == 3
+    assert (timeout["first_seen"], timeout["last_seen"]) == ("1700000000100", "1700000000300")
+    assert cleaned[1]["occurrences"] == 1
+
+def test_template_miner_keeps_distinct_messages_apart():
+    miner = TemplateMiner()
+    a = miner.add_message("User 42 logged in from 10.0.0.1:443")
+    b = miner.add_message("User 7 logged in from 10.0.0.2:80")
+    c = miner.add_message("Payment failed for order 9f1b2c3d-1111-2222-3333-444455556666")
+    assert a is b
+    assert a.template == "User <*> logged in from <*>"
+    assert c is not a
@@ -4,11 +4,13 @@ import pytest
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 from preprocessing.preprocessor import LogPreprocessor
 from embedding.embedder import LogEmbedder
+from embedding.embedded_batch import EmbeddedBatch
 
 def test_preprocessing_to_embedding():
     logs = [
         {"message": "User john.doe@email.com logged in", "timestamp": 123456, "event": "login"},
-        {"message": "Payment with card 4111 1111 1111 1111", "timestamp": 123457, "event": "payment"},
+        {"message": "Payment with card 4111 1111 1111 1111", "timestamp": 123457,
+         "event": "payment"},
         {"message": None, "timestamp": 123458, "event": "other"}
     ]
     pre = LogPreprocessor()
@@ -16,9 +18,12 @@ def test_preprocessing_to_embedding():
     assert isinstance(cleaned, list)
     embedder = LogEmbedder(fields_to_embed=["message", "event"])
     logs_with_emb = embedder.embed_logs(cleaned)
-    assert isinstance(logs_with_emb, list)
+    # One (n, d) float32 matrix for the batch; indexing still yields dicts with an "embedding"
+    assert isinstance(logs_with_emb, EmbeddedBatch)
+    assert logs_with_emb.embeddings.shape == (len(cleaned), logs_with_emb.dim)
     assert all("embedding" in log for log in logs_with_emb)
-    print(f"After preprocessing: {len(cleaned)} logs remain. After embedding: {len(logs_with_emb)} logs with embeddings.")
+    print(f"After preprocessing: {len(cleaned)} logs remain. "
+          f"After embedding: {len(logs_with_emb)} logs with embeddings.")
     for log in logs_with_emb[:3]:
         print({k: v for k, v in log.items() if k != 'embedding'})
         print(f"Embedding (first 5 dims): {log['embedding'][:5]}")
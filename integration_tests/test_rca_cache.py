@@ -0,0 +1,75 @@
+import os
+import sys
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from vector_db.faiss_db import FaissVectorDB
+from embedding.embedded_batch import EmbeddedBatch
+from history.history_store import HistoryStore
+from llm.llm_processor import LLMProcessor
+from llm.rca_cache import RCACache
+
+DIM = 16
+
+def make_processor(tmp_path, make_logs, **cache_args):
+    db = FaissVectorDB(db_path=str(tmp_path / "faiss_index.bin"))
+    db.add_logs(make_logs(0, 4, dim=DIM, container_name="billing", level="error"))
+    history = HistoryStore(str(tmp_path / "history.db"))
+    cache = RCACache(str(tmp_path / "rca_cache.faiss"), history=history, **cache_args)
+    processor = LLMProcessor(slack_enabled=False, db=db, rca_cache=cache)
+    calls = []
+    def fake_llm(prompt, max_retries=3, on_token=None):
+        calls.append(prompt)
+        return f"RCA #{len(calls)}"
+    processor.call_ollama = fake_llm
+    return processor, history, calls
+
+def test_near_identical_batches_reuse_the_cached_rca(tmp_path, make_logs, unit_vectors):
+    processor, history, calls = make_processor(tmp_path, make_logs, max_distance=0.05)
+    rng = np.random.default_rng(0)
+    incident = unit_vectors(rng, 4, dim=DIM)
+    def batch(embeddings):
+        return EmbeddedBatch.from_logs(make_logs(0, 4, embeddings=embeddings,
+                                                 container_name="billing", level="error"))
+    first = processor.process_batch(batch(incident))
+    assert first["llm_output"] == "RCA #1" and first["rca_cache_id"] is not None
+    history_id = history.append({"llm_output": first["llm_output"]})
+    processor.rca_cache.attach_history(first["rca_cache_id"], history_id)
+
+    sidecar = os.stat(processor.rca_cache.meta_path).st_mtime_ns
+    repeat = processor.process_batch(batch(incident + 0.01 * unit_vectors(rng, 4, dim=DIM)))
+    assert repeat["llm_output"] == "RCA #1" and repeat["llm_stats"]["rca_cache_hit"]
+    # Lookups only update in-memory counters; the sidecar is rewritten by the next put
+    assert os.stat(processor.rca_cache.meta_path).st_mtime_ns == sidecar
+    assert repeat["similar_logs"] == first["similar_logs"]
+    different = processor.process_batch(batch(unit_vectors(rng, 4, dim=DIM)))
+    assert different["llm_output"] == "RCA #2"
+    assert len(calls) == 2
+
+    # Persisted: a fresh cache instance sees the same entries and counters
+    reopened = RCACache(processor.rca_cache.path, history=history, max_distance=0.05)
+    assert len(reopened.entries) == 2 and reopened.stats["hits"] == 1
+
+    # A downvote in the dashboard stops the answer from being reused
+    history.update_feedback(history_id, vote="down")
+    again = processor.process_batch(batch(incident + 0.01 * unit_vectors(rng, 4, dim=DIM)))
+    assert again["llm_output"] == "RCA #3"
+
+def test_entries_expire_by_ttl_and_capacity(tmp_path, make_logs, unit_vectors):
+    processor, _, calls = make_processor(tmp_path, make_logs, max_entries=2)
+    rng = np.random.default_rng(0)
+    batches = [EmbeddedBatch.from_logs(make_logs(0, 4, embeddings=unit_vectors(rng, 4, dim=DIM)))
+               for _ in range(3)]
+    for batch in batches:
+        processor.process_batch(batch)
+    cache = processor.rca_cache
+    assert len(cache.entries) == 2 and cache.index.ntotal == 2
+    # The least recently used entry (the first) was evicted; the third is still served from the
+    # cache
+    assert processor.process_batch(batches[2])["llm_output"] == "RCA #3"
+    assert processor.process_batch(batches[0])["llm_output"] == "RCA #4"
+
+    cache.ttl = 0
+    processor.process_batch(batches[2])
+    assert len(calls) == 5
+    assert cache.hit_rate == 1 / 6
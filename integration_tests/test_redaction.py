@@ -0,0 +1,44 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from redaction.redactor import Redactor
+from preprocessing.preprocessor import LogPreprocessor
+from history.history_store import HistoryStore
+
+def test_single_pass_redacts_every_default_rule():
+    redactor = Redactor()
+    text = ("User john.doe@email.com paid with 4111 1111 1111 1111 "
+            "using API_KEY: abc123 and token=xyz")
+    assert redactor.redact(text) == (
+        "User [REDACTED_EMAIL] paid with [REDACTED_CARD] "
+        "using api_key=[REDACTED] and token=[REDACTED]"
+    )
+    assert redactor.redact("") == ""
+
+def test_custom_rules_plug_into_preprocessor():
+    pre = LogPreprocessor(redact_patterns=[(r"(?i)password=\S+", "password=[REDACTED]"),
+                                           (r"\d{3}-\d{2}-\d{4}", "[REDACTED_SSN]")],
+                          mine_templates=False)
+    cleaned = pre.preprocess_logs([{"message": "PASSWORD=hunter2 ssn 123-45-6789", "timestamp": 1}])
+    assert cleaned[0]["message"] == "password=[REDACTED] ssn [REDACTED_SSN]"
+
+def test_slack_share_redacts_text_but_keeps_timestamps(tmp_path, monkeypatch):
+    from dashboard import app as dashboard
+    sent = []
+    class RecordingNotifier:
+        def send_message(self, msg):
+            sent.append(msg)
+            return True
+    history = HistoryStore(str(tmp_path / "history.db"))
+    idx = history.append({
+        "llm_output": "Card 4111 1111 1111 1111 was declined",
+        "batch_logs": [{"timestamp": 1729123456789, "container_name": "billing", "level": "error",
+                        "message": "Charge failed for john.doe@email.com"}],
+    })
+    monkeypatch.setattr(dashboard, "_history_store", history)
+    monkeypatch.setattr(dashboard, "SlackNotifier", RecordingNotifier)
+    assert dashboard.app.test_client().post(f"/rca/{idx}/share_slack").status_code == 302
+    # A 13-digit epoch-ms timestamp looks like a card number to the card rule
+    assert "- 1729123456789 | billing | error | Charge failed for [REDACTED_EMAIL]" in sent[0]
+    assert "Card [REDACTED_CARD] was declined" in sent[0]
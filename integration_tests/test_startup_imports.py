@@ -0,0 +1,18 @@
+import os
+import subprocess
+import sys
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+HEAVY_MODULES = ("sentence_transformers", "torch", "faiss")
+
+@pytest.mark.parametrize("module", ["main", "dashboard.app"])
+def test_entry_points_do_not_import_heavy_modules(module):
+    # A fresh interpreter, since this test process may already have them loaded
+    code = (f"import sys, {module}; "
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, os.path.join(ROOT, "src")]))
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True,
+                          text=True)
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.strip() == ""
@@ -0,0 +1,126 @@
+import os
+import sys
+import time
+import threading
+from types import SimpleNamespace
+import numpy as np
+import pytest
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from pipeline.stages import StagePipeline
+from embedding.embedded_batch import EmbeddedBatch
+from preprocessing.preprocessor import LogPreprocessor
+from vector_db.faiss_db import FaissVectorDB
+from ingestion.watermark_store import WatermarkStore
+from history.history_store import HistoryStore
+
+def slow(seconds):
+    def stage(item):
+        time.sleep(seconds)
+        yield item
+    return stage
+
+def test_stages_overlap_with_bounded_queues():
+    produced = []
+    def source():
+        for i in range(12):
+            produced.append(i)
+            yield i
+    pipeline = StagePipeline(source(), [("a", slow(0.03)), ("b", slow(0.03)), ("c", slow(0.03))],
+                             depth=2)
+    started = time.monotonic()
+    results = []
+    for item in pipeline:
+        # Backpressure: the source can only be a few queues' worth ahead of the slow consumer
+        assert len(produced) - len(results) <= 3 * 2 + 4
+        time.sleep(0.03)
+        results.append(item)
+    elapsed = time.monotonic() - started
+    assert results == list(range(12))
+    # Four 0.03s steps per item run concurrently: close to 12 x 0.03s, far from 12 x 0.12s
+    assert elapsed < 1.0
+    assert all(pipeline.busy[name] >= 0.3 for name in ("a", "b", "c"))
+
+def test_stage_failure_stops_the_pipeline():
+    def explode(item):
+        if item == 3:
+            raise ValueError("bad page")
+        yield item
+    pipeline = StagePipeline(iter(range(1000)), [("explode", explode), ("slow", slow(0.01))],
+                             depth=1)
+    seen = []
+    with pytest.raises(ValueError, match="bad page"):
+        for item in pipeline:
+            seen.append(item)
+    assert seen == [0, 1, 2][:len(seen)]
+    assert not [t for t in threading.enumerate() if t.name.startswith("pipeline-")]
+
+class FakeEmbedder:
+    def embed_logs(self, logs):
+        vectors = np.array([[hash(log["message"]) % 97, len(log["message"]), 1.0, 0.0]
+                            for log in logs], dtype=np.float32)
+        return EmbeddedBatch(logs, vectors)
+
+class FakeProcessor:
+    rca_cache = None
+
+    def __init__(self):
+        self.batches = []
+
+    def process_batches(self, logs, batch_size, on_token=None):
+        for start in range(0, len(logs), batch_size):
+            batch = logs[start:start + batch_size]
+            self.batches.append([log["message"] for log in batch.logs])
+            yield batch, {"llm_output": f"RCA for {batch.logs[0]['message']}", "similar_logs": []}
+
+def test_streaming_run_indexes_and_analyses_every_page(tmp_path, monkeypatch):
+    import main
+    monkeypatch.setenv("PIPELINE_MICRO_BATCH", "3")
+    now_ms = int(time.time() * 1000)
+    pages = [[{"message": f"error {i}", "timestamp": now_ms - 60_000 + i,
+               "container_name": "billing"} for i in range(start, start + 4)]
+             for start in (0, 4, 8)]
+    # A log repeated across pages, as overlapping fetch windows produce
+    pages[2].append(dict(pages[0][0]))
+    def fetch_logs_windowed(since, until):
+        return iter([[dict(log) for log in page] for page in pages])
+    fetcher = SimpleNamespace(account_id="1", nrql_query="SELECT * FROM Log",
+                              time_window="1 hour ago", fetch_logs_windowed=fetch_logs_windowed)
+    ctx = SimpleNamespace(
+        fetcher=fetcher, preprocessor=LogPreprocessor(mine_templates=False),
+        embedder=FakeEmbedder(), watermarks=WatermarkStore(str(tmp_path / "watermarks.json")),
+        db=FaissVectorDB(db_path=str(tmp_path / "faiss_index.bin")), novelty=None, clusterer=None,
+        processor=FakeProcessor(), history=HistoryStore(str(tmp_path / "history.db")),
+    )
+    main.run_pipeline(None, None, batch_size=2, context=ctx, streaming=True)
+
+    assert ctx.db.ntotal == 12
+    analysed = sorted(message for batch in ctx.processor.batches for message in batch)
+    assert analysed == sorted(f"error {i}" for i in range(12))
+    assert max(len(batch) for batch in ctx.processor.batches) <= 2
+    assert ctx.watermarks.get("1", "SELECT * FROM Log") == now_ms - 60_000 + 11
+    assert len(ctx.history.search(page_size=100)[0]) == len(ctx.processor.batches)
+
+    # The next run fetches the same pages again: everything is already indexed
+    ctx.processor.batches.clear()
+    main.run_pipeline(None, None, batch_size=2, context=ctx, streaming=True)
+    assert ctx.processor.batches == [] and ctx.db.ntotal == 12
+    ctx.db.close()
+
+def test_streaming_fetch_failure_keeps_the_watermark(tmp_path, capsys):
+    import main
+    def fetch_logs_windowed(since, until):
+        yield [{"message": "error 0", "timestamp": int(time.time() * 1000)}]
+        raise RuntimeError("New Relic timed out")
+    fetcher = SimpleNamespace(account_id="1", nrql_query="SELECT * FROM Log",
+                              time_window="1 hour ago", fetch_logs_windowed=fetch_logs_windowed)
+    ctx = SimpleNamespace(
+        fetcher=fetcher, preprocessor=LogPreprocessor(mine_templates=False),
+        embedder=FakeEmbedder(), watermarks=WatermarkStore(str(tmp_path / "watermarks.json")),
+        db=FaissVectorDB(db_path=str(tmp_path / "faiss_index.bin")), novelty=None, clusterer=None,
+        processor=FakeProcessor(), history=HistoryStore(str(tmp_path / "history.db")),
+    )
+    main.run_pipeline(None, None, batch_size=2, context=ctx, streaming=True)
+    assert "Error fetching logs: New Relic timed out" in capsys.readouterr().out
+    assert ctx.watermarks.get("1", "SELECT * FROM Log") is None
+    ctx.db.close()
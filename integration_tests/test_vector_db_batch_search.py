@@ -0,0 +1,42 @@
+import os
+import sys
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from vector_db.faiss_db import FaissVectorDB
+from embedding.embedded_batch import EmbeddedBatch
+from llm.llm_processor import LLMProcessor
+
+def test_search_batch_matches_single_searches(tmp_path, make_logs):
+    db = FaissVectorDB(db_path=str(tmp_path / "faiss_index.bin"))
+    logs = make_logs(0, 20)
+    db.add_logs(logs)
+    queries = np.array([log["embedding"] for log in logs[:5]], dtype=np.float32)
+    D, ids = db.search_batch(queries, k=3)
+    assert ids.shape == (5, 3)
+    for row, log in enumerate(logs[:5]):
+        single = db.search(log["embedding"], k=3)
+        batched = db.get_rows(ids[row], D[row])
+        assert [r["message"] for r in single] == [r["message"] for r in batched]
+
+def test_get_similar_logs_dedups_on_faiss_ids(tmp_path, monkeypatch, make_logs):
+    monkeypatch.setenv("FAISS_DB_PATH", str(tmp_path / "faiss_index.bin"))
+    logs = make_logs(0, 10)
+    FaissVectorDB().add_logs(logs)
+    processor = LLMProcessor(rag_k=4, slack_enabled=False)
+    # Two identical queries return the same ids; each id must appear once, closest first
+    similar = processor.get_similar_logs([logs[0], logs[0], logs[3]])
+    messages = [s["message"] for s in similar]
+    assert len(messages) == len(set(messages))
+    assert {"log 0", "log 3"} <= set(messages)
+    assert [s["distance"] for s in similar] == sorted(s["distance"] for s in similar)
+
+def test_embedded_batch_is_inserted_without_list_round_trip(tmp_path, make_logs):
+    db = FaissVectorDB(db_path=str(tmp_path / "faiss_index.bin"))
+    batch = EmbeddedBatch.from_logs(make_logs(0, 6))
+    head = batch[:4]
+    assert np.shares_memory(head.embeddings, batch.embeddings)
+    db.add_logs(head)
+    assert db.index.ntotal == 4
+    assert "embedding" not in db.metadata[0]
+    assert db.search(batch[2]["embedding"], k=1)[0]["message"] == "log 2"
+    assert np.allclose(batch.to_dicts()[5]["embedding"], make_logs(0, 6)[5]["embedding"])
@@ -0,0 +1,31 @@
+import os
+import sys
+import glob
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from vector_db.faiss_db import FaissVectorDB
+from vector_db.index_factory import index_type_of
+
+DIM = 16
+
+def test_ivf_index_trains_once_enough_vectors(tmp_path, make_logs):
+    db_path = str(tmp_path / "faiss_index.bin")
+    db = FaissVectorDB(db_path=db_path, index_type="ivf_flat", nlist=4, nprobe=4)
+    logs = make_logs(0, 200, dim=DIM)
+    db.add_logs(logs[:100])
+    assert index_type_of(db.index) == "flat"
+    db.add_logs(logs[100:])  # 39 * nlist = 156 vectors needed to train
+    assert index_type_of(db.index) == "ivf_flat"
+    assert glob.glob(db_path + ".seg.*.npy") == []
+
+    reopened = FaissVectorDB(db_path=db_path, index_type="ivf_flat", nlist=4, nprobe=4)
+    assert index_type_of(reopened.index) == "ivf_flat"
+    assert reopened.search(logs[150]["embedding"], k=1)[0]["message"] == "log 150"
+
+def test_existing_flat_index_is_migrated_to_hnsw(tmp_path, make_logs):
+    db_path = str(tmp_path / "faiss_index.bin")
+    logs = make_logs(0, 50, dim=DIM)
+    FaissVectorDB(db_path=db_path).add_logs(logs)
+    db = FaissVectorDB(db_path=db_path, index_type="hnsw", ef_search=32)
+    assert index_type_of(db.index) == "hnsw"
+    assert db.index.ntotal == 50
+    assert db.search(logs[7]["embedding"], k=1)[0]["message"] == "log 7"
@@ -0,0 +1,112 @@
+import os
+import sys
+import glob
+import pickle
+import numpy as np
+import faiss
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from vector_db.faiss_db import FaissVectorDB
+
+DIM = 8
+
+def test_append_only_segments_survive_reopen(tmp_path, make_logs):
+    db_path = str(tmp_path / "faiss_index.bin")
+    db = FaissVectorDB(db_path=db_path, compact_segments=100)
+    db.add_logs(make_logs(0, 3))
+    db.add_logs(make_logs(3, 2))
+    assert len(glob.glob(db_path + ".seg.*.npy")) == 2
+    assert not os.path.exists(db_path)
+
+    reopened = FaissVectorDB(db_path=db_path, compact_segments=100)
+    assert reopened.index.ntotal == 5
+    assert [m["message"] for m in reopened.metadata] == [f"log {i}" for i in range(5)]
+    logs = make_logs(3, 1)
+    assert reopened.search(logs[0]["embedding"], k=1)[0]["message"] == "log 3"
+
+def test_compaction_folds_segments_into_base(tmp_path, make_logs):
+    db_path = str(tmp_path / "faiss_index.bin")
+    db = FaissVectorDB(db_path=db_path, compact_segments=2)
+    db.add_logs(make_logs(0, 3))
+    db.add_logs(make_logs(3, 3))
+    db.close()
+    assert os.path.exists(db_path)
+    assert glob.glob(db_path + ".seg.*.npy") == []
+    db.add_logs(make_logs(6, 1))
+
+    reopened = FaissVectorDB(db_path=db_path)
+    assert reopened.index.ntotal == 7
+    assert len(reopened.metadata) == 7
+
+def test_interrupted_insert_is_discarded(tmp_path, make_logs):
+    db_path = str(tmp_path / "faiss_index.bin")
+    db = FaissVectorDB(db_path=db_path)
+    db.add_logs(make_logs(0, 2))
+    # Simulate a crash after the journal append but before the segment was published
+    with open(db_path + ".journal", "a") as f:
+        f.write('{"message": "orphan"}\n{"message": "torn')
+    reopened = FaissVectorDB(db_path=db_path)
+    assert reopened.index.ntotal == 2
+    assert [m["message"] for m in reopened.metadata] == ["log 0", "log 1"]
+    reopened.add_logs(make_logs(2, 1))
+    messages = [m["message"] for m in FaissVectorDB(db_path=db_path).metadata]
+    assert messages == ["log 0", "log 1", "log 2"]
+
+def test_legacy_pickle_layout_is_migrated(tmp_path, make_logs):
+    db_path = str(tmp_path / "faiss_index.bin")
+    logs = make_logs(0, 2)
+    index = faiss.IndexFlatL2(DIM)
+    index.add(np.array([log["embedding"] for log in logs], dtype=np.float32))
+    faiss.write_index(index, db_path)
+    with open(db_path + ".meta", "wb") as f:
+        pickle.dump([{"message": log["message"]} for log in logs], f)
+
+    db = FaissVectorDB(db_path=db_path)
+    assert not os.path.exists(db_path + ".meta")
+    assert db.search(logs[1]["embedding"], k=1)[0]["message"] == "log 1"
+
+def test_metadata_store_interns_fields_and_rebuilds_sidecars(tmp_path, make_logs):
+    db_path = str(tmp_path / "faiss_index.bin")
+    db = FaissVectorDB(db_path=db_path)
+    logs = make_logs(0, 4)
+    for log in logs:
+        log.update({"container_name": "svc-db", "namespace_name": "prod", "level": "error"})
+    db.add_logs(logs)
+    rows = db.search(logs[2]["embedding"], k=2)
+    assert rows[0]["message"] == "log 2"
+    assert rows[0]["container_name"] is rows[1]["container_name"]
+    assert db.metadata.vocab["namespace_name"] == ["prod"]
+    db.close()
+
+    # Sidecars are derived data: losing them only costs a rescan of the journal
+    for suffix in (".offsets", ".codes", ".vocab"):
+        os.remove(db_path + ".journal" + suffix)
+    reopened = FaissVectorDB(db_path=db_path)
+    assert len(reopened.metadata) == 4
+    assert reopened.metadata[3]["level"] == "error"
+
+def test_duplicate_logs_are_skipped_and_deduplicated_on_load(tmp_path, make_logs):
+    db_path = str(tmp_path / "faiss_index.bin")
+    db = FaissVectorDB(db_path=db_path)
+    assert db.add_logs(make_logs(0, 3)) == 0
+    # A rerun over an overlapping window: only log 3 is new, and the repeat inside the batch is
+    # dropped too
+    assert db.add_logs(make_logs(1, 3) + make_logs(3, 1)) == 3
+    assert db.index.ntotal == 4
+    fresh, skipped = db.drop_known([{"message": "log 2", "timestamp": 2},
+                                    {"message": "log 9", "timestamp": 9}])
+    assert skipped == 1 and [log["message"] for log in fresh] == ["log 9"]
+    db.close()
+    assert FaissVectorDB(db_path=db_path).add_logs(make_logs(0, 4)) == 4
+
+    # A store written before digests existed, holding the same logs twice
+    legacy_path = str(tmp_path / "legacy_index.bin")
+    logs = make_logs(0, 2) * 2
+    index = faiss.IndexFlatL2(DIM)
+    index.add(np.array([log["embedding"] for log in logs], dtype=np.float32))
+    faiss.write_index(index, legacy_path)
+    with open(legacy_path + ".meta", "wb") as f:
+        pickle.dump([{"message": log["message"], "timestamp": log["timestamp"]} for log in logs], f)
+    legacy = FaissVectorDB(db_path=legacy_path)
+    assert legacy.index.ntotal == 2
+    assert [r["message"] for r in legacy.search(logs[0]["embedding"], k=2)] == ["log 0", "log 1"]
+    assert os.path.getsize(legacy_path + ".hashes") == 4 * 8
@@ -0,0 +1,52 @@
+import os
+import sys
+import glob
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from vector_db.faiss_db import FaissVectorDB
+from vector_db.index_factory import stored_ids
+
+DAY_MS = 86_400_000
+NOW_MS = int(time.time() * 1000)
+
+def test_retention_deletes_by_age_and_namespace_cap(tmp_path, make_logs):
+    db_path = str(tmp_path / "faiss_index.bin")
+    db = FaissVectorDB(db_path=db_path, compact_segments=2, retention_days=30,
+                       namespace_max_vectors=5)
+    old = make_logs(0, 4, timestamp=NOW_MS - 45 * DAY_MS, namespace_name="prod")
+    # Retention runs on the first insert and then every FAISS_RETENTION_INTERVAL seconds
+    db.add_logs(old)
+    assert db.index.ntotal == 0
+    db.add_logs(make_logs(4, 8, timestamp=NOW_MS - DAY_MS, namespace_name="staging"))
+    db.add_logs(make_logs(12, 3, timestamp=NOW_MS - DAY_MS, namespace_name="prod"))
+    assert db.index.ntotal == 11
+    assert db.enforce_retention(now_ms=NOW_MS) == 3
+    # Ids are stable: surviving rows keep the ids they were inserted with
+    assert sorted(stored_ids(db.index).tolist()) == list(range(7, 15))
+    assert db.search(old[0]["embedding"], k=1)[0]["message"] != "log 0"
+    db.close()
+
+    reopened = FaissVectorDB(db_path=db_path, retention_days=30, namespace_max_vectors=5)
+    assert reopened.index.ntotal == 8
+    kept = sorted(r["message"] for r in reopened.get_rows(range(15)))
+    assert kept == sorted(f"log {i}" for i in range(7, 15))
+    reopened.add_logs(make_logs(15, 1, timestamp=NOW_MS, namespace_name="dev"))
+    assert 15 in stored_ids(reopened.index)
+
+    # Offline compaction drops the tombstoned rows from disk and renumbers the rest
+    assert reopened.rebuild() == 9
+    assert len(reopened.metadata) == 9 and reopened.index.ntotal == 9
+    assert not os.path.exists(db_path + ".tombstones") and glob.glob(db_path + ".rebuild*") == []
+    rebuilt = FaissVectorDB(db_path=db_path)
+    assert [m["message"] for m in rebuilt.metadata] == [f"log {i}" for i in range(7, 16)]
+    assert rebuilt.search(make_logs(15, 1)[0]["embedding"], k=1)[0]["message"] == "log 15"
+
+def test_hnsw_delete_rebuilds_graph(tmp_path, make_logs):
+    db_path = str(tmp_path / "faiss_index.bin")
+    db = FaissVectorDB(db_path=db_path, index_type="hnsw")
+    logs = make_logs(0, 30, timestamp=NOW_MS, namespace_name="prod")
+    db.add_logs(logs)
+    assert db.delete([3, 4, 99]) == 2
+    assert db.index.ntotal == 28
+    assert db.search(logs[3]["embedding"], k=1)[0]["message"] != "log 3"
+    assert db.search(logs[5]["embedding"], k=1)[0]["message"] == "log 5"
@@ -0,0 +1,86 @@
+import os
+import sys
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+from embedding.embedded_batch import EmbeddedBatch
+from vector_db.faiss_db import FaissVectorDB
+from vector_db.sharded_db import ShardedVectorDB
+
+DIM = 8
+# Noon UTC on 2026-10-01 and 2026-10-02, in epoch ms
+DAY_1 = 1790856000000
+DAY_2 = DAY_1 + 86_400_000
+NAMESPACES = ("billing", "goals", "auth")
+
+def first_log(namespace, day):
+    # Each namespace and day holds five logs, numbered from this one
+    return 20 * NAMESPACES.index(namespace) + 10 * (day == DAY_2)
+
+def shard_logs(make_logs):
+    logs = []
+    for namespace in NAMESPACES:
+        for day in (DAY_1, DAY_2):
+            start = first_log(namespace, day)
+            logs += make_logs(start, 5, timestamp=day - start, namespace_name=namespace)
+    for log in logs:
+        log["level"] = "error" if int(log["message"].split()[1]) % 2 else "info"
+    return EmbeddedBatch.from_logs(logs)
+
+def messages(namespace, day, numbers=range(5)):
+    return [f"log {first_log(namespace, day) + i}" for i in numbers]
+
+def test_filtered_search_only_scans_matching_shards(tmp_path, make_logs):
+    db = ShardedVectorDB(shard_dir=str(tmp_path / "shards"), shard_by="namespace",
+                         time_granularity="day")
+    batch = shard_logs(make_logs)
+    assert db.add_logs(batch) == 0
+    assert len(db.keys) == 6
+    query = np.zeros((1, DIM), dtype=np.float32)
+
+    assert {r["namespace_name"] for r in db.search(query, k=30)} == set(NAMESPACES)
+    assert len(db.matching_shards({"namespace_name": "goals"})) == 2
+    assert len(db.matching_shards({"namespace_name": "goals", "since": "2026-10-02"})) == 1
+    rows = db.search(query, k=10,
+                     filters={"namespace_name": "goals", "level": "error", "since": "2026-10-02"})
+    assert sorted(r["message"] for r in rows) == messages("goals", DAY_2, (1, 3))
+    distances = [r["distance"] for r in db.search(query, k=10, filters={"namespace_name": "auth"})]
+    assert len(distances) == 10 and distances == sorted(distances)
+    assert db.search(query, k=5, filters={"namespace_name": "unknown"}) == []
+
+    # Shard numbers and global ids survive a restart; duplicates are still skipped per shard
+    D, ids = db.search_batch(query, k=3, filters={"namespace_name": "billing"})
+    rows = db.get_rows(ids[0])
+    assert [r["namespace_name"] for r in rows] == ["billing"] * 3
+    db.close()
+    reopened = ShardedVectorDB(shard_dir=str(tmp_path / "shards"), shard_by="namespace",
+                               time_granularity="day")
+    assert reopened.get_rows(ids[0]) == rows
+    fresh, skipped = reopened.drop_known(batch.logs[:3] + [dict(batch.logs[0], message="new")])
+    assert skipped == 3 and [log["message"] for log in fresh] == ["new"]
+    assert reopened.add_logs(batch) == len(batch)
+    reopened.close()
+
+def test_unsharded_search_filters_on_metadata(tmp_path, make_logs):
+    db = FaissVectorDB(db_path=str(tmp_path / "faiss_index.bin"))
+    db.add_logs(shard_logs(make_logs))
+    query = np.zeros(DIM, dtype=np.float32)
+    rows = db.search(query, k=30,
+                     filters={"namespace_name": "auth", "until": "2026-10-01T23:59:59"})
+    assert sorted(r["message"] for r in rows) == messages("auth", DAY_1)
+    assert db.search(query, k=5, filters={"level": "fatal"}) == []
+
+def test_namespace_cap_spans_time_buckets(tmp_path, make_logs):
+    db = ShardedVectorDB(shard_dir=str(tmp_path / "shards"), shard_by="namespace",
+                         time_granularity="day", namespace_max_vectors=7)
+    # The cap runs on the first insert, then at most every FAISS_RETENTION_INTERVAL
+    db.add_logs(shard_logs(make_logs))
+    assert db.ntotal == 21 and db.enforce_retention() == 0
+    # Each namespace keeps its 5 newest-day rows and the 2 newest of the older day
+    for namespace in NAMESPACES:
+        rows = db.search(np.zeros(DIM, dtype=np.float32), k=30,
+                         filters={"namespace_name": namespace})
+        assert sorted(r["message"] for r in rows) == sorted(
+            messages(namespace, DAY_2) + messages(namespace, DAY_1, (3, 4)))
+    db.set_search_params(nprobe=4)
+    assert db.shard_args["nprobe"] == 4
+    db.close()
@@ -0,0 +1,77 @@
+import os
+import sys
+import numpy as np
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from embedding.embedded_batch import EmbeddedBatch
+from vector_db.faiss_db import FaissVectorDB
+from history.history_store import HistoryStore
+from llm.rca_cache import batch_centroid
+
+def test_read_only_store_follows_writer_generations(tmp_path, make_logs):
+    db_path = str(tmp_path / "faiss_index.bin")
+    writer = FaissVectorDB(db_path=db_path, compact_segments=2)
+    first = EmbeddedBatch.from_logs(make_logs(0, 10))
+    writer.add_logs(first)
+    writer.add_logs(make_logs(10, 5))
+    writer.compact()
+    # One compacted base (memory-mapped by readers), one pending segment and one tombstone
+    writer.add_logs(make_logs(15, 5))
+    writer.delete([3])
+
+    reader = FaissVectorDB(db_path=db_path, read_only=True)
+    reader.reload_interval = 0
+    assert reader.ntotal == 20
+    assert reader.search(first.embeddings[3], k=1)[0]["message"] != "log 3"
+    assert reader.search(first.embeddings[4], k=1)[0]["message"] == "log 4"
+    late = EmbeddedBatch.from_logs(make_logs(20, 3))
+    assert reader.search(late.embeddings[0], k=1)[0]["message"] != "log 20"
+
+    # The reader picks up the next generation the writer publishes, without reopening
+    writer.add_logs(late)
+    assert reader.search(late.embeddings[0], k=1)[0]["message"] == "log 20"
+    writer.close()
+    try:
+        reader.add_logs(make_logs(30, 1))
+        assert False, "read-only store accepted a write"
+    except RuntimeError:
+        pass
+
+def test_similar_endpoint_returns_nearest_past_rcas(tmp_path, monkeypatch, make_logs,
+                                                    unit_vectors):
+    from dashboard import app as dashboard
+    rng = np.random.default_rng(1)
+    db_path = str(tmp_path / "faiss_index.bin")
+    writer = FaissVectorDB(db_path=db_path)
+    history = HistoryStore(str(tmp_path / "history.db"))
+    # Three incidents; the second is a recurrence of the first, the third is unrelated
+    first = EmbeddedBatch.from_logs(make_logs(0, 4, embeddings=unit_vectors(rng, 4),
+                                              container_name="billing"))
+    recurrence = EmbeddedBatch([dict(log, message=log["message"] + " again") for log in first.logs],
+                               first.embeddings + 0.01 * unit_vectors(rng, 4))
+    unrelated = EmbeddedBatch.from_logs(make_logs(10, 4, embeddings=unit_vectors(rng, 4),
+                                                  container_name="goals"))
+    ids = []
+    for batch, output in ((first, "DB pool exhausted"), (recurrence, "DB pool exhausted again"),
+                          (unrelated, "Bad deploy")):
+        writer.add_logs(batch)
+        ids.append(history.append(
+            {"timestamp": batch.logs[0]["timestamp"],
+             "container_name": batch.logs[0]["container_name"], "llm_output": output},
+            vector=batch_centroid(batch.embeddings),
+            log_digests=[FaissVectorDB.content_digest(log) for log in batch.logs],
+        ))
+    legacy = history.append({"llm_output": "saved before vectors"})
+    writer.close()
+
+    monkeypatch.setenv("FAISS_DB_PATH", db_path)
+    monkeypatch.setattr(dashboard, "_history_store", history)
+    monkeypatch.setattr(dashboard, "_vector_db", None)
+    client = dashboard.app.test_client()
+    similar = client.get(f"/rca/{ids[0]}/similar?k=2").get_json()["similar"]
+    assert [s["id"] for s in similar][0] == ids[1]
+    assert ids[0] not in [s["id"] for s in similar]
+    assert similar[0]["summary"] == "DB pool exhausted again"
+    assert [s["distance"] for s in similar] == sorted(s["distance"] for s in similar)
+    assert client.get(f"/rca/{legacy}/similar").get_json()["similar"] == []
+    assert client.get("/rca/9999/similar").status_code == 404
@@ -1,41 +1,106 @@
 import argparse
 import os
 import sys
+import time
 import datetime
+from functools import cached_property
 from dotenv import load_dotenv
 load_dotenv()
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), 'src')))
-from ingestion.new_relic_fetcher import NewRelicLogFetcher
+from ingestion.new_relic_fetcher import NewRelicLogFetcher, parse_time_window, strip_time_clauses
 from preprocessing.preprocessor import LogPreprocessor
 from embedding.embedder import LogEmbedder
-from vector_db.faiss_db import FaissVectorDB
 from llm.llm_processor import LLMProcessor
+from ingestion.watermark_store import WatermarkStore
+from utils.timestamps import newest_timestamp_ms
+from history.history_store import HistoryStore
+from clustering.incident_clusterer import IncidentClusterer
+from clustering.novelty_filter import NoveltyFilter
+from llm.rca_cache import batch_centroid
+from pipeline.stages import StagePipeline
 
-def run_pipeline(from_time, to_time, batch_size=5, slack=False):
+class PipelineContext:
+    """
+    Pipeline components; the daemon keeps one alive so the model and index stay in memory.
+    The embedder, index and LLM processor are only built once a run has logs to process.
+    """
+    def __init__(self, slack=False):
+        self.slack = slack
+        self.fetcher = NewRelicLogFetcher()
+        self.preprocessor = LogPreprocessor()
+        self.watermarks = WatermarkStore()
+
+    @cached_property
+    def embedder(self):
+        return LogEmbedder()
+
+    @cached_property
+    def db(self):
+        # faiss is imported with the index, so --help and runs with no new logs never load it
+        from vector_db.sharded_db import open_vector_db
+        return open_vector_db()
+
+    @cached_property
+    def clusterer(self):
+        if os.getenv("INCIDENT_CLUSTERING", "true").lower() != "true":
+            return None
+        return IncidentClusterer()
+
+    @cached_property
+    def history(self):
+        return HistoryStore()
+
+    @cached_property
+    def novelty(self):
+        novelty = NoveltyFilter(history=self.history)
+        return novelty if novelty.enabled else None
+
+    @cached_property
+    def processor(self):
+        return LLMProcessor(slack_enabled=self.slack, db=self.db)
+
+def run_pipeline(from_time, to_time, batch_size=5, slack=False, context=None, streaming=None):
+    ctx = context or PipelineContext(slack=slack)
+    if streaming is None:
+        streaming = os.getenv("PIPELINE_STREAMING", "false").lower() == "true"
+    fetcher = ctx.fetcher
+    use_watermark = not (from_time and to_time)
     if from_time and to_time:
+        # Explicit ranges are backfills: they neither read nor advance the watermark
         print(f"Fetching logs from New Relic: {from_time} to {to_time}")
-        fetcher = NewRelicLogFetcher()
-        import re
-        base_query = fetcher.nrql_query
-        # Remove any existing SINCE ... UNTIL ..., LIMIT ..., and 'hours ago'/'days ago' (with or without a number)
-        base_query = re.sub(r"SINCE [^ ]+( UNTIL [^ ]+)?", "", base_query, flags=re.IGNORECASE)
-        base_query = re.sub(r"LIMIT \d+", "", base_query, flags=re.IGNORECASE)
-        base_query = re.sub(r"(\d+\s*)?(hours|days) ago", "", base_query, flags=re.IGNORECASE)
-        base_query = re.sub(r"\s+", " ", base_query).strip()
-        nrql_query = f"{base_query} SINCE '{from_time}' UNTIL '{to_time}' LIMIT 1000"
+        since = datetime.datetime.fromisoformat(from_time)
+        until = datetime.datetime.fromisoformat(to_time)
     else:
-        print("Fetching logs from New Relic: last 24 hours")
-        fetcher = NewRelicLogFetcher()
-        nrql_query = fetcher.nrql_query
-    try:
-        logs = fetcher.fetch_logs(nrql_query=nrql_query)
-        if logs is None:
-            print("Error: fetch_logs returned None. Raw API response may be malformed.")
-            print(f"NRQL used: {nrql_query}")
-            if hasattr(fetcher, 'last_response'):
-                print(f"Raw API response: {fetcher.last_response}")
+        until = datetime.datetime.now(datetime.timezone.utc)
+        since = until - parse_time_window(fetcher.time_window)
+        watermark = ctx.watermarks.get(fetcher.account_id, fetcher.nrql_query)
+        if watermark is not None:
+            # New Relic can ingest logs late, older than ones already fetched, so resume a little
+            # before the watermark; drop_known skips the re-fetched logs that were already indexed
+            overlap_ms = int(float(os.getenv("INGEST_WATERMARK_OVERLAP", "120")) * 1000)
+            resume = datetime.datetime.fromtimestamp((watermark - overlap_ms) / 1000,
+                                                     datetime.timezone.utc)
+            since = max(since, resume)
+            print(f"Fetching logs from New Relic: since watermark {since.isoformat()}")
+        else:
+            print(f"Fetching logs from New Relic: since {fetcher.time_window}")
+        if since >= until:
+            print("No new logs since the last run.")
             return
+    # Time-sliced, concurrent fetch: windows that hit the row limit are split instead of truncated
+    nrql_query = f"{strip_time_clauses(fetcher.nrql_query)} SINCE '{since}' UNTIL '{until}'"
+    if streaming:
+        # A failed window or stage ends this run without advancing the watermark
+        try:
+            run_streaming(ctx, since, until, batch_size, use_watermark)
+        except Exception as e:
+            print(f"Error fetching logs: {e}")
+            print(f"NRQL used: {nrql_query}")
+        return
+    try:
+        logs = [log for page in fetcher.fetch_logs_windowed(since, until) for log in page]
         print(f"Fetched {len(logs)} logs from New Relic.")
+        newest = newest_timestamp_ms(logs)
         if not logs:
             print("No logs fetched. Exiting.")
             print(f"NRQL used: {nrql_query}")
@@ -44,71 +109,239 @@ def run_pipeline(from_time, to_time, batch_size=5, slack=False):
         print(f"Error fetching logs: {e}")
         print(f"NRQL used: {nrql_query}")
         return
-    preprocessor = LogPreprocessor()
-    cleaned_logs = preprocessor.preprocess_logs(logs)
+    cleaned_logs = ctx.preprocessor.preprocess_logs(logs)
     print(f"Preprocessed logs: {len(cleaned_logs)} remain after cleaning/dedup.")
-    embedder = LogEmbedder()
-    embedded_logs = embedder.embed_logs(cleaned_logs)
+    # Overlapping windows and reruns re-fetch logs that are already indexed; skip them before
+    # embedding
+    cleaned_logs, known = ctx.db.drop_known(cleaned_logs)
+    if known:
+        print(f"Skipped {known} logs already in the FAISS vector DB.")
+    if not cleaned_logs:
+        if use_watermark and newest is not None:
+            ctx.watermarks.set(fetcher.account_id, fetcher.nrql_query, newest)
+        print("No new logs to analyse.")
+        return
+    embedded_logs = ctx.embedder.embed_logs(cleaned_logs)
     print(f"Embedded {len(embedded_logs)} logs.")
-    db = FaissVectorDB()
-    db.add_logs(embedded_logs)
+    embedded_logs, novelty_stats = index_logs(ctx, embedded_logs)
     print("Logs added to FAISS vector DB.")
-    processor = LLMProcessor(slack_enabled=slack)
-    result = processor.process_batch(embedded_logs[:batch_size])
-    print("\n=== RCA & Fix Suggestion ===\n")
-    print(result["llm_output"])
-    print("\n=== Similar Logs (RAG Context) ===\n")
-    for log in result["similar_logs"]:
-        print(f"- {log.get('timestamp', '')} | {log.get('container_name', '')} | {log.get('level', '')} | {log.get('message', '')}")
-
-    # --- Persist RCA result to dashboard history ---
-    import json
-    from datetime import datetime as dt
-    history_path = os.getenv("DASHBOARD_HISTORY_PATH", "rca_history.json")
-    try:
-        if os.path.exists(history_path):
-            with open(history_path, "r") as f:
-                history = json.load(f)
+    if novelty_stats is not None:
+        print(f"Novelty filter: {novelty_stats['novel']} novel, {novelty_stats['rising']} rising, "
+              f"{novelty_stats['known']} known patterns skipped.")
+    if use_watermark and newest is not None:
+        # Advance only once the logs are indexed, so a failed run is retried rather than skipped
+        ctx.watermarks.set(fetcher.account_id, fetcher.nrql_query, newest)
+    if not len(embedded_logs):
+        print("No novel log patterns; skipping LLM analysis.")
+        return
+    analyse(ctx, embedded_logs, batch_size)
+
+def index_logs(ctx, embedded_logs):
+    """
+    Add embedded logs to the vector DB. Returns the ones worth an LLM call (all of them unless the
+    novelty filter is on) and the novelty filter's counts (None when it is off).
+    """
+    # Scored against the index before these logs are added, so they don't match themselves
+    if ctx.novelty is None:
+        ctx.db.add_logs(embedded_logs)
+        return embedded_logs, None
+    novelty_scores = ctx.db.novelty_scores(embedded_logs.embeddings)
+    ctx.db.add_logs(embedded_logs)
+    # Known patterns only bump their counters in history; novel and rising ones go to the LLM
+    selected, novelty_stats = ctx.novelty.select(embedded_logs, novelty_scores)
+    return embedded_logs.select(selected), novelty_stats
+
+def run_streaming(ctx, since, until, batch_size, use_watermark):
+    """
+    Streaming mode: fetch windows, preprocessing, embedding micro-batches of
+    ``PIPELINE_MICRO_BATCH`` logs and index inserts run as concurrent stages over bounded queues
+    (``PIPELINE_QUEUE_DEPTH``), while this thread sends each indexed micro-batch to the LLM. Memory
+    depends on the queue depth rather than the window size. Incidents are clustered within a
+    micro-batch, not across the run.
+    """
+    from vector_db.faiss_db import FaissVectorDB
+    fetcher = ctx.fetcher
+    micro_batch = max(int(os.getenv("PIPELINE_MICRO_BATCH", "256")), 1)
+    run = {"fetched": 0, "new": 0, "newest": None, "novel": 0, "rising": 0, "known": 0}
+    seen = set()
+
+    def preprocess(page):
+        run["fetched"] += len(page)
+        newest = newest_timestamp_ms(page)
+        if newest is not None and (run["newest"] is None or newest > run["newest"]):
+            run["newest"] = newest
+        cleaned, _ = ctx.db.drop_known(ctx.preprocessor.preprocess_logs(page))
+        # drop_known only sees indexed logs; repeats of logs still in flight from earlier pages
+        # are dropped here
+        fresh = []
+        for log in cleaned:
+            digest = FaissVectorDB.content_digest(log)
+            if digest not in seen:
+                seen.add(digest)
+                fresh.append(log)
+        run["new"] += len(fresh)
+        for start in range(0, len(fresh), micro_batch):
+            yield fresh[start:start + micro_batch]
+
+    def embed(logs):
+        yield ctx.embedder.embed_logs(logs)
+
+    # Stages report through ``run`` and print nothing, so they never interleave with streamed
+    # LLM output
+    def index(embedded_logs):
+        selected, novelty_stats = index_logs(ctx, embedded_logs)
+        for key, count in (novelty_stats or {}).items():
+            run[key] += count
+        if len(selected):
+            yield selected
+
+    pipeline = StagePipeline(fetcher.fetch_logs_windowed(since, until),
+                             [("preprocess", preprocess), ("embed", embed), ("index", index)])
+    started = time.monotonic()
+    for embedded_logs in pipeline:
+        analyse(ctx, embedded_logs, batch_size)
+    busy = ", ".join(f"{name} {seconds:.1f}s" for name, seconds in pipeline.busy.items())
+    print(f"Streamed {run['fetched']} fetched logs ({run['new']} new) in "
+          f"{time.monotonic() - started:.1f}s; stage busy time: {busy}.")
+    if ctx.novelty is not None:
+        print(f"Novelty filter: {run['novel']} novel, {run['rising']} rising, "
+              f"{run['known']} known patterns skipped.")
+    if use_watermark and run["newest"] is not None:
+        # Every stage has drained by now, so all fetched logs are indexed
+        ctx.watermarks.set(fetcher.account_id, fetcher.nrql_query, run["newest"])
+
+def analyse(ctx, embedded_logs, batch_size):
+    """
+    Run the LLM over embedded logs (per incident, or per batch of ``batch_size``), printing and
+    saving each result.
+    """
+    streamed = []
+    current = {"number": 1, "total": 0}
+    def show_header():
+        print(f"\n=== RCA & Fix Suggestion ({current['number']}/{current['total']}) ===\n")
+    def show_token(piece):
+        if not streamed:
+            show_header()
+        streamed.append(piece)
+        print(piece, end="", flush=True)
+    # Every incident/batch is analysed (LLM_CONCURRENCY at a time); results arrive in order, so
+    # history stays ordered
+    if ctx.clusterer is not None:
+        # One LLM call per incident, on up to batch_size representative logs
+        incidents = ctx.clusterer.cluster(embedded_logs, sample_size=batch_size)
+        print(f"Grouped {len(embedded_logs)} logs into {len(incidents)} incidents.")
+        current["total"] = len(incidents)
+        results = ctx.processor.process_incidents(incidents, on_token=show_token)
+    else:
+        current["total"] = -(-len(embedded_logs) // max(batch_size, 1))
+        results = ctx.processor.process_batches(embedded_logs, batch_size, on_token=show_token)
+    for item, result in results:
+        if streamed:
+            print()
         else:
-            history = []
-    except Exception as e:
-        print(f"Warning: Could not load dashboard history: {e}")
-        history = []
-    # Use the first log in the batch for top-level metadata
-    meta_log = cleaned_logs[0] if cleaned_logs else {}
+            # Concurrent or non-streaming runs, and failed calls, print the output in one go
+            show_header()
+            print(result["llm_output"])
+        streamed.clear()
+        current["number"] += 1
+        print("\n=== Similar Logs (RAG Context) ===\n")
+        for log in result["similar_logs"]:
+            print(f"- {log.get('timestamp', '')} | {log.get('container_name', '')} | "
+                  f"{log.get('level', '')} | {log.get('message', '')}")
+        if ctx.clusterer is not None:
+            save_result(ctx, item.sample.logs, result, first_log=item.members.logs[0],
+                        incident_size=item.size, members=item.members)
+        else:
+            save_result(ctx, item.logs, result, members=item)
+
+def save_result(ctx, batch_logs, result, first_log=None, incident_size=None, members=None):
+    """
+    Persist one batch's or incident's RCA result to the dashboard history. ``members`` (the
+    embedded logs it covers) are recorded by centroid and content digest for "similar past RCAs".
+    """
+    from datetime import datetime as dt
+    # Use the first log of the batch/incident for top-level metadata
+    meta_log = first_log or (batch_logs[0] if batch_logs else {})
     entry = {
         "timestamp": meta_log.get("timestamp", dt.utcnow().isoformat()),
         "container_name": meta_log.get("container_name", ""),
         "namespace_name": meta_log.get("namespace_name", ""),
         "level": meta_log.get("level", ""),
         "llm_output": result["llm_output"],
-        "batch_logs": cleaned_logs[:batch_size],
-        "similar_logs": result["similar_logs"]
+        "batch_logs": batch_logs,
+        "similar_logs": result["similar_logs"],
+        "llm_stats": result.get("llm_stats", {})
     }
-    history.append(entry)
+    if incident_size is not None:
+        entry["incident_size"] = incident_size
+    from vector_db.faiss_db import FaissVectorDB
+    vector = digests = None
+    if members is not None:
+        vector = batch_centroid(members.embeddings)
+        digests = [FaissVectorDB.content_digest(log) for log in members.logs]
     try:
-        with open(history_path, "w") as f:
-            json.dump(history, f, indent=2)
-        print(f"Saved RCA result to {history_path} (dashboard will update on refresh)")
+        entry_id = ctx.history.append(entry, vector=vector, log_digests=digests)
+        if result.get("rca_cache_id") is not None and ctx.processor.rca_cache:
+            # Lets a downvote on this entry stop the cached answer from being reused
+            ctx.processor.rca_cache.attach_history(result["rca_cache_id"], entry_id)
+        print(f"Saved RCA result #{entry_id} to {ctx.history.path} "
+              "(dashboard will update on refresh)")
     except Exception as e:
         print(f"Warning: Could not save dashboard history: {e}")
 
+def run_daemon(interval, batch_size=5, slack=False, streaming=None):
+    """Poll New Relic every ``interval`` seconds, keeping the model and FAISS index resident."""
+    ctx = PipelineContext(slack=slack)
+    print(f"Daemon mode: polling every {interval} seconds (Ctrl+C to stop).")
+    try:
+        while True:
+            started = time.monotonic()
+            try:
+                run_pipeline(None, None, batch_size=batch_size, slack=slack, context=ctx,
+                             streaming=streaming)
+            except Exception as e:
+                print(f"Error in pipeline run: {e}")
+            time.sleep(max(interval - (time.monotonic() - started), 0))
+    except KeyboardInterrupt:
+        print("Daemon stopped.")
+    finally:
+        if "db" in ctx.__dict__:
+            ctx.db.close()
+        if "embedder" in ctx.__dict__:
+            ctx.embedder.close()
+
 def main():
     parser = argparse.ArgumentParser(description="Run AI Debug Agent pipeline on New Relic logs.")
-    parser.add_argument('--from', dest='from_time', type=str, help='Start time (ISO8601, default: 1 hour ago)')
+    parser.add_argument('--from', dest='from_time', type=str,
+                        help='Start time (ISO8601, default: 1 hour ago)')
     parser.add_argument('--to', dest='to_time', type=str, help='End time (ISO8601, default: now)')
-    parser.add_argument('--batch-size', type=int, default=5, help='Number of logs to process in LLM batch')
+    parser.add_argument('--batch-size', type=int, default=5,
+                        help='Number of logs per LLM batch (every batch is processed)')
     parser.add_argument('--slack', action='store_true', help='Send results to Slack')
+    parser.add_argument('--daemon', action='store_true',
+                        help='Keep running and poll for new logs on an interval')
+    parser.add_argument('--streaming', action='store_true', default=None,
+                        help='Overlap fetch, preprocessing, embedding, indexing and LLM stages '
+                             '(default: PIPELINE_STREAMING)')
+    parser.add_argument('--interval', type=int,
+                        default=int(os.getenv("INGEST_POLL_INTERVAL", "300")),
+                        help='Seconds between polls in daemon mode '
+                             '(default: INGEST_POLL_INTERVAL or 300)')
     args = parser.parse_args()
-    if args.from_time and args.to_time:
+    if args.daemon:
+        run_daemon(args.interval, batch_size=args.batch_size, slack=args.slack,
+                   streaming=args.streaming)
+    elif args.from_time and args.to_time:
         # Format as 'YYYY-MM-DD HH:MM:SS' (no T, no microseconds, no Z)
         def nrql_time(dt):
             return dt.replace(microsecond=0).strftime('%Y-%m-%d %H:%M:%S')
         end = datetime.datetime.fromisoformat(args.to_time)
         start = datetime.datetime.fromisoformat(args.from_time)
-        run_pipeline(nrql_time(start), nrql_time(end), batch_size=args.batch_size, slack=args.slack)
+        run_pipeline(nrql_time(start), nrql_time(end), batch_size=args.batch_size, slack=args.slack,
+                     streaming=args.streaming)
     else:
-        run_pipeline(None, None, batch_size=args.batch_size, slack=args.slack)
+        run_pipeline(None, None, batch_size=args.batch_size, slack=args.slack,
+                     streaming=args.streaming)
 
 if __name__ == "__main__":
     main()
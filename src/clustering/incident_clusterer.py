@@ -0,0 +1,98 @@
+import numpy as np
+from typing import List, Optional
+from logging_utils.logger import setup_logger
+from src.config import get_config
+from embedding.embedded_batch import EmbeddedBatch
+
+def connected_components(n: int, src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    """Component label (smallest member index) for every node of an undirected edge list."""
+    labels = np.arange(n, dtype=np.int64)
+    while True:
+        low = np.minimum(labels[src], labels[dst])
+        updated = labels.copy()
+        np.minimum.at(updated, src, low)
+        np.minimum.at(updated, dst, low)
+        # Pointer jumping: follow labels to their root so long chains converge in few rounds
+        while True:
+            jumped = updated[updated]
+            if np.array_equal(jumped, updated):
+                break
+            updated = jumped
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+class Incident:
+    __slots__ = ("incident_id", "members", "sample")
+
+    def __init__(self, incident_id: int, members: EmbeddedBatch, sample: EmbeddedBatch):
+        self.incident_id = incident_id
+        self.members = members
+        self.sample = sample
+
+    @property
+    def size(self) -> int:
+        return len(self.members)
+
+class IncidentClusterer:
+    """
+    Groups a run's embedded logs into incidents.
+
+    Every log is linked to its ``neighbors`` nearest logs (one batched FAISS inner-product
+    search over unit vectors) whose cosine similarity is at least ``similarity``; the
+    connected components of that graph are the incidents. Each incident is represented by up
+    to ``sample_size`` logs picked by farthest-point sampling from its medoid, so the sample
+    covers the incident's variety instead of repeating its most common line.
+    """
+
+    def __init__(self, similarity: Optional[float] = None, neighbors: Optional[int] = None):
+        self.logger = setup_logger()
+        if similarity is None:
+            similarity = get_config("INCIDENT_SIMILARITY", default=0.8)
+        self.similarity = float(similarity)
+        self.neighbors = int(neighbors or get_config("INCIDENT_NEIGHBORS", default=16))
+
+    def cluster(self, batch: EmbeddedBatch, sample_size: int = 5) -> List[Incident]:
+        """Incidents ordered by their first log in ``batch`` (fetch order)."""
+        n = len(batch)
+        if n == 0:
+            return []
+        import faiss  # loaded on first use so importing the pipeline stays cheap
+        vectors = batch.embeddings.copy()
+        faiss.normalize_L2(vectors)
+        index = faiss.IndexFlatIP(vectors.shape[1])
+        index.add(vectors)
+        k = min(self.neighbors + 1, n)
+        S, ids = index.search(vectors, k)
+        src = np.repeat(np.arange(n, dtype=np.int64), k)
+        dst = ids.ravel()
+        keep = (dst >= 0) & (S.ravel() >= self.similarity)
+        labels = connected_components(n, src[keep], dst[keep])
+        # Labels are each component's smallest index, so sorting by label keeps fetch order
+        _, inverse = np.unique(labels, return_inverse=True)
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.cumsum(np.bincount(inverse))[:-1]
+        incidents = []
+        for incident_id, members in enumerate(np.split(order, bounds)):
+            picked = members[self._sample(vectors[members], sample_size)]
+            incidents.append(Incident(incident_id, batch.select(members),
+                                      batch.select(np.sort(picked))))
+        self.logger.info(f"Clustered {n} logs into {len(incidents)} incidents "
+                         f"(largest {max(i.size for i in incidents)} logs).")
+        return incidents
+
+    @staticmethod
+    def _sample(vectors: np.ndarray, size: int) -> np.ndarray:
+        if len(vectors) <= size:
+            return np.arange(len(vectors))
+        centroid = vectors.mean(axis=0)
+        picked = [int(np.argmax(vectors @ centroid))]
+        # Similarity of every member to its closest already-picked member
+        closest = vectors @ vectors[picked[0]]
+        closest[picked[0]] = np.inf
+        while len(picked) < size:
+            nxt = int(np.argmin(closest))
+            picked.append(nxt)
+            closest = np.maximum(closest, vectors @ vectors[nxt])
+            closest[picked] = np.inf
+        return np.asarray(picked)
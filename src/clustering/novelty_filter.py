@@ -0,0 +1,87 @@
+import datetime
+import numpy as np
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from logging_utils.logger import setup_logger
+from src.config import get_config
+from embedding.embedded_batch import EmbeddedBatch
+from utils.timestamps import to_epoch_ms
+
+PATTERN_MAX_CHARS = 200
+
+def pattern_key(log: Dict) -> Tuple[str, str]:
+    """``(pattern, container_name)`` a log is counted under: its mined template, or its message."""
+    pattern = str(log.get("template") or log.get("message", ""))[:PATTERN_MAX_CHARS]
+    return pattern, str(log.get("container_name") or "")
+
+def log_day(log: Dict) -> str:
+    ms = to_epoch_ms(log.get("last_seen", log.get("timestamp")))
+    when = datetime.datetime.now(datetime.timezone.utc) if ms is None else \
+        datetime.datetime.fromtimestamp(ms / 1000, tz=datetime.timezone.utc)
+    return when.strftime("%Y-%m-%d")
+
+class NoveltyFilter:
+    """
+    Decides which embedded logs are worth an LLM call.
+
+    A log's novelty score is the (squared L2) distance to its nearest neighbour already in the FAISS
+    index. Logs farther than ``NOVELTY_THRESHOLD`` are novel. Every log's pattern is counted per day
+    in the history store; a known pattern is still analysed when it is rising, i.e. today's count is
+    at least ``NOVELTY_RISING_MIN`` and more than ``NOVELTY_RISING_FACTOR`` times its daily average
+    over the previous ``NOVELTY_BASELINE_DAYS`` (checked once per pattern and day, on the run that
+    crosses that bar). A threshold of 0 disables the filter.
+    """
+
+    def __init__(self, threshold: Optional[float] = None, rising_factor: Optional[float] = None,
+                 rising_min: Optional[int] = None, baseline_days: Optional[int] = None,
+                 history=None):
+        self.logger = setup_logger()
+        if threshold is None:
+            threshold = get_config("NOVELTY_THRESHOLD", default=0.15)
+        self.threshold = float(threshold or 0)
+        self.rising_factor = float(rising_factor
+                                   or get_config("NOVELTY_RISING_FACTOR", default=3.0))
+        self.rising_min = int(rising_min or get_config("NOVELTY_RISING_MIN", default=10))
+        self.baseline_days = int(baseline_days or get_config("NOVELTY_BASELINE_DAYS", default=7))
+        self.history = history
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def _is_rising(self, today: int, average: float) -> bool:
+        return today >= self.rising_min and today > self.rising_factor * max(average, 1.0)
+
+    def select(self, batch: EmbeddedBatch, scores: np.ndarray) -> Tuple[List[int], Dict]:
+        """
+        Indices of the logs to analyse (novel or rising, in batch order) and counts for reporting.
+        """
+        novel = np.asarray(scores) > self.threshold
+        keys = [pattern_key(log) + (log_day(log),) for log in batch.logs]
+        counts = Counter()
+        for key, log in zip(keys, batch.logs):
+            counts[key] += int(log.get("occurrences", 1) or 1)
+        rising = set()
+        if self.history is not None:
+            self.history.bump_patterns(dict(counts))
+            known_by_day: Dict[str, set] = {}
+            for key, is_novel in zip(keys, novel):
+                if not is_novel:
+                    known_by_day.setdefault(key[2], set()).add(key[:2])
+            for day, known in known_by_day.items():
+                trends = self.history.pattern_trends(sorted(known), day, self.baseline_days)
+                for key, (today, average) in trends.items():
+                    # Only the run that pushes a pattern over the bar re-analyses it, not every
+                    # later poll that day
+                    before = today - counts[key + (day,)]
+                    if self._is_rising(today, average) and not self._is_rising(before, average):
+                        rising.add(key + (day,))
+        selected = [i for i, key in enumerate(keys) if novel[i] or key in rising]
+        stats = {
+            "novel": int(novel.sum()),
+            "rising": sum(1 for i, key in enumerate(keys) if not novel[i] and key in rising),
+            "known": len(keys) - len(selected),
+        }
+        self.logger.info(f"Novelty filter: {stats['novel']} novel, {stats['rising']} rising, "
+                         f"{stats['known']} known of {len(keys)} logs.")
+        return selected, stats
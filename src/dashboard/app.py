@@ -2,9 +2,15 @@
 import os
 import sys
 import json
-from flask import Flask, render_template, request, redirect, url_for, flash
+from flask import (
+    Flask, Response, jsonify, render_template, request, redirect, url_for, flash,
+    stream_with_context,
+)
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from slack_integration.slack_notifier import SlackNotifier
+from history.history_store import HistoryStore, GRANULARITIES
+from llm.llm_processor import LLMProcessor
+from redaction.redactor import get_default_redactor
 from logging_utils.logger import setup_logger
 from src.config import get_config
 
@@ -12,94 +18,89 @@ app = Flask(__name__, template_folder="templates")
 app.secret_key = get_config("DASHBOARD_SECRET_KEY", default="change-this-to-a-very-secret-key")
 logger = setup_logger()
 
+_history_store = None
+_vector_db = None
+
+def get_history_store() -> HistoryStore:
+    """RCA/fix history shared by all requests, opened on first use."""
+    global _history_store
+    if _history_store is None:
+        _history_store = HistoryStore()
+    return _history_store
+
+def get_vector_db():
+    """
+    Read-only view of the pipeline's vector store, opened on first use. The index is
+    memory-mapped, so all dashboard workers share one copy in the page cache, and it reloads when
+    the pipeline publishes.
+    """
+    global _vector_db
+    if _vector_db is None:
+        # Imported here so dashboard workers only load faiss once a page needs the index
+        from vector_db.sharded_db import open_vector_db
+        _vector_db = open_vector_db(read_only=True)
+    return _vector_db
+
 @app.route("/metrics")
 def metrics():
-    history = load_history()
-    # Prepare data for charts
-    from collections import Counter, defaultdict
-    import datetime
-    # Timeline: count by day
-    timeline = defaultdict(int)
-    for entry in history:
-        ts = entry.get("timestamp", "")[:10]
-        if ts:
-            timeline[ts] += 1
-    timeline_sorted = sorted(timeline.items())
-    # By service
-    service_counts = Counter(e.get("container_name", "unknown") for e in history)
-    # By namespace
-    namespace_counts = Counter(e.get("namespace_name", "unknown") for e in history)
-    # By level
-    level_counts = Counter(e.get("level", "unknown") for e in history)
+    # Optional ?from=YYYY-MM-DD&to=YYYY-MM-DD&granularity=day|hour, all served from the rollup
+    # tables
+    since = request.args.get("from", "").strip()
+    until = request.args.get("to", "").strip()
+    granularity = request.args.get("granularity", "day")
+    if granularity not in GRANULARITIES:
+        granularity = "day"
+    try:
+        counts = get_history_store().metrics(since=since, until=until, granularity=granularity)
+    except ValueError:
+        return "Invalid date range", 400
     return render_template(
         "metrics.html",
-        timeline_labels=[d for d, _ in timeline_sorted],
-        timeline_values=[c for _, c in timeline_sorted],
-        service_labels=list(service_counts.keys()),
-        service_values=list(service_counts.values()),
-        namespace_labels=list(namespace_counts.keys()),
-        namespace_values=list(namespace_counts.values()),
-        level_labels=list(level_counts.keys()),
-        level_values=list(level_counts.values()),
+        since=since,
+        until=until,
+        granularity=granularity,
+        timeline_labels=[b for b, _ in counts["timeline"]],
+        timeline_values=[c for _, c in counts["timeline"]],
+        service_labels=[k for k, _ in counts["container_name"]],
+        service_values=[c for _, c in counts["container_name"]],
+        namespace_labels=[k for k, _ in counts["namespace_name"]],
+        namespace_values=[c for _, c in counts["namespace_name"]],
+        level_labels=[k for k, _ in counts["level"]],
+        level_values=[c for _, c in counts["level"]],
     )
 
-# For MVP, use a JSON file as persistent storage for RCA/fix history
-def load_history():
-    """Load RCA/fix history from persistent storage."""
-    path = get_config("DASHBOARD_HISTORY_PATH", default="rca_history.json")
-    if os.path.exists(path):
-        try:
-            with open(path, "r") as f:
-                content = f.read().strip()
-                if not content:
-                    return []
-                return json.loads(content)
-        except Exception as e:
-            logger.warning(f"Could not load dashboard history: {e}")
-            return []
-    return []
-
 @app.route("/")
 def home():
-    history = load_history()
     # Get search params
     service = request.args.get("service", "").strip().lower()
     namespace = request.args.get("namespace", "").strip().lower()
     level = request.args.get("level", "").strip().lower()
     keyword = request.args.get("keyword", "").strip().lower()
-    # Filter
-    def match(entry):
-        if service and service not in (entry.get("container_name", "").lower()):
-            return False
-        if namespace and namespace not in (entry.get("namespace_name", "").lower()):
-            return False
-        if level and level != (entry.get("level", "").lower()):
-            return False
-        if keyword:
-            # Search in llm_output, logs, similar logs
-            text = json.dumps(entry).lower()
-            if keyword not in text:
-                return False
-        return True
-    filtered = [e for e in history if match(e)]
-    # Sort by most recent
-    filtered = sorted(filtered, key=lambda x: x.get("timestamp", ""), reverse=True)
-    return render_template("home.html", history=filtered, service=service, namespace=namespace, level=level, keyword=keyword)
-
-
-# Utility function, not a route
-def save_history(history):
-    """Save RCA/fix history to persistent storage."""
-    path = get_config("DASHBOARD_HISTORY_PATH", default="rca_history.json")
-    with open(path, "w") as f:
-        json.dump(history, f, indent=2)
+    page = request.args.get("page", 1, type=int) or 1
+    page_size = int(get_config("DASHBOARD_PAGE_SIZE", default=50))
+    # Filtering, keyword search and sorting (most recent first) run in SQLite
+    history, has_next = get_history_store().search(
+        service=service, namespace=namespace, level=level, keyword=keyword, page=page,
+        page_size=page_size
+    )
+    return render_template(
+        "home.html", history=history, service=service, namespace=namespace, level=level,
+        keyword=keyword, page=max(page, 1), has_next=has_next,
+    )
 
 @app.route("/rca/<int:idx>", methods=["GET", "POST"])
 def rca_detail(idx):
-    history = load_history()
-    if not (0 <= idx < len(history)):
+    store = get_history_store()
+    if request.method == "POST":
+        # Save feedback
+        feedback_type = request.form.get("feedback_type")
+        comment = request.form.get("comment", "").strip()
+        if not store.update_feedback(idx, vote=feedback_type, comment=comment):
+            return "Not found", 404
+        return redirect(url_for("rca_detail", idx=idx))
+    entry = store.get(idx)
+    if entry is None:
         return "Not found", 404
-    entry = history[idx]
     feedback = entry.get("feedback", {})
     # Remove 'embedding' from logs for display
     def strip_embedding(logs):
@@ -112,35 +113,104 @@ def rca_detail(idx):
         entry_display["batch_logs"] = strip_embedding(entry_display["batch_logs"])
     if "similar_logs" in entry_display:
         entry_display["similar_logs"] = strip_embedding(entry_display["similar_logs"])
-    if request.method == "POST":
-        # Save feedback
-        feedback_type = request.form.get("feedback_type")
-        comment = request.form.get("comment", "").strip()
-        feedback = feedback or {}
-        if feedback_type in ("up", "down"):
-            feedback["vote"] = feedback_type
-        if comment:
-            feedback["comment"] = comment
-        entry["feedback"] = feedback
-        history[idx] = entry
-        save_history(history)
-        return redirect(url_for("rca_detail", idx=idx))
     return render_template("rca_detail.html", entry=entry_display, idx=idx, feedback=feedback)
 
+@app.route("/rca/<int:idx>/similar")
+def similar_rcas(idx):
+    """
+    Nearest past RCAs: the stored logs closest to this entry's embedding centroid, mapped back to
+    the entries that analysed them.
+    """
+    from vector_db.faiss_db import FaissVectorDB
+    store = get_history_store()
+    if store.get(idx) is None:
+        return "Not found", 404
+    limit = request.args.get("k", type=int) or int(get_config("DASHBOARD_SIMILAR_K", default=5))
+    limit = min(max(limit, 1), 50)
+    vector = store.get_vector(idx)
+    if vector is None:
+        # Entries saved before vectors were recorded
+        return jsonify({"id": idx, "similar": []})
+    db = get_vector_db()
+    # Neighbouring logs often belong to the same incident or were never analysed, so over-fetch
+    D, ids = db.search_batch(vector, k=limit * 10)
+    distances = {}
+    for row in (db.get_rows(ids[0], D[0]) if ids.shape[1] else []):
+        distances.setdefault(FaissVectorDB.content_digest(row), row["distance"])
+    best = {}
+    for digest, entry_ids in store.entries_for_digests(distances).items():
+        for entry_id in entry_ids:
+            if entry_id != idx:
+                best[entry_id] = min(best.get(entry_id, distances[digest]), distances[digest])
+    similar = []
+    for entry_id, distance in sorted(best.items(), key=lambda item: item[1])[:limit]:
+        entry = store.get(entry_id)
+        if entry is None:
+            continue
+        similar.append({
+            "id": entry_id,
+            "distance": round(distance, 4),
+            "timestamp": entry["timestamp"],
+            "container_name": entry["container_name"],
+            "namespace_name": entry["namespace_name"],
+            "level": entry["level"],
+            "summary": entry["llm_output"][:200],
+        })
+    return jsonify({"id": idx, "similar": similar})
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route("/rca/<int:idx>/stream")
+def stream_rca(idx):
+    """
+    Regenerate an entry's RCA from its stored logs and RAG context, streaming tokens as server-sent
+    events.
+    """
+    store = get_history_store()
+    entry = store.get(idx)
+    if entry is None:
+        return "Not found", 404
+    # One processor per request: each stream records its own timing stats
+    processor = LLMProcessor(slack_enabled=False)
+    prompt = processor.build_prompt(entry.get("batch_logs", []), entry.get("similar_logs", []),
+                                    entry.get("incident_size"))
+
+    def events():
+        pieces = []
+        try:
+            for piece in processor.stream_ollama(prompt):
+                pieces.append(piece)
+                yield _sse("token", {"text": piece})
+        except Exception as e:
+            logger.error(f"Streaming RCA for entry {idx} failed: {e}")
+            yield _sse("error", {"message": "LLM processing failed."})
+            return
+        store.update_llm_output(idx, "".join(pieces), processor.last_llm_stats)
+        yield _sse("done", {"id": idx, "stats": processor.last_llm_stats})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # Share to Slack endpoint
 @app.route("/rca/<int:idx>/share_slack", methods=["POST"])
 def share_to_slack(idx):
-    history = load_history()
-    if not (0 <= idx < len(history)):
+    entry = get_history_store().get(idx)
+    if entry is None:
         return "Not found", 404
-    entry = history[idx]
-    # Format message
+    # Format message; only free text is redacted, so epoch-ms timestamps are not taken for cards
+    redactor = get_default_redactor()
     msg = f"*AI RCA & Fix Suggestion:*\n*Logs:*\n"
     for log in entry.get("batch_logs", []):
         namespace = log.get('namespace_name', '')
         namespace_text = f" | {namespace}" if namespace else ""
-        msg += f"- {log.get('timestamp', '')} | {log.get('container_name', '')} | {log.get('level', '')}{namespace_text} | {log.get('message', '')}\n"
-    msg += f"\n*RCA & Fix:*\n{entry.get('llm_output', '')}"
+        message = redactor.redact(log.get('message') or '')
+        msg += (f"- {log.get('timestamp', '')} | {log.get('container_name', '')} | "
+                f"{log.get('level', '')}{namespace_text} | {message}\n")
+    msg += f"\n*RCA & Fix:*\n{redactor.redact(entry.get('llm_output') or '')}"
     try:
         notifier = SlackNotifier()
         ok = notifier.send_message(msg)
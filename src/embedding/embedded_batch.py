@@ -0,0 +1,51 @@
+import numpy as np
+from collections.abc import Sequence
+from typing import Dict, List
+
+class EmbeddedBatch(Sequence):
+    """
+    Log records together with their embeddings as one contiguous float32 (n, d) matrix.
+
+    ``FaissVectorDB.add_logs``/``search_batch`` and ``LLMProcessor`` read ``embeddings``
+    directly, so vectors are never round-tripped through Python lists. Indexing returns the
+    old per-log dict with an ``"embedding"`` row view, and slicing returns a batch that shares
+    the parent's matrix.
+    """
+
+    def __init__(self, logs: List[Dict], embeddings: np.ndarray):
+        self.logs = list(logs)
+        self.embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if len(self.logs) != len(self.embeddings):
+            raise ValueError(f"EmbeddedBatch has {len(self.logs)} logs but "
+                             f"{len(self.embeddings)} embeddings")
+
+    @classmethod
+    def from_logs(cls, logs: List[Dict]) -> "EmbeddedBatch":
+        """Build a batch from dicts carrying an ``"embedding"`` list."""
+        if isinstance(logs, cls):
+            return logs
+        records = [{k: v for k, v in log.items() if k != "embedding"} for log in logs]
+        embeddings = np.array([log["embedding"] for log in logs], dtype=np.float32)
+        return cls(records, embeddings)
+
+    @property
+    def dim(self) -> int:
+        return self.embeddings.shape[1] if self.embeddings.ndim == 2 else 0
+
+    def __len__(self) -> int:
+        return len(self.logs)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return EmbeddedBatch(self.logs[item], self.embeddings[item])
+        log = dict(self.logs[item])
+        log["embedding"] = self.embeddings[item]
+        return log
+
+    def select(self, indices) -> "EmbeddedBatch":
+        indices = np.asarray(indices, dtype=np.int64)
+        return EmbeddedBatch([self.logs[i] for i in indices], self.embeddings[indices])
+
+    def to_dicts(self) -> List[Dict]:
+        """Legacy dict-of-lists format, with each embedding as a Python list."""
+        return [dict(log, embedding=emb.tolist()) for log, emb in zip(self.logs, self.embeddings)]
@@ -1,33 +1,197 @@
-from typing import List, Dict, Optional
-from sentence_transformers import SentenceTransformer
+import atexit
+import inspect
+import os
+import numpy as np
+from typing import List, Dict, Optional, Tuple
 from logging_utils.logger import setup_logger
 from src.config import get_config
+from embedding.embedding_cache import EmbeddingCache
+from embedding.embedded_batch import EmbeddedBatch
+
+# sentence_transformers pulls in torch and transformers (seconds of import time), so it is
+# imported when a model is first loaded rather than when this module is
+SentenceTransformer = None
+
+def _sentence_transformer():
+    global SentenceTransformer
+    if SentenceTransformer is None:
+        from sentence_transformers import SentenceTransformer
+    return SentenceTransformer
+
+BACKENDS = ("torch", "onnx")
+# Estimated-token ceilings of the length buckets; longer texts share the last one (the model
+# truncates them anyway)
+LENGTH_BUCKETS = (16, 32, 64, 128, 256)
+MAX_BUCKET_BATCH = 256
+
+def length_batches(texts: List[str], batch_tokens: int) -> List[Tuple[List[int], int]]:
+    """
+    Group text positions by length bucket (about 4 characters per token) and give each bucket the
+    batch size that keeps ``batch size x bucket length`` near ``batch_tokens``. Short log lines then
+    go through in large batches, and no batch pads short texts to a long one. Positions keep their
+    order within a bucket.
+    """
+    buckets: Dict[int, List[int]] = {}
+    for i, text in enumerate(texts):
+        tokens = len(text) // 4 + 2
+        bucket = next((ceiling for ceiling in LENGTH_BUCKETS if tokens <= ceiling),
+                      LENGTH_BUCKETS[-1])
+        buckets.setdefault(bucket, []).append(i)
+    return [(positions, max(1, min(batch_tokens // bucket, MAX_BUCKET_BATCH)))
+            for bucket, positions in sorted(buckets.items())]
 
 class LogEmbedder:
+    """
+    Sentence-transformer embeddings of log text, with a content-addressed cache in front.
+
+    ``EMBEDDING_BACKEND`` picks the runtime: ``torch`` (default) or ``onnx``, which runs the
+    ``EMBEDDING_ONNX_FILE`` export of the model (by default the int8-quantized one) on ONNX Runtime
+    and needs ``sentence-transformers[onnx]``. ``EMBEDDING_PROCESSES`` > 1 (0 = one per CPU core)
+    shards large encodes across a pool of worker processes, started on first use. Batch sizes come
+    from text length buckets (``length_batches``) sized by ``EMBEDDING_BATCH_TOKENS`` (on by
+    default, 4096); ``0`` disables bucketing and uses the fixed ``EMBEDDING_BATCH_SIZE``. The model
+    itself is loaded on the first cache miss.
+    """
+
     def __init__(self, 
                  model_name: Optional[str] = None, 
                  batch_size: Optional[int] = None, 
-                 fields_to_embed: Optional[List[str]] = None):
+                 fields_to_embed: Optional[List[str]] = None,
+                 cache_path: Optional[str] = None,
+                 backend: Optional[str] = None,
+                 processes: Optional[int] = None,
+                 batch_tokens: Optional[int] = None):
         self.logger = setup_logger()
         self.model_name = model_name or get_config("EMBEDDING_MODEL", default="all-MiniLM-L6-v2")
         self.batch_size = int(batch_size or get_config("EMBEDDING_BATCH_SIZE", default=32))
-        self.fields_to_embed = fields_to_embed or get_config("EMBEDDING_FIELDS", default="message").split(",")
-        self.logger.info(f"Loading embedding model: {self.model_name}")
-        self.model = SentenceTransformer(self.model_name)
-        self.logger.info(f"LogEmbedder initialized with batch size {self.batch_size} and fields {self.fields_to_embed}")
+        self.fields_to_embed = (fields_to_embed
+                                or get_config("EMBEDDING_FIELDS", default="message").split(","))
+        self.backend = (backend or get_config("EMBEDDING_BACKEND", default="torch")).lower()
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown EMBEDDING_BACKEND '{self.backend}', "
+                             f"expected one of {', '.join(BACKENDS)}")
+        if processes is None:
+            processes = get_config("EMBEDDING_PROCESSES", default=1)
+        processes = int(processes)
+        self.processes = processes if processes > 0 else (os.cpu_count() or 1)
+        if batch_tokens is None:
+            batch_tokens = get_config("EMBEDDING_BATCH_TOKENS", default=4096)
+        self.batch_tokens = int(batch_tokens)
+        self._pool = None
+        self._model = None
+        if self.backend == "onnx":
+            self.onnx_file = get_config("EMBEDDING_ONNX_FILE",
+                                        default="onnx/model_quint8_avx2.onnx")
+            # Quantized vectors differ slightly from the torch ones, so they are cached separately
+            self.cache_model_name = f"{self.model_name}#onnx:{self.onnx_file}"
+        else:
+            self.cache_model_name = self.model_name
+        # An empty EMBEDDING_CACHE_PATH disables the cache
+        if cache_path is None:
+            cache_path = get_config("EMBEDDING_CACHE_PATH", default="embedding_cache.sqlite")
+        self.cache = EmbeddingCache(cache_path) if cache_path else None
+        self.logger.info(f"LogEmbedder initialized with batch size {self.batch_size} "
+                         f"and fields {self.fields_to_embed}")
+
+    @property
+    def model(self):
+        # Loaded on the first cache miss, so runs whose texts are all cached never load it
+        if self._model is None:
+            self.logger.info(f"Loading embedding model: {self.model_name} ({self.backend} backend)")
+            if self.backend == "onnx":
+                self._model = _sentence_transformer()(self.model_name, backend="onnx",
+                                                      model_kwargs={"file_name": self.onnx_file})
+            else:
+                self._model = _sentence_transformer()(self.model_name)
+        return self._model
+
+    def _start_pool(self):
+        # Split the cores between workers, so processes x threads does not oversubscribe the CPU
+        threads = str(max((os.cpu_count() or 1) // self.processes, 1))
+        previous = os.environ.get("OMP_NUM_THREADS")
+        os.environ["OMP_NUM_THREADS"] = threads
+        try:
+            self._pool = self.model.start_multi_process_pool(["cpu"] * self.processes)
+        finally:
+            if previous is None:
+                del os.environ["OMP_NUM_THREADS"]
+            else:
+                os.environ["OMP_NUM_THREADS"] = previous
+        atexit.register(self.close)
+        self.logger.info(f"Started {self.processes} embedding worker processes "
+                         f"with {threads} threads each.")
+
+    def close(self):
+        """Stop the worker processes, if any were started."""
+        if self._pool is not None:
+            self.model.stop_multi_process_pool(self._pool)
+            self._pool = None
+
+    def _pool_encode(self, texts: List[str], batch_size: int, chunk_size: int) -> np.ndarray:
+        # encode() takes the pool from sentence-transformers 5.0; older releases only have
+        # encode_multi_process
+        if "pool" in inspect.signature(self.model.encode).parameters:
+            return self.model.encode(texts, batch_size=batch_size, pool=self._pool,
+                                     chunk_size=chunk_size)
+        return self.model.encode_multi_process(texts, self._pool, batch_size=batch_size,
+                                               chunk_size=chunk_size)
+
+    def _model_encode(self, texts: List[str]) -> np.ndarray:
+        # Worker processes only pay off once every worker gets a few batches
+        use_pool = self.processes > 1 and len(texts) >= self.processes * 64
+        if use_pool and self._pool is None:
+            self._start_pool()
+        if self.batch_tokens > 0:
+            batches = length_batches(texts, self.batch_tokens)
+        else:
+            batches = [(list(range(len(texts))), self.batch_size)]
+        embeddings = None
+        for positions, batch_size in batches:
+            bucket = [texts[i] for i in positions]
+            if use_pool:
+                chunk_size = max(-(-len(bucket) // (self.processes * 4)), batch_size)
+                encoded = self._pool_encode(bucket, batch_size, chunk_size)
+            else:
+                encoded = self.model.encode(bucket, batch_size=batch_size,
+                                            show_progress_bar=len(batches) == 1)
+            encoded = np.asarray(encoded, dtype=np.float32)
+            if embeddings is None:
+                embeddings = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+            embeddings[positions] = encoded
+        return embeddings if embeddings is not None else np.empty((0, 0), dtype=np.float32)
 
     def _get_text(self, log: Dict) -> str:
         # Concatenate selected fields for embedding
         return " ".join(str(log.get(f, "")) for f in self.fields_to_embed if log.get(f) is not None)
 
-    def embed_logs(self, logs: List[Dict]) -> List[Dict]:
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        if self.cache is None:
+            return self._model_encode(texts)
+        keys = [EmbeddingCache.make_key(self.cache_model_name, self.fields_to_embed, text)
+                for text in texts]
+        # Repeated texts within the batch are looked up and encoded once
+        first_seen = {}
+        for i, key in enumerate(keys):
+            first_seen.setdefault(key, i)
+        cached = self.cache.get_many(list(first_seen))
+        missing = [key for key in first_seen if key not in cached]
+        if missing:
+            encoded = self._model_encode([texts[first_seen[key]] for key in missing])
+            fresh = dict(zip(missing, encoded))
+            self.cache.put_many(fresh)
+            cached.update(fresh)
+        self.logger.info(f"Embedding cache: {len(first_seen) - len(missing)}/{len(first_seen)} "
+                         f"unique texts hit (lifetime hit rate {self.cache.hit_rate:.1%}).")
+        if not keys:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack([cached[key] for key in keys])
+
+    def embed_logs(self, logs: List[Dict]) -> EmbeddedBatch:
         texts = [self._get_text(log) for log in logs]
         self.logger.info(f"Embedding {len(texts)} logs...")
-        embeddings = self.model.encode(texts, batch_size=self.batch_size, show_progress_bar=True)
-        for log, emb in zip(logs, embeddings):
-            log["embedding"] = emb.tolist() if hasattr(emb, 'tolist') else list(emb)
+        embeddings = self._encode(texts)
         self.logger.info("Embedding complete.")
-        return logs
+        return EmbeddedBatch(logs, embeddings)
 
 if __name__ == "__main__":
     # Example usage
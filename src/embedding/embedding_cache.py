@@ -0,0 +1,104 @@
+import hashlib
+import sqlite3
+import threading
+import time
+import numpy as np
+from typing import Dict, Iterable, List, Optional
+from logging_utils.logger import setup_logger
+from src.config import get_config
+
+class EmbeddingCache:
+    """
+    Content-addressed on-disk cache of float32 embeddings.
+
+    Keys are SHA-256 digests of (model name, embedded fields, text), so a cached vector is only
+    reused for the exact same input to the exact same model. Entries are evicted least recently
+    used first once the cache holds more than ``EMBEDDING_CACHE_MAX_ENTRIES`` vectors.
+    """
+
+    _CHUNK = 500  # stay below SQLite's bound-parameter limit
+
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None):
+        self.logger = setup_logger()
+        self.path = path or get_config("EMBEDDING_CACHE_PATH", default="embedding_cache.sqlite")
+        self.max_entries = int(max_entries
+                               or get_config("EMBEDDING_CACHE_MAX_ENTRIES", default=500000))
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self.conn.commit()
+        self._lock = threading.Lock()
+        self._count = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.logger.info(f"Embedding cache {self.path} opened with {self._count} entries.")
+
+    @staticmethod
+    def make_key(model_name: str, fields: Iterable[str], text: str) -> bytes:
+        h = hashlib.sha256()
+        for part in (model_name, ",".join(fields), text):
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.digest()
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        found = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), self._CHUNK):
+                chunk = keys[i:i + self._CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+                self.conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key, _ in rows],
+                )
+            self.conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items: Dict[bytes, np.ndarray]):
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, np.asarray(vec, dtype=np.float32).tobytes(), now)
+                 for key, vec in items.items()],
+            )
+            self._count += len(items)
+            if self._count > self.max_entries:
+                self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        self._count = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self._count - self.max_entries
+        if excess <= 0:
+            return
+        self.conn.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self._count -= excess
+        self.logger.info(f"Evicted {excess} least recently used embeddings from cache.")
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,401 @@
+import datetime
+import json
+import sqlite3
+import numpy as np
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+from logging_utils.logger import setup_logger
+from src.config import get_config
+from utils.timestamps import to_epoch_ms
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rca_history (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL DEFAULT '',
+    container_name TEXT NOT NULL DEFAULT '' COLLATE NOCASE,
+    namespace_name TEXT NOT NULL DEFAULT '' COLLATE NOCASE,
+    level TEXT NOT NULL DEFAULT '' COLLATE NOCASE,
+    llm_output TEXT NOT NULL DEFAULT '',
+    batch_logs TEXT NOT NULL DEFAULT '[]',
+    similar_logs TEXT NOT NULL DEFAULT '[]',
+    feedback TEXT NOT NULL DEFAULT '{}',
+    extra TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS idx_rca_history_timestamp ON rca_history(timestamp);
+CREATE INDEX IF NOT EXISTS idx_rca_history_container ON rca_history(container_name, timestamp);
+CREATE INDEX IF NOT EXISTS idx_rca_history_namespace ON rca_history(namespace_name, timestamp);
+CREATE INDEX IF NOT EXISTS idx_rca_history_level ON rca_history(level, timestamp);
+CREATE VIRTUAL TABLE IF NOT EXISTS rca_history_fts USING fts5(llm_output, logs);
+CREATE TABLE IF NOT EXISTS rca_rollups (
+    granularity TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    dimension TEXT NOT NULL,
+    value TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (granularity, bucket, dimension, value)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS pattern_counts (
+    pattern TEXT NOT NULL,
+    container_name TEXT NOT NULL,
+    day TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (pattern, container_name, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rca_vectors (
+    id INTEGER PRIMARY KEY,
+    vector BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rca_log_digests (
+    digest INTEGER NOT NULL,
+    entry_id INTEGER NOT NULL,
+    PRIMARY KEY (digest, entry_id)
+) WITHOUT ROWID;
+"""
+
+COLUMNS = ("timestamp", "container_name", "namespace_name", "level", "llm_output")
+JSON_COLUMNS = {"batch_logs": [], "similar_logs": [], "feedback": {}}
+ROLLUP_DIMENSIONS = ("container_name", "namespace_name", "level")
+# Bucket keys are ISO prefixes, so they sort and range-compare as plain strings
+GRANULARITIES = {"day": "%Y-%m-%d", "hour": "%Y-%m-%dT%H"}
+
+def _entry_datetime(value) -> datetime.datetime:
+    ms = to_epoch_ms(value)
+    if ms is None:
+        return datetime.datetime.now(datetime.timezone.utc)
+    return datetime.datetime.fromtimestamp(ms / 1000, tz=datetime.timezone.utc)
+
+def _bucket_bound(value, granularity: str, upper: bool = False) -> Optional[str]:
+    if not value:
+        return None
+    ms = to_epoch_ms(value)
+    if ms is None:
+        raise ValueError(f"Invalid metrics date: {value}")
+    when = datetime.datetime.fromtimestamp(ms / 1000, tz=datetime.timezone.utc)
+    if upper and len(str(value)) == 10:
+        # A bare date as the upper bound covers that whole day
+        when += datetime.timedelta(days=1, microseconds=-1)
+    return when.strftime(GRANULARITIES[granularity])
+
+def _fts_query(keyword: str) -> str:
+    # Quote every term so user input can never be parsed as FTS5 syntax; prefix-match each one
+    terms = keyword.split()
+    return " ".join('"' + term.replace('"', '""') + '"*' for term in terms)
+
+def _like_prefix(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+def _log_text(logs: List[Dict]) -> str:
+    return "\n".join(" ".join(str(v) for v in log.values())
+                     for log in logs if isinstance(log, dict))
+
+class HistoryStore:
+    """
+    SQLite-backed RCA/fix history shared by ``main.py`` and the dashboard.
+
+    Filter columns are indexed, ``llm_output`` and the log text are searchable through an FTS5
+    index, and every append or feedback update is a single transaction, so concurrent writers
+    cannot lose each other's updates. Entry ids are stable and used in dashboard URLs.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.logger = setup_logger()
+        self.path = path or get_config("DASHBOARD_HISTORY_DB", default="rca_history.db")
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            # History written before the rollup tables existed is aggregated once, on first open
+            if conn.execute("SELECT 1 FROM rca_history LIMIT 1").fetchone() and \
+                    not conn.execute("SELECT 1 FROM rca_rollups LIMIT 1").fetchone():
+                self.rebuild_rollups(conn)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _insert(self, conn, entry: Dict, entry_id: Optional[int] = None) -> int:
+        values = {col: str(entry.get(col) or "") for col in COLUMNS}
+        for col, default in JSON_COLUMNS.items():
+            values[col] = json.dumps(entry.get(col) or default, default=str)
+        known = set(COLUMNS) | set(JSON_COLUMNS) | {"id"}
+        extra = {k: v for k, v in entry.items() if k not in known}
+        values["extra"] = json.dumps(extra, default=str)
+        if entry_id is not None:
+            values["id"] = entry_id
+        cols = ", ".join(values)
+        cur = conn.execute(
+            f"INSERT INTO rca_history ({cols}) VALUES ({', '.join('?' * len(values))})",
+            list(values.values()),
+        )
+        row_id = cur.lastrowid
+        logs_text = _log_text((entry.get("batch_logs") or []) + (entry.get("similar_logs") or []))
+        conn.execute(
+            "INSERT INTO rca_history_fts (rowid, llm_output, logs) VALUES (?, ?, ?)",
+            (row_id, values["llm_output"], logs_text),
+        )
+        self._bump_rollups(conn, values)
+        return row_id
+
+    @staticmethod
+    def _bump_rollups(conn, values: Dict):
+        when = _entry_datetime(values["timestamp"])
+        rows = []
+        for granularity, fmt in GRANULARITIES.items():
+            bucket = when.strftime(fmt)
+            rows.append((granularity, bucket, "all", ""))
+            for dimension in ROLLUP_DIMENSIONS:
+                value = values[dimension].lower() or "unknown"
+                rows.append((granularity, bucket, dimension, value))
+        conn.executemany(
+            "INSERT INTO rca_rollups (granularity, bucket, dimension, value, count) "
+            "VALUES (?, ?, ?, ?, 1) "
+            "ON CONFLICT (granularity, bucket, dimension, value) DO UPDATE SET count = count + 1",
+            rows,
+        )
+
+    def rebuild_rollups(self, conn=None):
+        """Recompute the metrics rollups from the full history."""
+        if conn is None:
+            with self._connect() as conn:
+                return self.rebuild_rollups(conn)
+        with conn:
+            conn.execute("DELETE FROM rca_rollups")
+            columns = ", ".join(("timestamp",) + ROLLUP_DIMENSIONS)
+            for row in conn.execute(f"SELECT {columns} FROM rca_history"):
+                self._bump_rollups(conn, dict(row))
+
+    def append(self, entry: Dict, vector: Optional[np.ndarray] = None,
+               log_digests: Optional[Iterable[int]] = None) -> int:
+        """
+        Insert one RCA entry and return its id. ``vector`` (the embedding centroid of the analysed
+        logs) and ``log_digests`` (their vector store content digests) let the dashboard find
+        similar past RCAs; both are stored in the same transaction as the entry.
+        """
+        with self._connect() as conn:
+            with conn:
+                entry_id = self._insert(conn, entry)
+                if vector is not None:
+                    conn.execute("INSERT INTO rca_vectors (id, vector) VALUES (?, ?)",
+                                 (entry_id, np.asarray(vector, dtype=np.float32).tobytes()))
+                if log_digests:
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO rca_log_digests (digest, entry_id) VALUES (?, ?)",
+                        [(int(digest), entry_id) for digest in log_digests],
+                    )
+                return entry_id
+
+    def get_vector(self, entry_id: int) -> Optional[np.ndarray]:
+        """The embedding centroid stored with an entry, or None for entries saved without one."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT vector FROM rca_vectors WHERE id = ?",
+                               (entry_id,)).fetchone()
+        return np.frombuffer(row["vector"], dtype=np.float32) if row else None
+
+    def entries_for_digests(self, digests: Iterable[int]) -> Dict[int, List[int]]:
+        """``{log digest: [ids of the entries that analysed that log]}``."""
+        digests = list({int(digest) for digest in digests})
+        found: Dict[int, List[int]] = {}
+        with self._connect() as conn:
+            # Chunked to stay under SQLite's bound-parameter limit
+            for pos in range(0, len(digests), 500):
+                chunk = digests[pos:pos + 500]
+                rows = conn.execute(
+                    "SELECT digest, entry_id FROM rca_log_digests "
+                    f"WHERE digest IN ({', '.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for digest, entry_id in rows:
+                    found.setdefault(digest, []).append(entry_id)
+        return found
+
+    @staticmethod
+    def _to_entry(row: sqlite3.Row) -> Dict:
+        entry = json.loads(row["extra"])
+        entry["id"] = row["id"]
+        for col in COLUMNS:
+            entry[col] = row[col]
+        for col in JSON_COLUMNS:
+            entry[col] = json.loads(row[col])
+        return entry
+
+    def get(self, entry_id: int) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM rca_history WHERE id = ?", (entry_id,)).fetchone()
+        return self._to_entry(row) if row else None
+
+    def search(self, service: str = "", namespace: str = "", level: str = "", keyword: str = "",
+               page: int = 1, page_size: int = 50) -> Tuple[List[Dict], bool]:
+        """Return one page of matching entries, newest first, and whether another page follows."""
+        where, params = [], []
+        # Case-insensitive prefix matches on the NOCASE columns, so SQLite can range-scan
+        # idx_rca_history_container/namespace (a bound pattern keeps the LIKE optimization)
+        if service:
+            where.append("h.container_name LIKE ? ESCAPE '\\'")
+            params.append(_like_prefix(service))
+        if namespace:
+            where.append("h.namespace_name LIKE ? ESCAPE '\\'")
+            params.append(_like_prefix(namespace))
+        if level:
+            where.append("h.level = ?")
+            params.append(level)
+        if keyword.strip():
+            where.append(
+                "h.id IN (SELECT rowid FROM rca_history_fts WHERE rca_history_fts MATCH ?)")
+            params.append(_fts_query(keyword))
+        sql = "SELECT h.* FROM rca_history h"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY h.timestamp DESC, h.id DESC LIMIT ? OFFSET ?"
+        page = max(int(page), 1)
+        params += [page_size + 1, (page - 1) * page_size]
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [self._to_entry(row) for row in rows[:page_size]], len(rows) > page_size
+
+    def update_feedback(self, entry_id: int, vote: Optional[str] = None,
+                        comment: Optional[str] = None) -> bool:
+        with self._connect() as conn:
+            with conn:
+                # BEGIN IMMEDIATE takes the write lock before reading, so concurrent votes serialize
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute("SELECT feedback FROM rca_history WHERE id = ?",
+                                   (entry_id,)).fetchone()
+                if row is None:
+                    return False
+                feedback = json.loads(row["feedback"])
+                if vote in ("up", "down"):
+                    feedback["vote"] = vote
+                if comment:
+                    feedback["comment"] = comment
+                conn.execute("UPDATE rca_history SET feedback = ? WHERE id = ?",
+                             (json.dumps(feedback), entry_id))
+        return True
+
+    def update_llm_output(self, entry_id: int, llm_output: str,
+                          llm_stats: Optional[Dict] = None) -> bool:
+        """Replace an entry's RCA text (e.g. after regenerating it), keeping search consistent."""
+        with self._connect() as conn:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute("SELECT extra FROM rca_history WHERE id = ?",
+                                   (entry_id,)).fetchone()
+                if row is None:
+                    return False
+                extra = json.loads(row["extra"])
+                if llm_stats is not None:
+                    extra["llm_stats"] = llm_stats
+                conn.execute(
+                    "UPDATE rca_history SET llm_output = ?, extra = ? WHERE id = ?",
+                    (llm_output, json.dumps(extra, default=str), entry_id),
+                )
+                conn.execute("UPDATE rca_history_fts SET llm_output = ? WHERE rowid = ?",
+                             (llm_output, entry_id))
+        return True
+
+    def metrics(self, since=None, until=None,
+                granularity: str = "day") -> Dict[str, List[Tuple[str, int]]]:
+        """
+        Incident counts from the precomputed rollups: a ``timeline`` per bucket and totals per
+        service, namespace and level, optionally limited to buckets between ``since`` and
+        ``until`` (inclusive). Cost depends on the number of buckets, not on history size.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown metrics granularity: {granularity}")
+        where, params = ["granularity = ?"], [granularity]
+        lower = _bucket_bound(since, granularity)
+        upper = _bucket_bound(until, granularity, upper=True)
+        if lower:
+            where.append("bucket >= ?")
+            params.append(lower)
+        if upper:
+            where.append("bucket <= ?")
+            params.append(upper)
+        clause = " AND ".join(where)
+        with self._connect() as conn:
+            timeline = conn.execute(
+                f"SELECT bucket, count FROM rca_rollups WHERE {clause} AND dimension = 'all' "
+                "ORDER BY bucket",
+                params,
+            ).fetchall()
+            totals = conn.execute(
+                f"SELECT dimension, value, SUM(count) AS total FROM rca_rollups "
+                f"WHERE {clause} AND dimension != 'all' "
+                "GROUP BY dimension, value ORDER BY total DESC, value",
+                params,
+            ).fetchall()
+        result = {"timeline": [(row[0], row[1]) for row in timeline]}
+        for dimension in ROLLUP_DIMENSIONS:
+            result[dimension] = [(row[1], row[2]) for row in totals if row[0] == dimension]
+        return result
+
+    def bump_patterns(self, counts: Dict[Tuple[str, str, str], int]):
+        """Add ``{(pattern, container_name, day): count}`` to the per-day log pattern counters."""
+        if not counts:
+            return
+        with self._connect() as conn:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO pattern_counts (pattern, container_name, day, count) "
+                    "VALUES (?, ?, ?, ?) ON CONFLICT (pattern, container_name, day) "
+                    "DO UPDATE SET count = count + excluded.count",
+                    [(pattern, container, day, count)
+                     for (pattern, container, day), count in counts.items()],
+                )
+
+    def pattern_trends(self, keys: List[Tuple[str, str]], day: str,
+                       baseline_days: int = 7) -> Dict[Tuple[str, str], Tuple[int, float]]:
+        """
+        ``{(pattern, container_name): (count on day, mean daily count over the baseline_days
+        before it)}``.
+        """
+        start = datetime.date.fromisoformat(day) - datetime.timedelta(days=baseline_days)
+        keys = list(dict.fromkeys(keys))
+        trends = {key: (0, 0.0) for key in keys}
+        with self._connect() as conn:
+            # One query per chunk of keys, chunked to stay under SQLite's bound-parameter limit.
+            # CROSS JOIN keeps the keys as the outer loop, so each one is a primary-key range
+            # search rather than a scan of every pattern
+            for pos in range(0, len(keys), 250):
+                chunk = keys[pos:pos + 250]
+                pairs = ", ".join(["(?, ?)"] * len(chunk))
+                rows = conn.execute(
+                    f"WITH keys (pattern, container_name) AS (VALUES {pairs}) "
+                    "SELECT p.pattern, p.container_name, p.day = ? AS today, SUM(p.count) "
+                    "FROM keys CROSS JOIN pattern_counts p "
+                    "ON p.pattern = keys.pattern AND p.container_name = keys.container_name "
+                    "WHERE p.day >= ? AND p.day <= ? "
+                    "GROUP BY p.pattern, p.container_name, today",
+                    [*(value for key in chunk for value in key), day, start.isoformat(), day],
+                ).fetchall()
+                for pattern, container, today, total in rows:
+                    count, before = trends[(pattern, container)]
+                    if today:
+                        count = total
+                    else:
+                        before = total / baseline_days
+                    trends[(pattern, container)] = (count, before)
+        return trends
+
+    def import_json(self, json_path: str) -> int:
+        """
+        Import a legacy ``rca_history.json``; entry ids keep the old list positions so links
+        still work.
+        """
+        with open(json_path, "r") as f:
+            content = f.read().strip()
+        history = json.loads(content) if content else []
+        imported = 0
+        with self._connect() as conn:
+            with conn:
+                for idx, entry in enumerate(history):
+                    if conn.execute("SELECT 1 FROM rca_history WHERE id = ?", (idx,)).fetchone():
+                        continue
+                    self._insert(conn, entry, entry_id=idx)
+                    imported += 1
+        self.logger.info(f"Imported {imported} of {len(history)} RCA entries from {json_path} "
+                         f"into {self.path}")
+        return imported
@@ -0,0 +1,31 @@
+"""
+Import a legacy JSON RCA history file into the SQLite history store. Entry ids keep their old
+list positions, so dashboard links still work; entries already imported are skipped.
+
+    python src/history/import_history.py          # DASHBOARD_HISTORY_PATH or rca_history.json
+    python src/history/import_history.py rca_history.json --db rca_history.db
+"""
+import argparse
+import os
+import sys
+from dotenv import load_dotenv
+load_dotenv()
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from history.history_store import HistoryStore
+from src.config import get_config
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Import a JSON RCA history file into the SQLite history store.")
+    parser.add_argument("json_path", nargs="?",
+                        default=get_config("DASHBOARD_HISTORY_PATH", default="rca_history.json"),
+                        help="Legacy JSON history "
+                             "(default: DASHBOARD_HISTORY_PATH or rca_history.json)")
+    parser.add_argument("--db", default=None,
+                        help="SQLite history path "
+                             "(default: DASHBOARD_HISTORY_DB or rca_history.db)")
+    args = parser.parse_args()
+    store = HistoryStore(args.db)
+    count = store.import_json(args.json_path)
+    print(f"Imported {count} entries from {args.json_path} into {store.path}")
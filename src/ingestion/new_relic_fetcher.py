@@ -1,38 +1,47 @@
-
-
 from src.config import get_config
+import datetime
+import re
 import requests
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
+from typing import Dict, Iterator, List, Optional
 from logging_utils.logger import setup_logger
 
+_TIME_UNITS = {"minute": "minutes", "hour": "hours", "day": "days", "week": "weeks"}
+
+def parse_time_window(window: str) -> datetime.timedelta:
+    """Turn an NRQL relative window such as '24 hours ago' into a timedelta (default 24 hours)."""
+    m = re.match(r"\s*(\d+)?\s*(minute|hour|day|week)s?\s+ago", window or "", re.IGNORECASE)
+    if not m:
+        return datetime.timedelta(hours=24)
+    return datetime.timedelta(**{_TIME_UNITS[m.group(2).lower()]: int(m.group(1) or 1)})
+
+def strip_time_clauses(query: str) -> str:
+    """Remove SINCE/UNTIL/LIMIT clauses so a query can be re-issued for an explicit time window."""
+    query = re.sub(r"SINCE [^ ]+( UNTIL [^ ]+)?", "", query, flags=re.IGNORECASE)
+    query = re.sub(r"LIMIT \d+", "", query, flags=re.IGNORECASE)
+    query = re.sub(r"(\d+\s*)?(minutes?|hours?|days?|weeks?) ago", "", query, flags=re.IGNORECASE)
+    return re.sub(r"\s+", " ", query).strip()
+
+def _epoch_ms(dt: datetime.datetime) -> int:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return int(dt.timestamp() * 1000)
+
 
 class NewRelicLogFetcher:
     def validate_log_source_table(self):
         """Check if the log source table is valid by running a simple NRQL query."""
         test_query = f"SELECT count(*) FROM {self.log_source_table} SINCE 1 day ago LIMIT 1"
-        graphql_query = f"""
-        {{
-          actor {{
-            account(id: {self.account_id}) {{
-              nrql(query: \"{test_query}\") {{
-                results
-              }}
-            }}
-          }}
-        }}
-        """
-        headers = {
-            "API-Key": self.api_key,
-            "Content-Type": "application/json"
-        }
-        payload = {"query": graphql_query}
         try:
-            response = requests.post(self.url, headers=headers, json=payload)
-            response.raise_for_status()
-            data = response.json()
-            if data.get("data", {}).get("actor", {}).get("account", {}).get("nrql", {}).get("results") is not None:
+            data = self._post_nrql(test_query)
+            nrql = data.get("data", {}).get("actor", {}).get("account", {}).get("nrql", {})
+            if nrql.get("results") is not None:
                 return True
             else:
-                self.logger.error(f"Log source table '{self.log_source_table}' is invalid or inaccessible. API response: {data}")
+                self.logger.error(f"Log source table '{self.log_source_table}' is invalid or "
+                                  f"inaccessible. API response: {data}")
                 return False
         except Exception as e:
             self.logger.error(f"Error validating log source table '{self.log_source_table}': {e}")
@@ -51,11 +60,20 @@ class NewRelicLogFetcher:
         - NR_TIME_WINDOW
         - NR_LIMIT_COUNT
         - NEW_RELIC_NRQL_QUERY (optional: full custom query)
+        - NR_FETCH_WORKERS, NR_FETCH_WINDOW_MINUTES, NR_FETCH_MIN_WINDOW_SECONDS (windowed fetching)
         """
         self.api_key = get_config("NEW_RELIC_API_KEY", required=True)
         self.account_id = get_config("NEW_RELIC_ACCOUNT_ID", required=True)
-        self.url = "https://api.newrelic.com/graphql"
+        self.url = get_config("NEW_RELIC_GRAPHQL_URL", default="https://api.newrelic.com/graphql")
         self.logger = setup_logger()
+        self.fetch_workers = int(get_config("NR_FETCH_WORKERS", default=4))
+        self.window_minutes = float(get_config("NR_FETCH_WINDOW_MINUTES", default=60))
+        self.min_window_seconds = float(get_config("NR_FETCH_MIN_WINDOW_SECONDS", default=1))
+        # One pooled session shared by every worker thread
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(self.fetch_workers, 1))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
         self.logger.info("Successfully loaded New Relic API key and Account ID from config.")
         # Configurable query parts from config
         self.log_source_table = get_config("NR_LOG_SOURCE_TABLE", default="Log, Log_dev1")
@@ -70,7 +88,8 @@ class NewRelicLogFetcher:
         self.nrql_query = get_config("NEW_RELIC_NRQL_QUERY")
         if not self.nrql_query:
             self.nrql_query = (
-                f"SELECT `level`,`container_name`,`message`,`event`,`namespace_name` FROM {self.log_source_table} "
+                f"SELECT `level`,`container_name`,`message`,`event`,`namespace_name` "
+                f"FROM {self.log_source_table} "
                 f"WHERE `namespace_name` = '{self.namespace_name}' "
                 f"AND `message` NOT LIKE '{self.message_health_filter}' "
                 f"AND `message` NOT LIKE '{self.message_http_filter}' "
@@ -79,8 +98,7 @@ class NewRelicLogFetcher:
                 f"SINCE {self.time_window} LIMIT {self.limit_count}"
             )
 
-    def fetch_logs(self, nrql_query=None, debug=False):
-        query = nrql_query or self.nrql_query
+    def _post_nrql(self, query: str) -> Dict:
         graphql_query = f"""
         {{
           actor {{
@@ -97,9 +115,13 @@ class NewRelicLogFetcher:
             "Content-Type": "application/json"
         }
         payload = {"query": graphql_query}
-        response = requests.post(self.url, headers=headers, json=payload)
+        response = self.session.post(self.url, headers=headers, json=payload)
         response.raise_for_status()
-        data = response.json()
+        return response.json()
+
+    def fetch_logs(self, nrql_query=None, debug=False):
+        query = nrql_query or self.nrql_query
+        data = self._post_nrql(query)
         # Robust error handling for missing/malformed responses
         try:
             logs = data["data"]["actor"]["account"]["nrql"]["results"]
@@ -112,6 +134,65 @@ class NewRelicLogFetcher:
             self.logger.info(f"Raw API response: {data}")
         return logs
 
+    def _fetch_window(self, base_query: str, since_ms: int, until_ms: int,
+                      limit: int) -> List[Dict]:
+        data = self._post_nrql(f"{base_query} SINCE {since_ms} UNTIL {until_ms} LIMIT {limit}")
+        try:
+            return data["data"]["actor"]["account"]["nrql"]["results"]
+        except Exception as e:
+            raise RuntimeError(f"Malformed response from New Relic API for window "
+                               f"{since_ms}-{until_ms}: {data}") from e
+
+    def fetch_logs_windowed(self,
+                            since: datetime.datetime,
+                            until: datetime.datetime,
+                            nrql_query: Optional[str] = None,
+                            limit: Optional[int] = None) -> Iterator[List[Dict]]:
+        """
+        Fetch [since, until) as concurrent sub-window queries, yielding each window's logs as it
+        completes.
+
+        Windows are ``NR_FETCH_WINDOW_MINUTES`` long and run on ``NR_FETCH_WORKERS`` threads.
+        A window that returns ``limit`` rows may have been truncated, so it is split in half and
+        both halves are re-fetched, down to ``NR_FETCH_MIN_WINDOW_SECONDS``.
+        """
+        base_query = strip_time_clauses(nrql_query or self.nrql_query)
+        limit = int(limit or self.limit_count)
+        since_ms, until_ms = _epoch_ms(since), _epoch_ms(until)
+        step = max(int(self.window_minutes * 60000), 1)
+        min_window = max(int(self.min_window_seconds * 1000), 1)
+        windows = deque((start, min(start + step, until_ms))
+                        for start in range(since_ms, until_ms, step))
+        total = 0
+        workers = max(self.fetch_workers, 1)
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="nr-fetch")
+        pending = {}
+        try:
+            while windows or pending:
+                # At most 2x workers windows in flight, so a slow consumer bounds how much is
+                # fetched ahead
+                while windows and len(pending) < 2 * workers:
+                    s, e = windows.popleft()
+                    pending[pool.submit(self._fetch_window, base_query, s, e, limit)] = (s, e)
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    start, end = pending.pop(future)
+                    logs = future.result()
+                    if len(logs) >= limit:
+                        if end - start > min_window:
+                            mid = start + (end - start) // 2
+                            windows.extendleft([(mid, end), (start, mid)])
+                            continue
+                        self.logger.warning(f"Window {start}-{end} still returns {limit}+ logs at "
+                                            "the minimum window size; results are truncated.")
+                    total += len(logs)
+                    yield logs
+        finally:
+            for future in pending:
+                future.cancel()
+            pool.shutdown(wait=False)
+        self.logger.info(f"Fetched {total} logs from New Relic in windowed mode.")
+
 if __name__ == "__main__":
     fetcher = NewRelicLogFetcher()
     logs = fetcher.fetch_logs(debug=True)
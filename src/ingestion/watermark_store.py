@@ -0,0 +1,56 @@
+import datetime
+import hashlib
+import json
+import os
+import threading
+from typing import Optional
+from logging_utils.logger import setup_logger
+from src.config import get_config
+from ingestion.new_relic_fetcher import strip_time_clauses
+
+class WatermarkStore:
+    """
+    Newest ingested log timestamp (epoch ms) per (account, query), persisted as JSON.
+
+    The query is keyed without its SINCE/UNTIL/LIMIT clauses, so changing the time window or
+    limit keeps the watermark while changing filters starts a fresh one.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.logger = setup_logger()
+        self.path = path or get_config("INGEST_WATERMARK_PATH", default="ingest_watermarks.json")
+        self._lock = threading.Lock()
+        self._marks = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    self._marks = json.load(f)
+            except Exception as e:
+                self.logger.warning(f"Could not load ingestion watermarks from {self.path}: {e}")
+
+    @staticmethod
+    def key(account_id, query: str) -> str:
+        digest = hashlib.sha256(strip_time_clauses(query).encode("utf-8")).hexdigest()[:16]
+        return f"{account_id}:{digest}"
+
+    def get(self, account_id, query: str) -> Optional[int]:
+        mark = self._marks.get(self.key(account_id, query))
+        return mark["timestamp_ms"] if mark else None
+
+    def set(self, account_id, query: str, timestamp_ms: int):
+        key = self.key(account_id, query)
+        with self._lock:
+            current = self._marks.get(key)
+            if current and current["timestamp_ms"] >= timestamp_ms:
+                return
+            self._marks[key] = {
+                "timestamp_ms": int(timestamp_ms),
+                "updated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            }
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._marks, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        self.logger.info(f"Ingestion watermark for {key} advanced to {timestamp_ms}")
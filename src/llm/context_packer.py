@@ -0,0 +1,159 @@
+import math
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+from src.config import get_config
+from utils.timestamps import timestamp_sort_key
+
+PROMPT_HEADER = """
+Given the following logs and similar past incidents, summarize the root cause and suggest a fix.
+
+"""
+PROMPT_FOOTER = "\nRCA and Fix Suggestion:"
+_WORD_RE = re.compile(r"[A-Za-z_]{3,}")
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text and log lines with Llama-family tokenizers
+    return math.ceil(len(text) / 4)
+
+def truncate_message(message: str, max_chars: int, trace_lines: int = 3) -> str:
+    """Shorten a message; stack traces keep their first line and last ``trace_lines`` frames."""
+    message = str(message or "")
+    lines = message.splitlines()
+    if len(lines) > trace_lines + 1:
+        omitted = len(lines) - trace_lines - 1
+        message = "\n".join([lines[0], f"  ... {omitted} lines omitted ..."] + lines[-trace_lines:])
+    if len(message) > max_chars:
+        message = message[:max_chars].rstrip() + " ...[truncated]"
+    return message
+
+def collapse_repeats(logs: List[Dict]) -> List[Dict]:
+    """
+    Merge logs with the same container, level and message into one log with an occurrence count.
+    """
+    merged: Dict[Tuple, Dict] = {}
+    for log in logs:
+        key = (log.get("container_name", ""), log.get("level", ""), log.get("message", ""))
+        seen = merged.get(key)
+        if seen is None:
+            merged[key] = dict(log)
+            continue
+        first = seen.get("first_seen", seen.get("timestamp", ""))
+        last = seen.get("last_seen", seen.get("timestamp", ""))
+        stamps = [s for s in (first, last, log.get("first_seen", log.get("timestamp", "")),
+                              log.get("last_seen", log.get("timestamp", ""))) if s != ""]
+        seen["occurrences"] = seen.get("occurrences", 1) + log.get("occurrences", 1)
+        if stamps:
+            seen["first_seen"] = min(stamps, key=timestamp_sort_key)
+            seen["last_seen"] = max(stamps, key=timestamp_sort_key)
+        if "distance" in log:
+            # A merged RAG hit is as close as its closest copy
+            seen["distance"] = min(float(seen.get("distance", log["distance"])),
+                                   float(log["distance"]))
+    return list(merged.values())
+
+def _words(log: Dict) -> frozenset:
+    return frozenset(_WORD_RE.findall(str(log.get("template") or log.get("message", "")).lower()))
+
+def rank_by_relevance_and_diversity(logs: List[Dict], diversity: float,
+                                    cost: Optional[Callable[[Dict], int]] = None,
+                                    budget: Optional[int] = None) -> List[Dict]:
+    """
+    Maximal marginal relevance over RAG hits: relevance from the FAISS distance, redundancy as
+    word overlap with the hits already chosen; ``diversity`` (0..1) weighs the latter. With a
+    ``budget``, ranking stops at the first pick whose ``cost`` would exceed it.
+    """
+    relevance = [1.0 / (1.0 + float(log.get("distance", 0.0))) for log in logs]
+    words = [_words(log) for log in logs]
+    # Each candidate's highest overlap with any chosen hit, updated against the newest pick only
+    overlap = [0.0] * len(logs)
+    remaining = list(range(len(logs)))
+    chosen: List[int] = []
+    used = 0
+    while remaining:
+        scores = [(1 - diversity) * relevance[i] - diversity * overlap[i] for i in remaining]
+        best = remaining.pop(max(range(len(remaining)), key=scores.__getitem__))
+        if budget is not None:
+            used += cost(logs[best])
+            if used > budget:
+                break
+        chosen.append(best)
+        for i in remaining:
+            union = len(words[i] | words[best])
+            if union:
+                overlap[i] = max(overlap[i], len(words[i] & words[best]) / union)
+    return [logs[i] for i in chosen]
+
+class ContextPacker:
+    """
+    Builds the RCA prompt within a token budget (``LLM_PROMPT_MAX_TOKENS``).
+
+    Messages are truncated to ``LLM_MESSAGE_MAX_CHARS`` (stack traces keep their head and last
+    frames) and repeated lines are collapsed into counts. Current logs are packed first, leaving at
+    least ``LLM_RAG_BUDGET_SHARE`` of the budget for RAG context; similar logs are then ranked by
+    distance and diversity and packed until the budget runs out.
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None, max_message_chars: Optional[int] = None,
+                 rag_share: Optional[float] = None, diversity: Optional[float] = None):
+        self.max_tokens = int(max_tokens or get_config("LLM_PROMPT_MAX_TOKENS", default=2048))
+        self.max_message_chars = int(max_message_chars
+                                     or get_config("LLM_MESSAGE_MAX_CHARS", default=400))
+        if rag_share is None:
+            rag_share = get_config("LLM_RAG_BUDGET_SHARE", default=0.3)
+        if diversity is None:
+            diversity = get_config("LLM_RAG_DIVERSITY", default=0.3)
+        self.rag_share = float(rag_share)
+        self.diversity = float(diversity)
+
+    def _collapsed(self, logs: List[Dict]) -> List[Dict]:
+        shortened = [dict(log, message=truncate_message(log.get("message", ""),
+                                                        self.max_message_chars))
+                     for log in logs]
+        return collapse_repeats(shortened)
+
+    @staticmethod
+    def _fill(lines: List[str], budget: int) -> Tuple[List[str], int]:
+        taken, used = [], 0
+        for line in lines:
+            cost = estimate_tokens(line)
+            if used + cost > budget:
+                break
+            taken.append(line)
+            used += cost
+        return taken, used
+
+    def pack(self, batch_logs: List[Dict], similar_logs: List[Dict],
+             format_line: Callable[[Dict], str],
+             total_logs: Optional[int] = None) -> Tuple[str, Dict]:
+        current_title = "Current Logs:\n"
+        if total_logs and total_logs > len(batch_logs):
+            current_title = (f"Current Logs ({len(batch_logs)} representative of {total_logs} "
+                             "in this incident):\n")
+        similar_title = "\nSimilar Past Incidents:\n"
+        fixed = estimate_tokens(PROMPT_HEADER + current_title + similar_title + PROMPT_FOOTER)
+        budget = max(self.max_tokens - fixed, 0)
+
+        current_lines = [format_line(log) + "\n" for log in self._collapsed(batch_logs)]
+        # Always show at least one current log, even if it alone exceeds the budget
+        current, used = self._fill(current_lines, max(int(budget * (1 - self.rag_share)), 0))
+        if not current and current_lines:
+            current, used = current_lines[:1], estimate_tokens(current_lines[0])
+        # Only as many hits as fit in the remaining budget are ranked
+        lines: Dict[int, str] = {}
+
+        def cost(log):
+            lines[id(log)] = format_line(log) + "\n"
+            return estimate_tokens(lines[id(log)])
+
+        ranked = rank_by_relevance_and_diversity(self._collapsed(similar_logs), self.diversity,
+                                                 cost, max(budget - used, 0))
+        similar = [lines[id(log)] for log in ranked]
+
+        prompt = "".join([PROMPT_HEADER, current_title, *current, similar_title, *similar,
+                          PROMPT_FOOTER])
+        stats = {
+            "prompt_tokens": estimate_tokens(prompt),
+            "current_logs": f"{len(current)}/{len(current_lines)}",
+            "similar_logs": f"{len(similar)}/{len(similar_logs)}",
+        }
+        return prompt, stats
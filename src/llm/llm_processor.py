@@ -1,19 +1,64 @@
 
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
 from src.config import get_config
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, List, Dict, Any, Callable, Iterator, Optional, Tuple
 from logging_utils.logger import setup_logger
-from vector_db.faiss_db import FaissVectorDB
+from embedding.embedded_batch import EmbeddedBatch
 from slack_integration.slack_notifier import SlackNotifier
+from redaction.redactor import get_default_redactor
+from llm.rca_cache import RCACache, batch_centroid
+from llm.context_packer import ContextPacker
+if TYPE_CHECKING:
+    from vector_db.faiss_db import FaissVectorDB
 
 class LLMProcessor:
-    def __init__(self, ollama_url=None, model=None, rag_k=None, slack_enabled=None, slack_notifier=None):
+    def __init__(self, ollama_url=None, model=None, rag_k=None, slack_enabled=None,
+                 slack_notifier=None, db=None, rca_cache=None):
         self.logger = setup_logger()
-        self.ollama_url = ollama_url or get_config("OLLAMA_URL", default="http://localhost:11434/api/generate")
+        self.ollama_url = ollama_url or get_config("OLLAMA_URL",
+                                                   default="http://localhost:11434/api/generate")
         self.model = model or get_config("LLM_MODEL", default="llama3")
         self.rag_k = int(rag_k or get_config("RAG_TOP_K", default=5))
-        self.db = FaissVectorDB()
-        self.slack_enabled = slack_enabled if slack_enabled is not None else get_config("SLACK_NOTIFY", default="false").lower() == "true"
+        # "namespace" or "container" limits RAG hits to the log's own namespace/container; empty
+        # searches everything
+        scope = get_config("RAG_SCOPE", default="").strip().lower()
+        self.rag_scope_field = {"namespace": "namespace_name",
+                                "container": "container_name"}.get(scope)
+        self.stream = get_config("OLLAMA_STREAM", default="true").lower() == "true"
+        self.connect_timeout = float(get_config("OLLAMA_CONNECT_TIMEOUT", default=10))
+        # Streaming: maximum wait between two chunks; non-streaming: for the whole response
+        self.read_timeout = float(get_config("OLLAMA_READ_TIMEOUT", default=60))
+        # Hard cap on one whole generation, however steadily tokens arrive
+        self.request_timeout = float(get_config("OLLAMA_REQUEST_TIMEOUT", default=600))
+        self.retry_backoff = float(get_config("OLLAMA_RETRY_BACKOFF", default=1.0))
+        self.concurrency = max(int(get_config("LLM_CONCURRENCY", default=2)), 1)
+        # One pooled session shared by every batch worker
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # Per-thread, so concurrent batch workers each report their own call's stats
+        self._local = threading.local()
+        self.redactor = get_default_redactor()
+        self.packer = ContextPacker()
+        # Share the caller's index when given (e.g. the daemon keeps one resident) instead of
+        # reloading it
+        self._db = db
+        # Batch workers can hit the lazy db/rca_cache properties at the same time; build each once
+        self._init_lock = threading.Lock()
+        # An empty RCA_CACHE_PATH disables the semantic RCA cache
+        self.rca_cache_enabled = rca_cache is not None or bool(
+            get_config("RCA_CACHE_PATH", default="rca_cache.faiss"))
+        self._rca_cache = rca_cache
+        if slack_enabled is None:
+            slack_enabled = get_config("SLACK_NOTIFY", default="false").lower() == "true"
+        self.slack_enabled = slack_enabled
         if slack_notifier is not None:
             self.slack_notifier = slack_notifier
         elif self.slack_enabled:
@@ -25,42 +70,172 @@ class LLMProcessor:
                 self.slack_enabled = False
         else:
             self.slack_notifier = None
-        self.logger.info(f"LLMProcessor initialized with model {self.model}, RAG top-k {self.rag_k}")
-
-    def build_prompt(self, batch_logs: List[Dict], similar_logs: List[Dict]) -> str:
-        prompt = """
-Given the following logs and similar past incidents, summarize the root cause and suggest a fix.
-
-Current Logs:
-"""
-        for log in batch_logs:
-            prompt += f"- {log.get('timestamp', '')} | {log.get('container_name', '')} | {log.get('level', '')} | {self._redact(log.get('message', ''))}\n"
-        prompt += "\nSimilar Past Incidents:\n"
-        for log in similar_logs:
-            prompt += f"- {log.get('timestamp', '')} | {log.get('container_name', '')} | {log.get('level', '')} | {self._redact(log.get('message', ''))}\n"
-        prompt += "\nRCA and Fix Suggestion:"
+        self.logger.info(
+            f"LLMProcessor initialized with model {self.model}, RAG top-k {self.rag_k}")
+
+    @property
+    def db(self) -> "FaissVectorDB":
+        # Loaded on first RAG lookup, so prompt-only callers (e.g. the dashboard) never open the
+        # index
+        if self._db is None:
+            with self._init_lock:
+                if self._db is None:
+                    from vector_db.sharded_db import open_vector_db
+                    self._db = open_vector_db()
+        return self._db
+
+    @property
+    def last_llm_stats(self) -> Dict[str, Any]:
+        return getattr(self._local, "llm_stats", {})
+
+    @last_llm_stats.setter
+    def last_llm_stats(self, stats: Dict[str, Any]):
+        self._local.llm_stats = stats
+
+    @property
+    def rca_cache(self) -> Optional[RCACache]:
+        if self._rca_cache is None and self.rca_cache_enabled:
+            with self._init_lock:
+                if self._rca_cache is None:
+                    self._rca_cache = RCACache()
+        return self._rca_cache
+
+    @staticmethod
+    def _batch_embeddings(logs) -> np.ndarray:
+        if isinstance(logs, EmbeddedBatch):
+            return logs.embeddings
+        return np.asarray([log["embedding"] for log in logs if "embedding" in log],
+                          dtype=np.float32)
+
+    def build_prompt(self, batch_logs: List[Dict], similar_logs: List[Dict],
+                     total_logs: Optional[int] = None) -> str:
+        prompt, stats = self.packer.pack(batch_logs, similar_logs, self._format_log_line,
+                                         total_logs)
+        self._local.prompt_stats = stats
+        self.logger.info(f"Prompt packed: ~{stats['prompt_tokens']} tokens "
+                         f"(budget {self.packer.max_tokens}), current logs "
+                         f"{stats['current_logs']}, similar logs {stats['similar_logs']}")
         return prompt
 
+    def _format_log_line(self, log: Dict) -> str:
+        line = (f"- {log.get('timestamp', '')} | {log.get('container_name', '')} | "
+                f"{log.get('level', '')} | {self._redact(log.get('message', ''))}")
+        occurrences = log.get("occurrences", 1)
+        if occurrences > 1:
+            line += (f" (x{occurrences}, first {log.get('first_seen', '')}, "
+                     f"last {log.get('last_seen', '')})")
+        return line
+
     def get_similar_logs(self, logs: List[Dict]) -> List[Dict]:
-        # Use the first log's embedding for RAG context (can be improved to use all)
-        if not logs or "embedding" not in logs[0]:
+        # RAG context from every log in the batch, fetched with a single FAISS search
+        embeddings = self._batch_embeddings(logs)
+        if not len(embeddings):
             return []
-        all_similar = []
-        for log in logs:
-            if "embedding" in log:
-                similar = self.db.search(log["embedding"], k=self.rag_k)
-                all_similar.extend(similar)
-        # Deduplicate by message/timestamp
-        seen = set()
-        deduped = []
-        for log in all_similar:
-            key = (log.get("timestamp"), log.get("message"))
-            if key not in seen:
-                seen.add(key)
-                deduped.append(log)
-        return deduped
-
-    def call_ollama(self, prompt: str, max_retries: int = 3) -> str:
+        if self.rag_scope_field is None or len(logs) != len(embeddings):
+            D, hits = self.db.search_batch(embeddings, k=self.rag_k)
+            ids, dists = hits.ravel(), D.ravel()
+        else:
+            # One filtered search per distinct namespace/container in the batch
+            groups = {}
+            for i, log in enumerate(logs.logs if isinstance(logs, EmbeddedBatch) else logs):
+                groups.setdefault(log.get(self.rag_scope_field), []).append(i)
+            parts = [self.db.search_batch(embeddings[rows], k=self.rag_k,
+                                          filters={self.rag_scope_field: value} if value else None)
+                     for value, rows in groups.items()]
+            ids = np.concatenate([hits.ravel() for _, hits in parts])
+            dists = np.concatenate([D.ravel() for D, _ in parts])
+        valid = ids >= 0
+        ids, dists = ids[valid], dists[valid]
+        # Deduplicate on FAISS id, keeping each id's closest hit, ordered by distance
+        order = np.argsort(dists, kind="stable")
+        ids, dists = ids[order], dists[order]
+        _, first = np.unique(ids, return_index=True)
+        first.sort()
+        return self.db.get_rows(ids[first], dists[first])
+
+    def stream_ollama(self, prompt: str) -> Iterator[str]:
+        """
+        Yield the RCA text piece by piece from Ollama's NDJSON stream. Time-to-first-token and
+        tokens/sec are stored in ``last_llm_stats`` once the stream finishes.
+        """
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": True
+        }
+        start = time.perf_counter()
+        first_token_at = None
+        chunks = 0
+        self.last_llm_stats = {}
+        with self.session.post(self.ollama_url, json=payload, stream=True,
+                               timeout=(self.connect_timeout, self.read_timeout)) as response:
+            response.raise_for_status()
+            # chunk_size=None hands over each chunk as it arrives instead of waiting for a full
+            # buffer
+            for line in response.iter_lines(chunk_size=None):
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(f"Ollama error: {chunk['error']}")
+                if time.perf_counter() - start > self.request_timeout:
+                    raise TimeoutError(f"Ollama generation exceeded {self.request_timeout}s")
+                piece = chunk.get("response", "")
+                if piece:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    chunks += 1
+                    yield piece
+                if chunk.get("done"):
+                    self.last_llm_stats = self._stream_stats(chunk, start, first_token_at, chunks)
+                    break
+        if not self.last_llm_stats:
+            self.last_llm_stats = self._stream_stats({}, start, first_token_at, chunks)
+        stats = self.last_llm_stats
+        self.logger.info(
+            f"Ollama stream finished: {stats['tokens']} tokens, first token after "
+            f"{stats['time_to_first_token_s']}s, {stats['tokens_per_sec']} tokens/s"
+        )
+
+    @staticmethod
+    def _stream_stats(final: Dict, start: float, first_token_at: Optional[float],
+                      chunks: int) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - start
+        # Prefer Ollama's own counters (eval_count, eval_duration in ns); each chunk is ~one token
+        # otherwise
+        tokens = final.get("eval_count", chunks)
+        generation_s = final["eval_duration"] / 1e9 if final.get("eval_duration") else \
+            elapsed - ((first_token_at or start) - start)
+        return {
+            "time_to_first_token_s": (round(first_token_at - start, 3)
+                                      if first_token_at is not None else None),
+            "tokens": tokens,
+            "tokens_per_sec": round(tokens / generation_s, 2) if generation_s > 0 else None,
+            "total_s": round(elapsed, 3),
+            # Ollama's real prompt size and prompt-evaluation time, when reported
+            "prompt_eval_tokens": final.get("prompt_eval_count"),
+            "prompt_eval_s": (round(final["prompt_eval_duration"] / 1e9, 3)
+                              if final.get("prompt_eval_duration") else None),
+        }
+
+    def call_ollama(self, prompt: str, max_retries: int = 3,
+                    on_token: Optional[Callable[[str], None]] = None) -> str:
+        if self.stream:
+            for attempt in range(1, max_retries + 1):
+                pieces = []
+                try:
+                    for piece in self.stream_ollama(prompt):
+                        pieces.append(piece)
+                        if on_token:
+                            on_token(piece)
+                    return "".join(pieces)
+                except Exception as e:
+                    self.logger.error(f"Ollama LLM stream failed (attempt {attempt}): {e}")
+                    # Text already shown to the caller cannot be retracted, so only retry before
+                    # the first token
+                    if pieces or attempt == max_retries:
+                        return "".join(pieces) or "LLM processing failed."
+                    self._backoff(attempt)
         payload = {
             "model": self.model,
             "prompt": prompt,
@@ -68,21 +243,54 @@ Current Logs:
         }
         for attempt in range(1, max_retries + 1):
             try:
-                response = requests.post(self.ollama_url, json=payload, timeout=60)
+                start = time.perf_counter()
+                response = self.session.post(self.ollama_url, json=payload,
+                                             timeout=(self.connect_timeout, self.read_timeout))
                 response.raise_for_status()
                 result = response.json()
+                self.last_llm_stats = self._stream_stats(result, start, None, 0)
                 return result.get("response", "")
             except Exception as e:
                 self.logger.error(f"Ollama LLM call failed (attempt {attempt}): {e}")
                 if attempt == max_retries:
                     return "LLM processing failed."
+                self._backoff(attempt)
 
-    def process_batch(self, batch_logs: List[Dict]) -> Dict[str, Any]:
+    def _backoff(self, attempt: int):
+        # Exponential backoff with jitter, so workers that failed together do not retry in lockstep
+        delay = self.retry_backoff * 2 ** (attempt - 1)
+        time.sleep(delay * (0.5 + np.random.random() / 2))
+
+    def process_batch(self, batch_logs, on_token: Optional[Callable[[str], None]] = None,
+                      total_logs: Optional[int] = None) -> Dict[str, Any]:
         self.logger.info(f"Processing batch of {len(batch_logs)} logs with LLM...")
-        similar_logs = self.get_similar_logs(batch_logs)
-        prompt = self.build_prompt(batch_logs, similar_logs)
-        self.logger.info(f"LLM prompt (redacted):\n{self._redact(prompt)}")
-        llm_output = self.call_ollama(prompt)
+        centroid = None
+        if self.rca_cache_enabled:
+            centroid = batch_centroid(self._batch_embeddings(batch_logs))
+        cached = self.rca_cache.lookup(centroid) if centroid is not None else None
+        if cached:
+            # A near-identical incident was already analysed and not downvoted: reuse its answer
+            similar_logs = cached["similar_logs"]
+            if isinstance(batch_logs, EmbeddedBatch):
+                batch_logs = batch_logs.logs
+            prompt = self.build_prompt(batch_logs, similar_logs, total_logs)
+            llm_output = cached["llm_output"]
+            self.last_llm_stats = {"rca_cache_hit": True, "saved_s": cached.get("latency_s", 0.0)}
+            cache_id = cached["id"]
+            if on_token:
+                on_token(llm_output)
+        else:
+            similar_logs = self.get_similar_logs(batch_logs)
+            if isinstance(batch_logs, EmbeddedBatch):
+                batch_logs = batch_logs.logs
+            prompt = self.build_prompt(batch_logs, similar_logs, total_logs)
+            self.logger.info(f"LLM prompt (redacted):\n{self._redact(prompt)}")
+            start = time.perf_counter()
+            llm_output = self.call_ollama(prompt, on_token=on_token)
+            cache_id = None
+            if centroid is not None and llm_output and llm_output != "LLM processing failed.":
+                cache_id = self.rca_cache.put(centroid, llm_output, similar_logs,
+                                              time.perf_counter() - start)
         self.logger.info(f"LLM output: {self._redact(llm_output)}")
         if self.slack_enabled and self.slack_notifier:
             slack_msg = self._format_slack_message(batch_logs, llm_output)
@@ -91,12 +299,62 @@ Current Logs:
         return {
             "prompt": prompt,
             "llm_output": llm_output,
-            "similar_logs": similar_logs
+            "similar_logs": similar_logs,
+            "llm_stats": dict(self.last_llm_stats, **getattr(self._local, "prompt_stats", {})),
+            "rca_cache_id": cache_id
         }
 
+    def process_batches(self, logs, batch_size: int = 5, concurrency: Optional[int] = None,
+                        on_token: Optional[Callable[[str], None]] = None
+                        ) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+        """
+        Split ``logs`` into batches and run RAG lookup, prompt building and the LLM call for up to
+        ``concurrency`` (default ``LLM_CONCURRENCY``) batches at a time. Yields ``(batch, result)``
+        in batch order, so callers can write history in order. ``on_token`` is only used when
+        batches run one at a time, since concurrent streams would interleave.
+        """
+        batch_size = max(int(batch_size), 1)
+        batches = [logs[i:i + batch_size] for i in range(0, len(logs), batch_size)]
+        jobs = [(batch, batch, None) for batch in batches]
+        self.logger.info(f"Processing {len(logs)} logs in {len(batches)} batches...")
+        yield from self._run_concurrently(jobs, concurrency, on_token)
+
+    def process_incidents(self, incidents, concurrency: Optional[int] = None,
+                          on_token: Optional[Callable[[str], None]] = None
+                          ) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+        """Like ``process_batches``, with one LLM call per incident on its representative sample."""
+        jobs = [(incident, incident.sample, incident.size) for incident in incidents]
+        self.logger.info(f"Processing {len(incidents)} incidents...")
+        yield from self._run_concurrently(jobs, concurrency, on_token)
+
+    def _run_concurrently(self, jobs, concurrency, on_token):
+        # jobs: (key yielded back to the caller, logs for the prompt, total logs the sample stands
+        # for)
+        concurrency = max(int(concurrency or self.concurrency), 1)
+        if concurrency == 1 or len(jobs) <= 1:
+            for key, batch, total in jobs:
+                yield key, self.process_batch(batch, on_token=on_token, total_logs=total)
+            return
+        pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="llm-batch")
+        # Keep at most 2x concurrency batches submitted ahead of the one being yielded
+        pending = []
+        try:
+            for key, batch, total in jobs:
+                pending.append((key, pool.submit(self.process_batch, batch, total_logs=total)))
+                if len(pending) >= 2 * concurrency:
+                    done_key, future = pending.pop(0)
+                    yield done_key, future.result()
+            for done_key, future in pending:
+                yield done_key, future.result()
+            pending = []
+        finally:
+            for _, future in pending:
+                future.cancel()
+            pool.shutdown(wait=False)
+
     def _format_slack_message(self, batch_logs, llm_output):
         # Simple formatting: show RCA/fix, and a summary of the logs
-        log_lines = [f"- {log.get('timestamp', '')} | {log.get('container_name', '')} | {log.get('level', '')} | {self._redact(log.get('message', ''))}" for log in batch_logs]
+        log_lines = [self._format_log_line(log) for log in batch_logs]
         msg = (
             "*AI RCA & Fix Suggestion:*\n"
             "*Logs:*\n" + '\n'.join(log_lines) +
@@ -104,17 +362,14 @@ Current Logs:
         )
         return msg
     def _redact(self, text: str) -> str:
-        # Simple redaction for secrets, emails, tokens, etc. (customize as needed)
-        import re
-        text = re.sub(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+", "[REDACTED_EMAIL]", text)
-        text = re.sub(r"(?i)api[_-]?key\s*[:=]\s*\w+", "api_key=[REDACTED]", text)
-        text = re.sub(r"(?i)token\s*[:=]\s*\w+", "token=[REDACTED]", text)
-        return text
+        # Secrets, emails, tokens, card numbers: see redaction.redactor.DEFAULT_RULES
+        return self.redactor.redact(text)
 
 if __name__ == "__main__":
     # Example usage
     logs = [
-        {"message": "Service crashed with OOM", "timestamp": "2025-07-25T00:00:00Z", "container_name": "svc1", "level": "error", "embedding": [0.1]*384}
+        {"message": "Service crashed with OOM", "timestamp": "2025-07-25T00:00:00Z",
+         "container_name": "svc1", "level": "error", "embedding": [0.1]*384}
     ]
     processor = LLMProcessor()
     result = processor.process_batch(logs)
@@ -0,0 +1,202 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+from typing import Dict, List, Optional
+from logging_utils.logger import setup_logger
+from src.config import get_config
+from history.history_store import HistoryStore
+
+def batch_centroid(embeddings: np.ndarray) -> Optional[np.ndarray]:
+    """Unit-length mean of the L2-normalised log embeddings: the cache key of a batch."""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if embeddings.ndim != 2 or not len(embeddings):
+        return None
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    centroid = (embeddings / np.maximum(norms, 1e-12)).mean(axis=0)
+    norm = np.linalg.norm(centroid)
+    return (centroid / norm if norm > 0 else centroid).astype(np.float32)
+
+class RCACache:
+    """
+    Semantic cache of LLM answers keyed by the embedding centroid of the incident batch.
+
+    Centroids live in a dedicated ``IndexIDMap2`` FAISS index; answers and bookkeeping sit in a
+    JSON sidecar, written when an answer is stored or linked to history. A lookup returns the
+    closest cached RCA within ``RCA_CACHE_MAX_DISTANCE`` (squared L2 between unit centroids, i.e.
+    ``2 - 2 * cosine``) unless it has expired or any dashboard entry that used it was downvoted.
+    Entries expire after ``RCA_CACHE_TTL_HOURS`` and the least recently used are evicted beyond
+    ``RCA_CACHE_MAX_ENTRIES``.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_distance: Optional[float] = None,
+                 ttl_hours: Optional[float] = None, max_entries: Optional[int] = None,
+                 history: Optional[HistoryStore] = None):
+        self.logger = setup_logger()
+        self.path = path or get_config("RCA_CACHE_PATH", default="rca_cache.faiss")
+        if max_distance is None:
+            max_distance = get_config("RCA_CACHE_MAX_DISTANCE", default=0.05)
+        if ttl_hours is None:
+            ttl_hours = get_config("RCA_CACHE_TTL_HOURS", default=168)
+        self.max_distance = float(max_distance)
+        self.ttl = float(ttl_hours) * 3600
+        self.max_entries = int(max_entries or get_config("RCA_CACHE_MAX_ENTRIES", default=1000))
+        self._history = history
+        self._lock = threading.RLock()
+        self.index = None
+        self.entries: Dict[int, Dict] = {}
+        self.stats = {"hits": 0, "misses": 0, "saved_s": 0.0}
+        self._next_id = 0
+        self._load()
+
+    @property
+    def history(self) -> HistoryStore:
+        if self._history is None:
+            self._history = HistoryStore()
+        return self._history
+
+    @property
+    def meta_path(self) -> str:
+        return self.path + ".json"
+
+    def _load(self):
+        if not (os.path.exists(self.path) and os.path.exists(self.meta_path)):
+            return
+        try:
+            import faiss
+            self.index = faiss.read_index(self.path)
+            with open(self.meta_path, "r") as f:
+                meta = json.load(f)
+            self.entries = {int(k): v for k, v in meta["entries"].items()}
+            self.stats.update(meta.get("stats", {}))
+            self._next_id = meta.get("next_id", max(self.entries, default=-1) + 1)
+            self.logger.info(f"RCA cache {self.path} loaded with {len(self.entries)} entries.")
+        except Exception as e:
+            self.logger.warning(f"Could not load RCA cache from {self.path}, starting empty: {e}")
+            self.index, self.entries = None, {}
+
+    @staticmethod
+    def _tmp_path(path: str) -> str:
+        # Unique per save, so two writers of the same cache never rename each other's temp file
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(os.path.abspath(path)),
+                                         prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                         delete=False) as f:
+            return f.name
+
+    def _save(self):
+        if self.index is not None:
+            import faiss
+            tmp_path = self._tmp_path(self.path)
+            try:
+                faiss.write_index(self.index, tmp_path)
+                os.replace(tmp_path, self.path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        tmp_path = self._tmp_path(self.meta_path)
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"entries": self.entries, "stats": self.stats,
+                           "next_id": self._next_id}, f, default=str)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.meta_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _remove(self, ids: List[int]):
+        if not ids:
+            return
+        self.index.remove_ids(np.asarray(ids, dtype=np.int64))
+        for cache_id in ids:
+            self.entries.pop(cache_id, None)
+
+    def _downvoted(self, entry: Dict) -> bool:
+        for history_id in entry.get("history_ids", []):
+            record = self.history.get(history_id)
+            if record and record.get("feedback", {}).get("vote") == "down":
+                return True
+        return False
+
+    def lookup(self, centroid: np.ndarray, k: int = 5) -> Optional[Dict]:
+        """Return ``{"id", "llm_output", "similar_logs", "distance"}`` on a hit, else None."""
+        with self._lock:
+            hit = None
+            stale = []
+            if self.index is not None and self.index.ntotal and self.index.d == len(centroid):
+                D, ids = self.index.search(centroid.reshape(1, -1), min(k, self.index.ntotal))
+                now = time.time()
+                for dist, cache_id in zip(D[0], ids[0]):
+                    if cache_id < 0 or dist > self.max_distance:
+                        break
+                    entry = self.entries[int(cache_id)]
+                    if now - entry["created_at"] > self.ttl or self._downvoted(entry):
+                        stale.append(int(cache_id))
+                        continue
+                    entry["last_used"] = now
+                    hit = dict(entry, id=int(cache_id), distance=float(dist))
+                    break
+                self._remove(stale)
+            # Counters, last_used and stale removals stay in memory until the next put or
+            # attach_history writes the cache, so a lookup never rewrites the sidecar
+            if hit:
+                self.stats["hits"] += 1
+                self.stats["saved_s"] += hit.get("latency_s", 0.0)
+            else:
+                self.stats["misses"] += 1
+            self._log_stats(hit)
+            return hit
+
+    def put(self, centroid: np.ndarray, llm_output: str, similar_logs: List[Dict],
+            latency_s: float) -> int:
+        with self._lock:
+            if self.index is None:
+                import faiss
+                self.index = faiss.IndexIDMap2(faiss.IndexFlatL2(len(centroid)))
+            cache_id = self._next_id
+            self._next_id += 1
+            now = time.time()
+            self.index.add_with_ids(centroid.reshape(1, -1), np.asarray([cache_id], dtype=np.int64))
+            self.entries[cache_id] = {
+                "llm_output": llm_output,
+                "similar_logs": similar_logs,
+                "latency_s": round(latency_s, 3),
+                "created_at": now,
+                "last_used": now,
+                "history_ids": [],
+            }
+            self._evict(now)
+            self._save()
+            return cache_id
+
+    def _evict(self, now: float):
+        expired = [cid for cid, e in self.entries.items() if now - e["created_at"] > self.ttl]
+        self._remove(expired)
+        overflow = len(self.entries) - self.max_entries
+        if overflow > 0:
+            lru = sorted(self.entries, key=lambda cid: self.entries[cid]["last_used"])[:overflow]
+            self._remove(lru)
+
+    def attach_history(self, cache_id: int, history_id: int):
+        """Link a dashboard history entry to the cached answer, so its feedback can veto reuse."""
+        with self._lock:
+            entry = self.entries.get(cache_id)
+            if entry is not None and history_id not in entry["history_ids"]:
+                entry["history_ids"].append(history_id)
+                self._save()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
+
+    def _log_stats(self, hit: Optional[Dict]):
+        outcome = f"hit (distance {hit['distance']:.4f})" if hit else "miss"
+        self.logger.info(
+            f"RCA cache {outcome}; hit rate {self.hit_rate:.1%} over "
+            f"{self.stats['hits'] + self.stats['misses']} lookups, "
+            f"{self.stats['saved_s']:.1f}s of LLM time saved."
+        )
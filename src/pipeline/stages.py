@@ -0,0 +1,124 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from logging_utils.logger import setup_logger
+from src.config import get_config
+
+_DONE = object()
+
+class _Stopped(Exception):
+    pass
+
+class StagePipeline:
+    """
+    Run ``source`` and every stage in its own thread, connected by bounded queues, and yield the
+    last stage's outputs in order.
+
+    Each stage is ``(name, fn)`` where ``fn`` maps one input item to an iterable of output items
+    (zero, one or many). A queue holds at most ``depth`` items (``PIPELINE_QUEUE_DEPTH``), so a
+    stage that gets ahead blocks until the next one catches up: memory in flight depends on the
+    queue depth, not on how much the source produces, and wall-clock time approaches that of the
+    slowest stage. The first exception in any stage (or in the source) stops the others and is
+    re-raised to the caller; closing the iterator early stops them too.
+
+    ``busy`` records the seconds each stage spent working (not waiting on its queues), which shows
+    where the bottleneck is.
+    """
+
+    def __init__(self, source: Iterable, stages: List[Tuple[str, Callable[[Any], Iterable]]],
+                 depth: Optional[int] = None):
+        self.logger = setup_logger()
+        self.source = source
+        self.stages = stages
+        self.depth = max(int(depth or get_config("PIPELINE_QUEUE_DEPTH", default=4)), 1)
+        self.busy: Dict[str, float] = {"source": 0.0, **{name: 0.0 for name, _ in stages}}
+        self._stop = threading.Event()
+        self._errors: List[BaseException] = []
+
+    def _put(self, q: queue.Queue, item):
+        while True:
+            if self._stop.is_set():
+                raise _Stopped()
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q: queue.Queue):
+        while True:
+            if self._stop.is_set():
+                raise _Stopped()
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+    def _fail(self, e: BaseException):
+        self._errors.append(e)
+        self._stop.set()
+
+    def _run_source(self, out: queue.Queue):
+        try:
+            items = iter(self.source)
+            while True:
+                started = time.perf_counter()
+                item = next(items, _DONE)
+                self.busy["source"] += time.perf_counter() - started
+                self._put(out, item)
+                if item is _DONE:
+                    return
+        except _Stopped:
+            pass
+        except BaseException as e:
+            self._fail(e)
+
+    def _run_stage(self, name: str, fn: Callable[[Any], Iterable], inbox: queue.Queue,
+                   out: queue.Queue):
+        try:
+            while True:
+                item = self._get(inbox)
+                if item is _DONE:
+                    self._put(out, _DONE)
+                    return
+                started = time.perf_counter()
+                results = iter(fn(item))
+                while True:
+                    result = next(results, _DONE)
+                    self.busy[name] += time.perf_counter() - started
+                    if result is _DONE:
+                        break
+                    self._put(out, result)
+                    started = time.perf_counter()
+        except _Stopped:
+            pass
+        except BaseException as e:
+            self.logger.error(f"Pipeline stage '{name}' failed: {e}")
+            self._fail(e)
+
+    def __iter__(self) -> Iterator:
+        queues = [queue.Queue(maxsize=self.depth) for _ in range(len(self.stages) + 1)]
+        threads = [threading.Thread(target=self._run_source, args=(queues[0],),
+                                    name="pipeline-source", daemon=True)]
+        for i, (name, fn) in enumerate(self.stages):
+            threads.append(threading.Thread(target=self._run_stage,
+                                            args=(name, fn, queues[i], queues[i + 1]),
+                                            name=f"pipeline-{name}", daemon=True))
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                try:
+                    item = self._get(queues[-1])
+                except _Stopped:
+                    break
+                if item is _DONE:
+                    break
+                yield item
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+        if self._errors:
+            raise self._errors[0]
@@ -1,25 +1,32 @@
-import re
 from typing import List, Dict
 from logging_utils.logger import setup_logger
+from src.config import get_config
+from preprocessing.template_miner import TemplateMiner
+from redaction.redactor import Redactor, get_default_redactor
+from utils.timestamps import timestamp_sort_key
 
 class LogPreprocessor:
-    def __init__(self, redact_patterns=None):
+    def __init__(self, redact_patterns=None, mine_templates=None):
         self.logger = setup_logger()
-        # List of (pattern, replacement) tuples for redaction
-        self.redact_patterns = redact_patterns or [
-            (r"[\w\.-]+@[\w\.-]+", "[REDACTED_EMAIL]"),
-            (r"\b(?:\d[ -]*?){13,16}\b", "[REDACTED_CARD]")
-        ]
-        self.logger.info("LogPreprocessor initialized with %d redact patterns.", len(self.redact_patterns))
+        # Optional list of (pattern, replacement) tuples; defaults to the shared redaction rules
+        self.redactor = Redactor(redact_patterns) if redact_patterns else get_default_redactor()
+        self.redact_patterns = self.redactor.rules
+        if mine_templates is None:
+            mine_templates = get_config("TEMPLATE_MINING", default="true").lower() == "true"
+        # The miner is kept across calls so templates keep generalizing in long-running processes
+        self.template_miner = TemplateMiner(
+            depth=int(get_config("TEMPLATE_DEPTH", default=4)),
+            similarity_threshold=float(get_config("TEMPLATE_SIMILARITY", default=0.5)),
+        ) if mine_templates else None
+        self.logger.info("LogPreprocessor initialized with %d redact patterns.",
+                         len(self.redact_patterns))
 
     def clean_log(self, log: Dict) -> Dict:
         # Redact sensitive info in message
         msg = log.get("message", "")
         if not isinstance(msg, str):
             msg = str(msg) if msg is not None else ""
-        for pattern, repl in self.redact_patterns:
-            msg = re.sub(pattern, repl, msg)
-        log["message"] = msg
+        log["message"] = self.redactor.redact(msg)
         # Normalize timestamp if present
         if "timestamp" in log:
             log["timestamp"] = str(log["timestamp"])
@@ -39,8 +46,40 @@ class LogPreprocessor:
                 cleaned.append(c)
                 seen.add(key)
         self.logger.info(f"Preprocessing complete. {len(cleaned)} logs remain after deduplication.")
+        if self.template_miner is not None:
+            cleaned = self.collapse_templates(cleaned)
         return cleaned
 
+    def collapse_templates(self, logs: List[Dict]) -> List[Dict]:
+        """
+        Emit one representative per (template, container, level), annotated with ``template``,
+        ``occurrences``, ``first_seen`` and ``last_seen``.
+        """
+        groups = {}
+        clusters = {}
+        for log in logs:
+            cluster = self.template_miner.add_message(log.get("message", ""))
+            key = (cluster.cluster_id, log.get("container_name"), log.get("level"))
+            ts = log.get("timestamp")
+            group = groups.get(key)
+            if group is None:
+                group = dict(log, occurrences=0, first_seen=ts, last_seen=ts)
+                groups[key] = group
+                clusters[key] = cluster
+            group["occurrences"] += 1
+            if ts is not None:
+                key_ts = timestamp_sort_key(ts)
+                if group["first_seen"] is None or key_ts < timestamp_sort_key(group["first_seen"]):
+                    group["first_seen"] = ts
+                if group["last_seen"] is None or key_ts > timestamp_sort_key(group["last_seen"]):
+                    group["last_seen"] = ts
+        for key, group in groups.items():
+            # Read the template last: it may have generalized after the representative was picked
+            group["template"] = clusters[key].template
+        self.logger.info(
+            f"Template mining collapsed {len(logs)} logs into {len(groups)} templates.")
+        return list(groups.values())
+
 if __name__ == "__main__":
     # Example usage
     logs = [
@@ -0,0 +1,90 @@
+import re
+from typing import Dict, List, Optional
+
+WILDCARD = "<*>"
+
+# Variable tokens masked before clustering: UUIDs, timestamps, IPs, hex ids and numbers
+MASK_RE = re.compile(
+    r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b"
+    r"|\b\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})?"
+    r"|\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b"
+    r"|\b0x[0-9a-fA-F]+\b"
+    r"|\b(?=[0-9a-fA-F]*\d)[0-9a-fA-F]{12,}\b"
+    r"|\b\d+(?:\.\d+)?\b"
+)
+
+class LogCluster:
+    __slots__ = ("cluster_id", "tokens", "size")
+
+    def __init__(self, cluster_id: int, tokens: List[str]):
+        self.cluster_id = cluster_id
+        self.tokens = list(tokens)
+        self.size = 1
+
+    @property
+    def template(self) -> str:
+        return " ".join(self.tokens)
+
+class _Node:
+    __slots__ = ("children", "clusters")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.clusters: List[LogCluster] = []
+
+class TemplateMiner:
+    """
+    Online log template miner in the style of Drain (He et al., ICWS 2017).
+
+    Messages are masked, tokenized on whitespace and routed through a fixed-depth parse tree
+    keyed by token count and then by the leading ``depth - 2`` tokens. Within a leaf, a message
+    joins the most similar cluster if at least ``similarity_threshold`` of its token positions
+    match, and positions that differ become ``<*>`` in the template.
+    """
+
+    def __init__(self, depth: int = 4, similarity_threshold: float = 0.5, max_children: int = 100):
+        self.depth = max(depth, 3)
+        self.similarity_threshold = similarity_threshold
+        self.max_children = max_children
+        self.root = _Node()
+        self.clusters: List[LogCluster] = []
+
+    @staticmethod
+    def tokenize(message: str) -> List[str]:
+        return MASK_RE.sub(WILDCARD, message).split()
+
+    def add_message(self, message: str) -> LogCluster:
+        tokens = self.tokenize(message)
+        leaf = self._leaf(tokens)
+        cluster = self._best_match(leaf.clusters, tokens)
+        if cluster is None:
+            cluster = LogCluster(len(self.clusters), tokens)
+            self.clusters.append(cluster)
+            leaf.clusters.append(cluster)
+        else:
+            cluster.tokens = [t if t == c else WILDCARD for t, c in zip(tokens, cluster.tokens)]
+            cluster.size += 1
+        return cluster
+
+    def _leaf(self, tokens: List[str]) -> _Node:
+        node = self.root.children.setdefault(str(len(tokens)), _Node())
+        for token in tokens[:self.depth - 2]:
+            key = WILDCARD if any(ch.isdigit() for ch in token) else token
+            if key not in node.children and len(node.children) >= self.max_children:
+                key = WILDCARD
+            node = node.children.setdefault(key, _Node())
+        return node
+
+    def _best_match(self, clusters: List[LogCluster], tokens: List[str]) -> Optional[LogCluster]:
+        best, best_key = None, (-1.0, -1)
+        for cluster in clusters:
+            if not tokens:
+                return cluster
+            same = sum(1 for t, c in zip(tokens, cluster.tokens) if t == c)
+            wildcards = cluster.tokens.count(WILDCARD)
+            key = (same / len(tokens), wildcards)
+            if key > best_key:
+                best, best_key = cluster, key
+        if best is not None and best_key[0] >= self.similarity_threshold:
+            return best
+        return None
@@ -0,0 +1,64 @@
+import re
+from typing import List, Optional, Sequence, Tuple
+
+# (name, pattern, replacement); earlier rules win when two match at the same position
+DEFAULT_RULES: List[Tuple[str, str, str]] = [
+    ("email", r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+", "[REDACTED_EMAIL]"),
+    ("card", r"\b(?:\d[ -]*?){13,16}\b", "[REDACTED_CARD]"),
+    ("api_key", r"(?i)api[_-]?key\s*[:=]\s*\w+", "api_key=[REDACTED]"),
+    ("token", r"(?i)token\s*[:=]\s*\w+", "token=[REDACTED]"),
+]
+
+_LEADING_FLAGS = re.compile(r"^\(\?([aiLmsux]+)\)")
+
+def _scoped(pattern: str) -> str:
+    # Global inline flags such as "(?i)" are only legal at the start of a whole regex;
+    # turn them into a scoped group so the rule can sit inside the combined alternation.
+    m = _LEADING_FLAGS.match(pattern)
+    if m:
+        return f"(?{m.group(1)}:{pattern[m.end():]})"
+    return f"(?:{pattern})"
+
+class Redactor:
+    """
+    Single-pass redaction engine.
+
+    All rules are precompiled into one alternation of named groups, so each string is scanned
+    once no matter how many rules there are; the replacement is looked up from the name of the
+    group that matched. Rules are ``(name, pattern, replacement)`` or ``(pattern, replacement)``
+    tuples.
+    """
+
+    def __init__(self, rules: Optional[Sequence[Tuple]] = None):
+        self.rules = []
+        for i, rule in enumerate(rules if rules is not None else DEFAULT_RULES):
+            if len(rule) == 2:
+                rule = (f"rule{i}",) + tuple(rule)
+            self.rules.append(tuple(rule))
+        self._replacements = {}
+        groups = []
+        for i, (name, pattern, replacement) in enumerate(self.rules):
+            group = f"r{i}_{re.sub(r'[^0-9A-Za-z_]', '_', name)}"
+            self._replacements[group] = replacement
+            groups.append(f"(?P<{group}>{_scoped(pattern)})")
+        self._regex = re.compile("|".join(groups)) if groups else None
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def _replace(self, match: "re.Match") -> str:
+        return self._replacements[match.lastgroup]
+
+    def redact(self, text: str) -> str:
+        if not text or self._regex is None:
+            return text
+        return self._regex.sub(self._replace, text)
+
+_default_redactor = None
+
+def get_default_redactor() -> Redactor:
+    """Process-wide redactor with ``DEFAULT_RULES``, compiled once."""
+    global _default_redactor
+    if _default_redactor is None:
+        _default_redactor = Redactor()
+    return _default_redactor
@@ -10,7 +10,8 @@ class SlackNotifier:
         self.logger = setup_logger()
         self.webhook_url = webhook_url or get_config("SLACK_WEBHOOK_URL")
         if not self.webhook_url:
-            raise ValueError("SLACK_WEBHOOK_URL must be set in environment or passed to SlackNotifier.")
+            raise ValueError(
+                "SLACK_WEBHOOK_URL must be set in environment or passed to SlackNotifier.")
         self.logger.info("SlackNotifier initialized.")
 
     def send_message(self, text, blocks=None):
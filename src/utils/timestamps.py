@@ -0,0 +1,29 @@
+import datetime
+from typing import Iterable, Optional
+
+def to_epoch_ms(value) -> Optional[int]:
+    """Convert a New Relic timestamp (epoch ms, or an ISO-8601 string) to epoch milliseconds."""
+    if value is None or value == "":
+        return None
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        dt = datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+def timestamp_sort_key(ts):
+    # Epoch timestamps sort numerically, ISO strings lexicographically
+    try:
+        return (0, float(ts), "")
+    except (TypeError, ValueError):
+        return (1, 0.0, str(ts))
+
+def newest_timestamp_ms(logs: Iterable[dict]) -> Optional[int]:
+    stamps = [ts for ts in (to_epoch_ms(log.get("timestamp")) for log in logs) if ts is not None]
+    return max(stamps) if stamps else None
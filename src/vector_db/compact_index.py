@@ -0,0 +1,35 @@
+"""
+Offline compaction for the FAISS store: applies the retention policies, then rewrites the index,
+metadata journal and sidecars without tombstoned rows. Stop the pipeline/daemon while it runs.
+
+    python src/vector_db/compact_index.py
+    python src/vector_db/compact_index.py --retention-days 30 --namespace-max-vectors 200000
+"""
+import argparse
+import os
+import sys
+from dotenv import load_dotenv
+load_dotenv()
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from vector_db.sharded_db import open_vector_db
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Expire old vectors and rebuild the FAISS store without tombstones.")
+    parser.add_argument("--db-path", default=None,
+                        help="FAISS index path, or shard directory with FAISS_SHARDING=true "
+                             "(default: FAISS_DB_PATH / FAISS_SHARD_DIR)")
+    parser.add_argument("--retention-days", type=float, default=None,
+                        help="Delete vectors older than this many days "
+                             "(default: FAISS_RETENTION_DAYS, 0 = keep all)")
+    parser.add_argument("--namespace-max-vectors", type=int, default=None,
+                        help="Keep at most this many newest vectors per namespace "
+                             "(default: FAISS_NAMESPACE_MAX_VECTORS, 0 = no cap)")
+    args = parser.parse_args()
+    db = open_vector_db(db_path=args.db_path, retention_days=args.retention_days,
+                        namespace_max_vectors=args.namespace_max_vectors)
+    expired = db.enforce_retention()
+    kept = db.rebuild()
+    db.close()
+    print(f"Expired {expired} vectors; rebuilt {db.db_path} with {kept} live rows.")
@@ -1,65 +1,715 @@
 import faiss
 import numpy as np
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from logging_utils.logger import setup_logger
 from src.config import get_config
+from vector_db.metadata_store import MetadataStore
+from embedding.embedded_batch import EmbeddedBatch
+from vector_db.index_factory import (
+    build_index, factory_string, index_type_of, min_training_vectors, read_index_mmap,
+    reconstruct_all, search_params, set_search_params, stored_ids, train_index, with_ids,
+)
+from utils.timestamps import to_epoch_ms
+import glob
+import hashlib
+import json
 import os
 import pickle
+import threading
+import time
+
+def merge_top_k(parts: List[Tuple[np.ndarray, np.ndarray]], k: int,
+                n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Merge per-index ``(distances, ids)`` results for ``n`` queries into one top-k by distance."""
+    parts = [(D, ids) for D, ids in parts if D.shape[1]]
+    if not parts:
+        return np.empty((n, 0), dtype=np.float32), np.empty((n, 0), dtype=np.int64)
+    if len(parts) == 1:
+        return parts[0]
+    ids = np.hstack([part_ids for _, part_ids in parts])
+    D = np.where(ids >= 0, np.hstack([D for D, _ in parts]), np.inf)
+    order = np.argsort(D, axis=1, kind="stable")[:, :k]
+    return np.take_along_axis(D, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+def nearest_distances(D: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """Each query's distance to its nearest hit from a ``k=1`` search; inf when nothing matched."""
+    scores = np.full(len(D), np.inf, dtype=np.float32)
+    if D.shape[1]:
+        found = ids[:, 0] >= 0
+        scores[found] = D[found, 0]
+    return scores
+
+def over_cap(groups: np.ndarray, times: np.ndarray, cap: int) -> np.ndarray:
+    """Positions of the rows past the newest ``cap`` of their group."""
+    # Group, newest first, and rank every row within its group
+    order = np.lexsort((-times, groups))
+    grouped = groups[order]
+    starts = np.flatnonzero(np.r_[True, grouped[1:] != grouped[:-1]])
+    rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    return order[rank >= cap]
 
 class FaissVectorDB:
-    def __init__(self, 
-                 dim: Optional[int] = None, 
-                 db_path: Optional[str] = None):
+    """
+    FAISS index of log embeddings with append-only persistence (segments plus a metadata journal,
+    see "Vector DB (FAISS)" in the README). ``read_only=True`` memory-maps the store for readers
+    such as dashboard workers and reloads it whenever the writer publishes a new generation.
+    """
+
+    DEDUP_FIELDS = ("timestamp", "container_name", "namespace_name", "level", "message")
+
+    def __init__(self,
+                 dim: Optional[int] = None,
+                 db_path: Optional[str] = None,
+                 compact_segments: Optional[int] = None,
+                 index_type: Optional[str] = None,
+                 nlist: Optional[int] = None,
+                 nprobe: Optional[int] = None,
+                 ef_search: Optional[int] = None,
+                 retention_days: Optional[float] = None,
+                 namespace_max_vectors: Optional[int] = None,
+                 read_only: bool = False):
         self.logger = setup_logger()
         self.db_path = db_path or get_config("FAISS_DB_PATH", default="faiss_index.bin")
         self.meta_path = self.db_path + ".meta"
+        self.journal_path = self.db_path + ".journal"
+        self.tombstones_path = self.db_path + ".tombstones"
+        self.hashes_path = self.db_path + ".hashes"
+        self.generation_path = self.db_path + ".generation"
+        self.read_only = read_only
+        self.reload_interval = float(get_config("FAISS_RELOAD_INTERVAL", default=5))
+        self._reload_checked = time.monotonic()
+        self.compact_segments = int(compact_segments
+                                    or get_config("FAISS_COMPACT_SEGMENTS", default=16))
+        self.index_type = (index_type or get_config("FAISS_INDEX_TYPE", default="flat")).lower()
+        self.nlist = int(nlist or get_config("FAISS_NLIST", default=1024))
+        self.pq_m = int(get_config("FAISS_PQ_M", default=16))
+        self.hnsw_m = int(get_config("FAISS_HNSW_M", default=32))
+        self.nprobe = int(nprobe or get_config("FAISS_NPROBE", default=16))
+        self.ef_search = int(ef_search or get_config("FAISS_EF_SEARCH", default=64))
+        # 0 disables a retention policy
+        self.retention_days = float(retention_days if retention_days is not None
+                                    else get_config("FAISS_RETENTION_DAYS", default=0))
+        self.namespace_max_vectors = int(namespace_max_vectors if namespace_max_vectors is not None
+                                         else get_config("FAISS_NAMESPACE_MAX_VECTORS", default=0))
+        self.retention_interval = float(get_config("FAISS_RETENTION_INTERVAL", default=3600))
+        self._retention_checked = None
+        factory_string(self.index_type)  # validate early
         self.index = None
-        self.metadata = []
+        self._tail = None  # read-only mode: segments not yet in the memory-mapped base
+        self._live = None  # read-only mode: live rows, when the base still holds deleted ones
+        self.metadata = None
         self.dim = dim
-        if os.path.exists(self.db_path):
+        self._segments = []  # (start_row, n_rows, path) of segments not yet folded into the base
+        self._next_id = 0  # row id of the next insert
+        self._deleted = np.zeros(0, dtype=bool)
+        self._row_digests = np.empty(0, dtype=np.int64)
+        self._digests = set()  # digests of live rows
+        self._lock = threading.RLock()
+        self._compaction_thread = None
+        self._base_dirty = False
+        self._generation = self._read_generation()
+        if os.path.exists(self.db_path) or os.path.exists(self.journal_path):
             self._load()
         else:
+            self.metadata = MetadataStore(self.journal_path, read_only=read_only)
+            if not read_only:
+                self._load_digests()
             self.logger.info("No existing FAISS index found. Will create new on first insert.")
 
-    def _save(self):
-        faiss.write_index(self.index, self.db_path)
-        with open(self.meta_path, "wb") as f:
-            pickle.dump(self.metadata, f)
-        self.logger.info(f"FAISS index and metadata saved to {self.db_path} and {self.meta_path}")
+    def _read_generation(self) -> Optional[str]:
+        try:
+            with open(self.generation_path, "r") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
 
-    def _load(self):
-        self.index = faiss.read_index(self.db_path)
+    def _publish_generation(self):
+        # Tells read-only openers to reload; a hint only, so no fsync
+        tmp_path = self.generation_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(str(time.time_ns()))
+        os.replace(tmp_path, self.generation_path)
+
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError(f"FAISS store {self.db_path} is open read-only")
+
+    def maybe_reload(self):
+        """Read-only mode: swap in the writer's latest state if it published a new generation."""
+        if not self.read_only or time.monotonic() - self._reload_checked < self.reload_interval:
+            return
+        self._reload_checked = time.monotonic()
+        if self._read_generation() == self._generation:
+            return
+        try:
+            fresh = FaissVectorDB(db_path=self.db_path, index_type=self.index_type,
+                                  nlist=self.nlist, nprobe=self.nprobe, ef_search=self.ef_search,
+                                  read_only=True)
+        except (OSError, RuntimeError, ValueError) as e:
+            # E.g. a segment removed by a compaction mid-load; the next check retries
+            self.logger.warning(f"FAISS reload of {self.db_path} failed, "
+                                f"keeping the previous generation: {e}")
+            return
+        with self._lock:
+            for attr in ("index", "_tail", "_live", "metadata", "dim", "_segments", "_next_id",
+                         "_deleted", "_generation"):
+                setattr(self, attr, getattr(fresh, attr))
+        self.logger.info(f"Reloaded FAISS store {self.db_path} at generation {self._generation}")
+
+    def _segment_path(self, start: int) -> str:
+        return f"{self.db_path}.seg.{start:012d}.npy"
+
+    def _list_segments(self) -> List[str]:
+        return sorted(glob.glob(glob.escape(self.db_path) + ".seg.*.npy"))
+
+    @staticmethod
+    def _fsync_replace(tmp_path: str, path: str):
+        os.replace(tmp_path, path)
+        dir_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        except OSError:
+            pass
+        finally:
+            os.close(dir_fd)
+
+    def _write_segment(self, start: int, embeddings: np.ndarray) -> str:
+        path = self._segment_path(start)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, embeddings)
+            f.flush()
+            os.fsync(f.fileno())
+        self._fsync_replace(tmp_path, path)
+        return path
+
+    def _migrate_legacy_metadata(self):
+        # Indexes written before the journal existed keep their metadata in a pickled list
         with open(self.meta_path, "rb") as f:
-            self.metadata = pickle.load(f)
-        self.dim = self.index.d
-        self.logger.info(f"Loaded FAISS index with {self.index.ntotal} vectors and dim {self.dim}")
+            legacy = pickle.load(f)
+        tmp_path = self.journal_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write("".join(json.dumps(row, default=str) + "\n" for row in legacy).encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        self._fsync_replace(tmp_path, self.journal_path)
+        os.remove(self.meta_path)
+        self.logger.info(f"Migrated {len(legacy)} metadata rows from {self.meta_path} "
+                         f"to {self.journal_path}")
 
-    def add_logs(self, logs: List[Dict]):
-        if not logs:
+    def _load(self):
+        if not self.read_only:
+            for stale in glob.glob(glob.escape(self.db_path) + "*.tmp"):
+                os.remove(stale)
+        if os.path.exists(self.tombstones_path):
+            count = os.path.getsize(self.tombstones_path) // 8
+            tombstones = np.fromfile(self.tombstones_path, dtype=np.int64, count=count)
+            self._mark_deleted(tombstones)
+        if os.path.exists(self.db_path):
+            if self.read_only:
+                base = read_index_mmap(self.db_path)
+            else:
+                base = faiss.read_index(self.db_path)
+            self.index = with_ids(base)
+            # Bases written before ids existed are rewritten with ids on the next compaction
+            self._base_dirty = self.index is not base
+            self.dim = self.index.d
+            ids = stored_ids(self.index)
+            self._next_id = int(ids.max()) + 1 if len(ids) else 0
+        unmigrated = os.path.exists(self.meta_path) and not os.path.exists(self.journal_path)
+        if unmigrated and not self.read_only:
+            self._migrate_legacy_metadata()
+        self.metadata = MetadataStore(self.journal_path, read_only=self.read_only)
+        for path in self._list_segments():
+            start = int(path[len(self.db_path) + len(".seg."):-len(".npy")])
+            vectors = np.load(path)
+            if start + len(vectors) <= self._next_id:
+                # Already folded into the base index by a compaction that did not finish cleanup
+                if not self.read_only:
+                    os.remove(path)
+                continue
+            if start > self._next_id and self._is_deleted(np.arange(self._next_id, start)).all():
+                # The base ends before rows that were deleted ahead of its compaction
+                self._next_id = start
+            if start != self._next_id:
+                self.logger.error(f"FAISS segment {path} starts at row {start}, expected "
+                                  f"{self._next_id}; ignoring it and later segments.")
+                break
+            ids = np.arange(start, start + len(vectors), dtype=np.int64)
+            live = ~self._is_deleted(ids)
+            if self.read_only:
+                # The mapped base is read-only, so segments go into a small private index next to it
+                if self._tail is None:
+                    self.dim = vectors.shape[1]
+                    self._tail = faiss.IndexIDMap2(faiss.IndexFlatL2(self.dim))
+                self._tail.add_with_ids(vectors[live], ids[live])
+            else:
+                if self.index is None:
+                    self.dim = vectors.shape[1]
+                    self.index = self._new_index()
+                self.index.add_with_ids(vectors[live], ids[live])
+            self._segments.append((start, len(vectors), path))
+            self._next_id = start + len(vectors)
+        if self.index is not None:
+            # The base may predate deletions recorded since it was written
+            ids = stored_ids(self.index)
+            deleted = ids[self._is_deleted(ids)]
+            if len(deleted) and self.read_only:
+                live = np.ones(self._next_id, dtype=bool)
+                live[deleted] = False
+                self._live = live
+            elif len(deleted):
+                self._remove_from_index(deleted)
+                self._base_dirty = True
+        if self.read_only:
+            if self.index is not None:
+                set_search_params(self.index, self.nprobe, self.ef_search)
+            self.logger.info(f"Opened FAISS store {self.db_path} read-only with {self.ntotal} "
+                             f"vectors of {self._next_id} rows")
             return
-        embeddings = np.array([log["embedding"] for log in logs]).astype(np.float32)
+        if len(self.metadata) > self._next_id:
+            # Journal rows whose vector segment was never published belong to an interrupted insert
+            self.logger.warning(f"Dropping {len(self.metadata) - self._next_id} uncommitted "
+                                "metadata rows from journal.")
+        self.metadata.truncate(self._next_id)
+        if len(self.metadata) < self._next_id:
+            self.logger.warning(f"FAISS index has {self._next_id} rows but only "
+                                f"{len(self.metadata)} metadata rows.")
+        ntotal = self.index.ntotal if self.index is not None else 0
+        if self.index is not None:
+            set_search_params(self.index, self.nprobe, self.ef_search)
+        self.logger.info(f"Loaded FAISS index with {ntotal} vectors of {self._next_id} rows "
+                         f"({len(self._segments)} uncompacted segments) and dim {self.dim}")
+        self._load_digests()
+        self._maybe_migrate_index()
+
+    @classmethod
+    def content_digest(cls, log: Dict) -> int:
+        """64-bit digest of the fields that identify a log, independent of its embedding."""
+        key = json.dumps([log.get(field) for field in cls.DEDUP_FIELDS], default=str)
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "little", signed=True)
+
+    def _map_digests(self):
+        rows = os.path.getsize(self.hashes_path) // 8 if os.path.exists(self.hashes_path) else 0
+        self._row_digests = np.memmap(self.hashes_path, dtype=np.int64, mode="r", shape=(rows,)) \
+            if rows else np.empty(0, dtype=np.int64)
+
+    def _append_digests(self, digests: List[int]):
+        with open(self.hashes_path, "ab") as f:
+            f.write(np.asarray(digests, dtype=np.int64).tobytes())
+        self._map_digests()
+
+    def _load_digests(self):
+        self._map_digests()
+        rows = len(self._row_digests)
+        if rows > self._next_id:
+            MetadataStore._truncate_file(self.hashes_path, self._next_id * 8)
+            self._map_digests()
+        elif rows < self._next_id:
+            # Stores written before digests existed (or a crash before they were appended)
+            # catch up from the journal
+            end = min(self._next_id, len(self.metadata))
+            self._append_digests([self.content_digest(self.metadata[i]) for i in range(rows, end)])
+        live = np.flatnonzero(~self._is_deleted(np.arange(len(self._row_digests))))
+        digests = np.asarray(self._row_digests[live])
+        _, first = np.unique(digests, return_index=True)
+        duplicates = np.setdiff1d(live, live[first])
+        self._digests = set(digests.tolist())
+        if len(duplicates):
+            removed = self.delete(duplicates)
+            self.logger.info(f"Removed {removed} duplicate vectors from the existing FAISS index.")
+
+    def drop_known(self, logs: List[Dict]) -> Tuple[List[Dict], int]:
+        """Drop logs already stored (or repeated within ``logs``); returns (new_logs, skipped)."""
+        seen = set()
+        fresh = []
+        with self._lock:
+            for log in logs:
+                digest = self.content_digest(log)
+                if digest in self._digests or digest in seen:
+                    continue
+                seen.add(digest)
+                fresh.append(log)
+        return fresh, len(logs) - len(fresh)
+
+    def _new_index(self):
+        # IVF types need training data, so they start flat until _maybe_migrate_index trains them
+        if min_training_vectors(self.index_type, self.nlist) > 0:
+            return with_ids(faiss.IndexFlatL2(self.dim))
+        index = with_ids(build_index(self.index_type, self.dim, self.nlist, self.pq_m, self.hnsw_m))
+        set_search_params(index, self.nprobe, self.ef_search)
+        return index
+
+    def _build_from(self, index_type: str, ids: np.ndarray, vectors: np.ndarray):
+        index = with_ids(build_index(index_type, self.dim, self.nlist, self.pq_m, self.hnsw_m))
+        train_index(index, vectors, self.nlist)
+        index.add_with_ids(vectors, ids)
+        set_search_params(index, self.nprobe, self.ef_search)
+        return index
+
+    def _is_deleted(self, ids: np.ndarray) -> np.ndarray:
+        ids = np.asarray(ids, dtype=np.int64)
+        deleted = np.zeros(len(ids), dtype=bool)
+        known = ids < len(self._deleted)
+        deleted[known] = self._deleted[ids[known]]
+        return deleted
+
+    def _mark_deleted(self, ids: np.ndarray):
+        if not len(ids):
+            return
+        size = int(ids.max()) + 1
+        if size > len(self._deleted):
+            grow = np.zeros(size - len(self._deleted), dtype=bool)
+            self._deleted = np.concatenate([self._deleted, grow])
+        self._deleted[ids] = True
+
+    def _maybe_migrate_index(self):
         if self.index is None:
-            self.dim = embeddings.shape[1]
-            self.index = faiss.IndexFlatL2(self.dim)
-            self.logger.info(f"Created new FAISS index with dim {self.dim}")
-        self.index.add(embeddings)
-        self.metadata.extend([{k: v for k, v in log.items() if k != "embedding"} for log in logs])
-        self._save()
-
-    def search(self, query_emb: List[float], k: int = 5) -> List[Dict[str, Any]]:
-        if self.index is None or self.index.ntotal == 0:
-            self.logger.warning("No vectors in index.")
-            return []
-        query = np.array([query_emb]).astype(np.float32)
-        D, I = self.index.search(query, k)
+            return
+        current = index_type_of(self.index)
+        needed = min_training_vectors(self.index_type, self.nlist)
+        if current == self.index_type or self.index.ntotal < needed:
+            return
+        with self._lock:
+            if current == "ivf_pq":
+                self.logger.warning("Migrating from an ivf_pq index: "
+                                    "stored vectors are PQ approximations.")
+            ids = stored_ids(self.index)
+            vectors = reconstruct_all(self.index)
+            self.index = self._build_from(self.index_type, ids, vectors)
+            self._base_dirty = True
+        self.logger.info(f"Migrated FAISS index from {current} to {self.index_type} "
+                         f"({len(vectors)} vectors)")
+        self.compact()
+
+    def set_search_params(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+        """Tune recall vs latency: ``nprobe`` for IVF indexes, ``efSearch`` for HNSW."""
+        with self._lock:
+            if nprobe is not None:
+                self.nprobe = int(nprobe)
+            if ef_search is not None:
+                self.ef_search = int(ef_search)
+            if self.index is not None:
+                set_search_params(self.index, self.nprobe, self.ef_search)
+
+    def add_logs(self, logs) -> int:
+        """
+        Insert an ``EmbeddedBatch`` (or a list of dicts carrying an ``"embedding"``), skipping logs
+        whose content is already stored. Returns the number of duplicates skipped.
+        """
+        if not len(logs):
+            return 0
+        self._check_writable()
+        batch = EmbeddedBatch.from_logs(logs)
+        with self._lock:
+            digests = [self.content_digest(log) for log in batch.logs]
+            keep, seen = [], set()
+            for i, digest in enumerate(digests):
+                if digest not in self._digests and digest not in seen:
+                    seen.add(digest)
+                    keep.append(i)
+            skipped = len(digests) - len(keep)
+            if skipped:
+                self.logger.info(f"Skipped {skipped} of {len(digests)} logs "
+                                 "already in the FAISS index.")
+            if not keep:
+                return skipped
+            if skipped:
+                batch = batch.select(keep)
+                digests = [digests[i] for i in keep]
+            embeddings = batch.embeddings
+            rows = batch.logs
+            if self.index is None:
+                self.dim = embeddings.shape[1]
+                self.index = self._new_index()
+                self.logger.info(f"Created new FAISS {index_type_of(self.index)} index "
+                                 f"with dim {self.dim}")
+            start = self._next_id
+            # Journal first: a segment is only visible on load once its metadata is durable
+            self.metadata.append(rows)
+            path = self._write_segment(start, embeddings)
+            ids = np.arange(start, start + len(embeddings), dtype=np.int64)
+            self.index.add_with_ids(embeddings, ids)
+            self._next_id = start + len(embeddings)
+            self._segments.append((start, len(embeddings), path))
+            # Row-aligned and rebuilt from the journal on load, so no fsync is needed
+            self._append_digests(digests)
+            self._digests.update(digests)
+            self._publish_generation()
+            pending = len(self._segments)
+        self.logger.info(f"Appended {len(rows)} vectors to FAISS segment {path}")
+        self._maybe_migrate_index()
+        checked = self._retention_checked
+        if checked is None or time.monotonic() - checked >= self.retention_interval:
+            self.enforce_retention()
+        if pending >= self.compact_segments:
+            self.compact(background=True)
+        return skipped
+
+    def _remove_from_index(self, ids: np.ndarray):
+        try:
+            self.index.remove_ids(ids)
+        except RuntimeError:
+            # HNSW graphs cannot drop nodes: rebuild the index from the remaining vectors
+            all_ids = stored_ids(self.index)
+            vectors = reconstruct_all(self.index)
+            keep = ~np.isin(all_ids, ids)
+            self.index = self._build_from(index_type_of(self.index), all_ids[keep], vectors[keep])
+
+    def delete(self, ids) -> int:
+        """Remove rows by id from the index; their metadata is tombstoned until ``rebuild()``."""
+        self._check_writable()
+        ids = np.unique(np.asarray(ids, dtype=np.int64))
+        with self._lock:
+            ids = ids[(ids >= 0) & (ids < self._next_id)]
+            ids = ids[~self._is_deleted(ids)]
+            if not len(ids):
+                return 0
+            # Tombstones first, so a crash cannot resurrect deleted rows from an older base
+            # or segment
+            with open(self.tombstones_path, "ab") as f:
+                f.write(ids.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self._mark_deleted(ids)
+            self._remove_from_index(ids)
+            known = ids[ids < len(self._row_digests)]
+            self._digests.difference_update(np.asarray(self._row_digests[known]).tolist())
+            self._base_dirty = True
+            self._publish_generation()
+        return len(ids)
+
+    def enforce_retention(self, now_ms: Optional[int] = None) -> int:
+        """
+        Delete rows older than ``retention_days`` and, per namespace, all but the newest
+        ``namespace_max_vectors`` rows. Returns the number of rows deleted.
+        """
+        self._retention_checked = time.monotonic()
+        if self.retention_days <= 0 and self.namespace_max_vectors <= 0:
+            return 0
+        with self._lock:
+            n = min(self._next_id, len(self.metadata))
+            times = np.asarray(self.metadata.times[:n])
+            live = ~self._is_deleted(np.arange(n))
+            expired = np.zeros(n, dtype=bool)
+            if self.retention_days > 0:
+                now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+                expired |= live & (times < now_ms - self.retention_days * 86_400_000)
+            if self.namespace_max_vectors > 0:
+                kept = np.flatnonzero(live & ~expired)
+                namespaces = np.asarray(self.metadata.codes("namespace_name")[:n])[kept]
+                expired[kept[over_cap(namespaces, times[kept], self.namespace_max_vectors)]] = True
+            deleted = self.delete(np.flatnonzero(expired))
+        if deleted:
+            self.logger.info(f"Retention removed {deleted} vectors; {self.index.ntotal} remain.")
+        return deleted
+
+    def live_rows(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Row ids, log times (epoch ms) and namespaces of the rows not deleted."""
+        with self._lock:
+            n = min(self._next_id, len(self.metadata))
+            ids = np.flatnonzero(~self._is_deleted(np.arange(n)))
+            codes = np.asarray(self.metadata.codes("namespace_name")[:n])[ids]
+            # Code -1 (no namespace) picks the trailing ""
+            names = np.array(self.metadata.vocab["namespace_name"] + [""], dtype=str)[codes]
+            return ids, np.asarray(self.metadata.times[:n])[ids], names
+
+    def rebuild(self) -> int:
+        """
+        Offline compaction: rewrite the index, journal and sidecars with only the live rows, so
+        tombstones stop taking up disk space. Row ids are renumbered, so run it while no other
+        process writes to the store; read-only openers reload once it finishes. Returns the
+        number of rows kept.
+        """
+        self._check_writable()
+        self.compact()
+        with self._lock:
+            ids = stored_ids(self.index) if self.index is not None else np.empty(0, dtype=np.int64)
+            vectors = reconstruct_all(self.index) if self.index is not None else None
+            order = np.argsort(ids, kind="stable")
+            ids = ids[order]
+            tmp_prefix = self.db_path + ".rebuild"
+            for stale in glob.glob(glob.escape(tmp_prefix) + "*"):
+                os.remove(stale)
+            fresh = FaissVectorDB(dim=self.dim, db_path=tmp_prefix, compact_segments=2 ** 31,
+                                  index_type=self.index_type, nlist=self.nlist, nprobe=self.nprobe,
+                                  ef_search=self.ef_search, retention_days=0,
+                                  namespace_max_vectors=0)
+            chunk = 50_000
+            for pos in range(0, len(ids), chunk):
+                rows = self.metadata.get_many(ids[pos:pos + chunk])
+                fresh.add_logs(EmbeddedBatch(rows, vectors[order[pos:pos + chunk]]))
+            fresh.compact()
+            fresh.close()
+            self.metadata.close()
+            old_files = self._list_segments() + [self.tombstones_path, self.hashes_path,
+                                                 self.db_path]
+            old_files += glob.glob(glob.escape(self.journal_path) + "*")
+            for path in old_files:
+                if os.path.exists(path):
+                    os.remove(path)
+            for path in glob.glob(glob.escape(tmp_prefix) + "*"):
+                self._fsync_replace(path, self.db_path + path[len(tmp_prefix):])
+            self.index = None
+            self._segments = []
+            self._next_id = 0
+            self._deleted = np.zeros(0, dtype=bool)
+            self._base_dirty = False
+            if os.path.exists(self.db_path) or os.path.exists(self.journal_path):
+                self._load()
+            else:
+                self.metadata = MetadataStore(self.journal_path)
+                self._load_digests()
+            self._publish_generation()
+        self.logger.info(f"Rebuilt FAISS store {self.db_path} with {len(ids)} live rows.")
+        return len(ids)
+
+    def compact(self, background: bool = False):
+        """Fold all vector segments into the base index file."""
+        self._check_writable()
+        with self._lock:
+            running = self._compaction_thread
+            if running is not None and running.is_alive():
+                if background:
+                    return
+            elif background:
+                self._compaction_thread = threading.Thread(target=self._compact,
+                                                           name="faiss-compaction", daemon=True)
+                self._compaction_thread.start()
+                return
+        if running is not None:
+            # Outside the lock: the running compaction needs it to finish
+            running.join()
+        self._compact()
+
+    def _compact(self):
+        with self._lock:
+            if self.index is None or not (self._segments or self._base_dirty):
+                return
+            ntotal = self.index.ntotal
+            data = faiss.serialize_index(self.index)
+            folded = list(self._segments)
+            self._base_dirty = False
+        tmp_path = self.db_path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self._fsync_replace(tmp_path, self.db_path)
+        except Exception as e:
+            self.logger.error(f"FAISS compaction failed: {e}")
+            with self._lock:
+                self._base_dirty = True
+            return
+        with self._lock:
+            self._segments = [seg for seg in self._segments if seg not in folded]
+        for _, _, path in folded:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self._publish_generation()
+        self.logger.info(f"Compacted {len(folded)} segments into {self.db_path} ({ntotal} vectors)")
+
+    def close(self):
+        """Wait for any running background compaction to finish and release the metadata store."""
+        thread = self._compaction_thread
+        if thread is not None:
+            thread.join()
+        self.metadata.close()
+
+    FILTER_FIELDS = ("namespace_name", "container_name", "level")
+
+    def _filter_mask(self, filters: Dict[str, Any]) -> np.ndarray:
+        """
+        Rows matching ``filters`` (``FILTER_FIELDS`` values, ``since``/``until`` timestamps),
+        from the metadata sidecars.
+        """
+        n = min(self._next_id, len(self.metadata))
+        mask = np.ones(n, dtype=bool)
+        for field in self.FILTER_FIELDS:
+            if filters.get(field) is None:
+                continue
+            code = self.metadata.code_of(field, filters[field])
+            if code is None:
+                return np.zeros(n, dtype=bool)
+            mask &= np.asarray(self.metadata.codes(field)[:n]) == code
+        for bound, keep in (("since", np.greater_equal), ("until", np.less_equal)):
+            if filters.get(bound) is not None:
+                ms = to_epoch_ms(filters[bound])
+                if ms is None:
+                    raise ValueError(f"Invalid {bound} filter: {filters[bound]}")
+                mask &= keep(np.asarray(self.metadata.times[:n]), ms)
+        return mask
+
+    def search_batch(self, queries, k: int = 5,
+                     filters: Optional[Dict[str, Any]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search an (n, d) query matrix with a single FAISS call; returns ``(distances, ids)``,
+        -1 ids pad short results. ``filters`` restricts the search to matching rows (see
+        ``_filter_mask``) before FAISS scans them.
+        """
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries.reshape(1, -1)
+        self.maybe_reload()
+        with self._lock:
+            indexes = [index for index in (self.index, self._tail)
+                       if index is not None and index.ntotal]
+            mask = self._filter_mask(filters) if filters else None
+            if self._live is not None:
+                # Read-only base still holding rows deleted after it was written
+                mask = self._live[:len(mask)] & mask if mask is not None else self._live
+            if not indexes or (mask is not None and not mask.any()):
+                return (np.empty((len(queries), 0), dtype=np.float32),
+                        np.empty((len(queries), 0), dtype=np.int64))
+            if mask is None:
+                return merge_top_k([index.search(queries, k) for index in indexes], k, len(queries))
+            bitmap = np.packbits(mask, bitorder="little")
+            selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bitmap))
+            parts = [index.search(queries, k, params=search_params(index, selector, self.nprobe,
+                                                                   self.ef_search))
+                     for index in indexes]
+            return merge_top_k(parts, k, len(queries))
+
+    def novelty_scores(self, queries) -> np.ndarray:
+        """
+        Distance from each query row to its nearest indexed vector, in one batched search; inf
+        when the index is empty.
+        """
+        return nearest_distances(*self.search_batch(queries, k=1))
+
+    def get_rows(self, ids, distances=None) -> List[Dict[str, Any]]:
+        """Materialize metadata rows for FAISS ids, optionally tagged with their search distance."""
         results = []
-        for idx, dist in zip(I[0], D[0]):
-            if idx < len(self.metadata):
-                result = self.metadata[idx].copy()
-                result["distance"] = float(dist)
+        for pos, idx in enumerate(ids):
+            idx = int(idx)
+            if not 0 <= idx < len(self.metadata):
+                continue
+            if not (idx < len(self._deleted) and self._deleted[idx]):
+                result = self.metadata[idx]
+                if distances is not None:
+                    result["distance"] = float(distances[pos])
                 results.append(result)
         return results
 
+    @property
+    def ntotal(self) -> int:
+        return sum(index.ntotal for index in (self.index, self._tail) if index is not None)
+
+    def search(self, query_emb: List[float], k: int = 5,
+               filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        self.maybe_reload()
+        if self.ntotal == 0:
+            self.logger.warning("No vectors in index.")
+            return []
+        D, I = self.search_batch(query_emb, k, filters)
+        if not I.shape[1]:
+            return []
+        return self.get_rows(I[0], D[0])
+
 if __name__ == "__main__":
     # Example usage
     db = FaissVectorDB(dim=384)
@@ -0,0 +1,138 @@
+import faiss
+import numpy as np
+from typing import Optional
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+def factory_string(index_type: str, nlist: int = 1024, pq_m: int = 16, hnsw_m: int = 32) -> str:
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    if index_type == "ivf_pq":
+        return f"IVF{nlist},PQ{pq_m}"
+    if index_type == "hnsw":
+        return f"HNSW{hnsw_m}"
+    raise ValueError(f"Unknown FAISS index type '{index_type}', "
+                     f"expected one of {', '.join(INDEX_TYPES)}")
+
+def build_index(index_type: str, dim: int, nlist: int = 1024, pq_m: int = 16,
+                hnsw_m: int = 32) -> faiss.Index:
+    return faiss.index_factory(dim, factory_string(index_type, nlist, pq_m, hnsw_m),
+                               faiss.METRIC_L2)
+
+def min_training_vectors(index_type: str, nlist: int = 1024) -> int:
+    # FAISS k-means wants ~39 points per centroid; PQ additionally trains 256 codes per
+    # sub-quantizer
+    if index_type == "ivf_flat":
+        return 39 * nlist
+    if index_type == "ivf_pq":
+        return max(39 * nlist, 39 * 256)
+    return 0
+
+def index_type_of(index: faiss.Index) -> str:
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap):
+        index = faiss.downcast_index(index.index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+def set_search_params(index: faiss.Index, nprobe: Optional[int] = None,
+                      ef_search: Optional[int] = None):
+    """
+    Apply ``nprobe`` (IVF) / ``efSearch`` (HNSW); knobs that do not apply to the index are
+    ignored.
+    """
+    if nprobe is not None:
+        try:
+            faiss.extract_index_ivf(index).nprobe = int(nprobe)
+        except RuntimeError:
+            pass
+    if ef_search is not None:
+        inner = faiss.downcast_index(index)
+        if isinstance(inner, faiss.IndexIDMap):
+            inner = faiss.downcast_index(inner.index)
+        if isinstance(inner, faiss.IndexHNSW):
+            inner.hnsw.efSearch = int(ef_search)
+
+def _ivf(index: faiss.Index):
+    try:
+        return faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return None
+
+def with_ids(index: faiss.Index) -> faiss.Index:
+    """
+    Make ``index`` address vectors by stable ids rather than their position. IVF indexes store ids
+    natively; other types are wrapped in an ``IndexIDMap2``. A populated bare index (the pre-id
+    layout) keeps its positions as ids.
+    """
+    if isinstance(index, faiss.IndexIDMap2) or _ivf(index) is not None:
+        return index
+    inner = faiss.clone_index(index)
+    inner.reset()
+    wrapped = faiss.IndexIDMap2(inner)
+    if index.ntotal:
+        wrapped.add_with_ids(reconstruct_all(index), np.arange(index.ntotal, dtype=np.int64))
+    return wrapped
+
+def stored_ids(index: faiss.Index) -> np.ndarray:
+    """Ids of the stored vectors, in the order ``reconstruct_all`` returns them."""
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.vector_to_array(index.id_map).astype(np.int64)
+    ivf = _ivf(index)
+    if ivf is None:
+        return np.arange(index.ntotal, dtype=np.int64)
+    invlists = ivf.invlists
+    ids = [faiss.rev_swig_ptr(invlists.get_ids(list_no), invlists.list_size(list_no)).copy()
+           for list_no in range(ivf.nlist) if invlists.list_size(list_no)]
+    return np.concatenate(ids).astype(np.int64) if ids else np.empty(0, dtype=np.int64)
+
+def search_params(index: faiss.Index, selector: faiss.IDSelector, nprobe: int,
+                  ef_search: int) -> faiss.SearchParameters:
+    """
+    Per-query parameters restricting a search to ``selector``; keeps the index's
+    nprobe/efSearch.
+    """
+    if _ivf(index) is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=int(nprobe))
+    if index_type_of(index) == "hnsw":
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=int(ef_search))
+    return faiss.SearchParameters(sel=selector)
+
+def read_index_mmap(path: str) -> faiss.Index:
+    """
+    Open an index file read-only with its vector storage memory-mapped, so processes share the
+    page cache.
+    """
+    return faiss.read_index(path, faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+
+def reconstruct_all(index: faiss.Index) -> np.ndarray:
+    """Return every stored vector (approximate for PQ indexes, which keep only codes)."""
+    if isinstance(index, faiss.IndexIDMap):
+        index = faiss.downcast_index(index.index)
+    if index.ntotal == 0:
+        return np.empty((0, index.d), dtype=np.float32)
+    ivf = _ivf(index)
+    if ivf is None:
+        return index.reconstruct_n(0, index.ntotal)
+    # IVF ids need not be sequential once vectors have been removed, so look them up by id
+    ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+    try:
+        return index.reconstruct_batch(stored_ids(index))
+    finally:
+        ivf.set_direct_map_type(faiss.DirectMap.NoMap)
+
+def train_index(index: faiss.Index, vectors: np.ndarray, nlist: int = 1024, seed: int = 1234):
+    if index.is_trained:
+        return
+    max_train = 256 * nlist
+    if len(vectors) > max_train:
+        sample = np.random.default_rng(seed).choice(len(vectors), max_train, replace=False)
+        vectors = vectors[np.sort(sample)]
+    index.train(np.ascontiguousarray(vectors, dtype=np.float32))
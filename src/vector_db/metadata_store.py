@@ -0,0 +1,250 @@
+import json
+import os
+import threading
+import time
+import numpy as np
+from typing import Dict, Iterator, List, Optional
+from logging_utils.logger import setup_logger
+from utils.timestamps import to_epoch_ms
+
+class MetadataStore:
+    """
+    Log metadata keyed by FAISS row id, materialized one row at a time.
+
+    The JSON-lines journal stays the source of truth; four sidecar files index it:
+    - ``<journal>.offsets``: int64 end offset of every row, memory-mapped
+    - ``<journal>.codes``: int32 code per row for each of ``INTERNED_FIELDS``, memory-mapped
+    - ``<journal>.times``: int64 epoch ms of every row's log timestamp (or of its insert),
+      memory-mapped
+    - ``<journal>.vocab``: the interned strings, one ``[field, value]`` JSON pair per line
+
+    Only the rows a caller asks for are read and decoded. Interned fields are filled in from
+    the vocab, so materialized rows share one string object per distinct value, and the codes and
+    times let callers filter on those fields without touching the journal. Sidecars are rebuilt from
+    the journal when missing or behind it, e.g. for journals written before they existed or
+    after a crash between the journal append and the sidecar update.
+
+    ``read_only`` stores (dashboard workers) never write: they map whatever the writer has
+    published and read the vocab last, so every mapped code has its string.
+    """
+
+    INTERNED_FIELDS = ("container_name", "namespace_name", "level")
+
+    def __init__(self, journal_path: str, read_only: bool = False):
+        self._fd = None
+        self.logger = setup_logger()
+        self.journal_path = journal_path
+        self.offsets_path = journal_path + ".offsets"
+        self.codes_path = journal_path + ".codes"
+        self.vocab_path = journal_path + ".vocab"
+        self.times_path = journal_path + ".times"
+        self.vocab = {field: [] for field in self.INTERNED_FIELDS}
+        self._vocab_ids = {field: {} for field in self.INTERNED_FIELDS}
+        self._lock = threading.Lock()
+        self.read_only = read_only
+        if read_only:
+            self._map()
+            self._load_vocab()
+            return
+        self._load_vocab()
+        self._map()
+        self._catch_up()
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __getitem__(self, idx: int) -> Dict:
+        if not 0 <= idx < len(self._offsets):
+            raise IndexError(idx)
+        start = int(self._offsets[idx - 1]) if idx else 0
+        end = int(self._offsets[idx])
+        if self._fd is None:
+            with self._lock:
+                if self._fd is None:
+                    self._fd = os.open(self.journal_path, os.O_RDONLY)
+        row = json.loads(os.pread(self._fd, end - start, start))
+        for col, field in enumerate(self.INTERNED_FIELDS):
+            code = self._codes[idx, col]
+            if code >= 0:
+                row[field] = self.vocab[field][code]
+        return row
+
+    def __iter__(self) -> Iterator[Dict]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def get_many(self, ids) -> List[Dict]:
+        return [self[int(idx)] for idx in ids]
+
+    def codes(self, field: str) -> np.ndarray:
+        """Per-row vocab code of an interned field (-1 where the row has none)."""
+        return self._codes[:, self.INTERNED_FIELDS.index(field)]
+
+    def code_of(self, field: str, value) -> Optional[int]:
+        """Vocab code of ``value`` for an interned field, or None if no row has that value."""
+        return self._vocab_ids[field].get(str(value))
+
+    @property
+    def times(self) -> np.ndarray:
+        """Per-row epoch ms of the log timestamp, falling back to when the row was stored."""
+        return self._times
+
+    @staticmethod
+    def _row_time(row: Dict) -> int:
+        ms = to_epoch_ms(row.get("timestamp"))
+        return ms if ms is not None else int(time.time() * 1000)
+
+    def _load_vocab(self):
+        if not os.path.exists(self.vocab_path):
+            return
+        size = 0
+        with open(self.vocab_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                field, value = json.loads(line)
+                self._vocab_ids[field][value] = len(self.vocab[field])
+                self.vocab[field].append(value)
+                size += len(line)
+        if os.path.getsize(self.vocab_path) != size and not self.read_only:
+            self._truncate_file(self.vocab_path, size)
+
+    def _map(self):
+        rows = min(self._file_rows(self.offsets_path, 8),
+                   self._file_rows(self.codes_path, 4 * len(self.INTERNED_FIELDS)),
+                   self._file_rows(self.times_path, 8))
+        self._offsets = self._memmap(self.offsets_path, np.int64, (rows,))
+        self._codes = self._memmap(self.codes_path, np.int32, (rows, len(self.INTERNED_FIELDS)))
+        self._times = self._memmap(self.times_path, np.int64, (rows,))
+
+    @staticmethod
+    def _file_rows(path: str, row_size: int) -> int:
+        return os.path.getsize(path) // row_size if os.path.exists(path) else 0
+
+    @staticmethod
+    def _memmap(path: str, dtype, shape):
+        if shape[0] == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+    def _catch_up(self):
+        journal_size = 0
+        if os.path.exists(self.journal_path):
+            journal_size = os.path.getsize(self.journal_path)
+        rows = len(self._offsets)
+        # Drop index rows that point past the end of the journal
+        if rows and self._offsets[rows - 1] > journal_size:
+            rows = int(np.searchsorted(self._offsets, journal_size, side="right"))
+        self._resize_sidecars(rows)
+        pos = int(self._offsets[rows - 1]) if rows else 0
+        if pos >= journal_size:
+            return
+        offsets, codes, times = [], [], []
+        with open(self.journal_path, "rb") as f:
+            f.seek(pos)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    break
+                pos += len(line)
+                offsets.append(pos)
+                codes.append(self._encode(row))
+                times.append(self._row_time(row))
+        if offsets:
+            self.logger.info(f"Indexed {len(offsets)} metadata rows from {self.journal_path}")
+            self._append_sidecars(offsets, codes, times)
+
+    def _encode(self, row: Dict) -> List[int]:
+        codes = []
+        new_values = []
+        for field in self.INTERNED_FIELDS:
+            value = row.get(field)
+            if value is None:
+                codes.append(-1)
+                continue
+            value = str(value)
+            code = self._vocab_ids[field].get(value)
+            if code is None:
+                code = len(self.vocab[field])
+                self._vocab_ids[field][value] = code
+                self.vocab[field].append(value)
+                new_values.append((field, value))
+            codes.append(code)
+        if new_values:
+            with open(self.vocab_path, "ab") as f:
+                f.write("".join(json.dumps(pair) + "\n" for pair in new_values).encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+        return codes
+
+    def _append_sidecars(self, offsets: List[int], codes: List[List[int]], times: List[int]):
+        with open(self.codes_path, "ab") as f:
+            f.write(np.asarray(codes, dtype=np.int32).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self.times_path, "ab") as f:
+            f.write(np.asarray(times, dtype=np.int64).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self.offsets_path, "ab") as f:
+            f.write(np.asarray(offsets, dtype=np.int64).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        self._map()
+
+    def _resize_sidecars(self, rows: int):
+        self._truncate_file(self.offsets_path, rows * 8)
+        self._truncate_file(self.codes_path, rows * 4 * len(self.INTERNED_FIELDS))
+        self._truncate_file(self.times_path, rows * 8)
+        self._map()
+
+    @staticmethod
+    def _truncate_file(path: str, size: int):
+        if not os.path.exists(path):
+            if size == 0:
+                return
+            open(path, "wb").close()
+        if os.path.getsize(path) == size:
+            return
+        with open(path, "r+b") as f:
+            f.truncate(size)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def append(self, rows: List[Dict]):
+        with self._lock:
+            pos = int(self._offsets[-1]) if len(self._offsets) else 0
+            lines, offsets, codes, times = [], [], [], []
+            for row in rows:
+                codes.append(self._encode(row))
+                times.append(self._row_time(row))
+                line = (json.dumps(row, default=str) + "\n").encode("utf-8")
+                pos += len(line)
+                lines.append(line)
+                offsets.append(pos)
+            with open(self.journal_path, "ab") as f:
+                f.write(b"".join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+            self._append_sidecars(offsets, codes, times)
+
+    def truncate(self, rows: int):
+        """Drop every row from ``rows`` onwards (used to discard uncommitted inserts)."""
+        with self._lock:
+            rows = min(rows, len(self._offsets))
+            size = int(self._offsets[rows - 1]) if rows else 0
+            self._resize_sidecars(rows)
+            # Also drops a torn trailing line left by an interrupted append
+            self._truncate_file(self.journal_path, size)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __del__(self):
+        # Read-only stores are swapped out on reload rather than closed
+        self.close()
@@ -0,0 +1,338 @@
+import datetime
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from logging_utils.logger import setup_logger
+from src.config import get_config
+from vector_db.faiss_db import FaissVectorDB, merge_top_k, nearest_distances, over_cap
+from embedding.embedded_batch import EmbeddedBatch
+from utils.timestamps import to_epoch_ms
+
+SHARD_FIELDS = {"namespace": "namespace_name", "container": "container_name"}
+TIME_BUCKETS = ("day", "week", "month")
+# Global ids are (shard << ROW_BITS) | row id within the shard
+ROW_BITS = 40
+
+def time_bucket(ms: Optional[int], granularity: str) -> str:
+    # Logs without a usable timestamp go to the current bucket, matching the metadata's
+    # insert-time fallback
+    when = datetime.datetime.now(datetime.timezone.utc) if ms is None else \
+        datetime.datetime.fromtimestamp(ms / 1000, tz=datetime.timezone.utc)
+    if granularity == "day":
+        return when.strftime("%Y-%m-%d")
+    if granularity == "week":
+        year, week, _ = when.isocalendar()
+        return f"{year}-W{week:02d}"
+    return when.strftime("%Y-%m")
+
+def bucket_range(bucket: str, granularity: str) -> Tuple[int, int]:
+    """``[start, end)`` of a time bucket in epoch ms."""
+    if granularity == "day":
+        start = datetime.datetime.strptime(bucket, "%Y-%m-%d")
+        end = start + datetime.timedelta(days=1)
+    elif granularity == "week":
+        year, week = bucket.split("-W")
+        start = datetime.datetime.fromisocalendar(int(year), int(week), 1)
+        end = start + datetime.timedelta(weeks=1)
+    else:
+        start = datetime.datetime.strptime(bucket, "%Y-%m")
+        end = (start + datetime.timedelta(days=32)).replace(day=1)
+    return _utc_ms(start), _utc_ms(end)
+
+def _utc_ms(when: datetime.datetime) -> int:
+    return int(when.replace(tzinfo=datetime.timezone.utc).timestamp() * 1000)
+
+class ShardedVectorDB:
+    """
+    ``FaissVectorDB`` shards partitioned by namespace and/or container (``FAISS_SHARD_BY``) and by
+    log time bucket (``FAISS_SHARD_TIME_BUCKET``: day, week or month), under ``FAISS_SHARD_DIR``.
+
+    ``shards.json`` maps every shard number to its key; shard numbers are stable, so global ids
+    (shard number and row id packed into one int64) stay valid across restarts. A filtered search
+    only opens and scans the shards whose key matches the filters, in parallel on up to
+    ``FAISS_SEARCH_THREADS`` threads, and merges their top-k by distance; the remaining filters are
+    applied inside each shard through its metadata sidecars.
+
+    ``FAISS_NAMESPACE_MAX_VECTORS`` caps a namespace across all of its shards: retention keeps its
+    newest rows wherever they are stored, so older time buckets empty first.
+
+    With ``read_only=True`` every shard is opened read-only, and the manifest is re-read whenever
+    the writer changes it, so readers pick up shards created after they started.
+    """
+
+    def __init__(self, shard_dir: Optional[str] = None, shard_by: Optional[str] = None,
+                 time_granularity: Optional[str] = None, search_threads: Optional[int] = None,
+                 **shard_args):
+        self.logger = setup_logger()
+        self.db_path = shard_dir or get_config("FAISS_SHARD_DIR", default="faiss_shards")
+        if shard_by is None:
+            shard_by = get_config("FAISS_SHARD_BY", default="namespace")
+        self.fields = [SHARD_FIELDS[name.strip()] for name in shard_by.split(",") if name.strip()]
+        self.granularity = (time_granularity if time_granularity is not None
+                            else get_config("FAISS_SHARD_TIME_BUCKET", default="month")).lower()
+        if self.granularity and self.granularity not in TIME_BUCKETS:
+            raise ValueError(f"Unknown FAISS_SHARD_TIME_BUCKET '{self.granularity}', "
+                             f"expected one of {', '.join(TIME_BUCKETS)}")
+        self.shard_args = shard_args
+        namespace_max_vectors = shard_args.get("namespace_max_vectors")
+        self.namespace_max_vectors = int(namespace_max_vectors if namespace_max_vectors is not None
+                                         else get_config("FAISS_NAMESPACE_MAX_VECTORS", default=0))
+        self.retention_interval = float(get_config("FAISS_RETENTION_INTERVAL", default=3600))
+        self._retention_checked = None
+        self.manifest_path = os.path.join(self.db_path, "shards.json")
+        self._lock = threading.RLock()
+        self._shards: Dict[int, FaissVectorDB] = {}
+        self.keys: Dict[int, Dict[str, str]] = {}
+        self.read_only = bool(shard_args.get("read_only"))
+        self._manifest_mtime = None
+        if not self.read_only:
+            os.makedirs(self.db_path, exist_ok=True)
+        self._load_manifest()
+        search_threads = int(search_threads or get_config("FAISS_SEARCH_THREADS", default=4))
+        self.pool = ThreadPoolExecutor(max_workers=search_threads, thread_name_prefix="faiss-shard")
+        partitions = ", ".join(self.fields) or "nothing"
+        if self.granularity:
+            partitions += f" and {self.granularity}"
+        self.logger.info(f"Sharded FAISS store {self.db_path}: {len(self.keys)} shards by "
+                         f"{partitions}")
+
+    def _load_manifest(self):
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime is None or mtime == self._manifest_mtime:
+            self._key_ids = {self._key_tuple(key): shard for shard, key in self.keys.items()}
+            return
+        with open(self.manifest_path, "r") as f:
+            keys = {int(shard): key for shard, key in json.load(f).items()}
+        with self._lock:
+            self.keys = keys
+            self._key_ids = {self._key_tuple(key): shard for shard, key in keys.items()}
+            self._manifest_mtime = mtime
+
+    @staticmethod
+    def _key_tuple(key: Dict[str, str]) -> Tuple:
+        return tuple(sorted(key.items()))
+
+    def shard_key(self, log: Dict) -> Dict[str, str]:
+        key = {field: str(log.get(field) or "") for field in self.fields}
+        if self.granularity:
+            key["bucket"] = time_bucket(to_epoch_ms(log.get("timestamp")), self.granularity)
+        return key
+
+    def _shard_path(self, shard: int) -> str:
+        key = self.keys[shard]
+        # Readable prefix for operators, hash suffix so distinct keys never collide
+        label = re.sub(r"[^A-Za-z0-9_.-]+", "_", "-".join(key.values()))[:60] or "default"
+        digest = hashlib.sha1(json.dumps(self._key_tuple(key)).encode("utf-8")).hexdigest()[:8]
+        return os.path.join(self.db_path, f"{shard:05d}_{label}_{digest}", "faiss_index.bin")
+
+    def _save_manifest(self):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({str(shard): key for shard, key in self.keys.items()}, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        FaissVectorDB._fsync_replace(tmp_path, self.manifest_path)
+
+    def _shard_id(self, key: Dict[str, str], create: bool = False) -> Optional[int]:
+        with self._lock:
+            shard = self._key_ids.get(self._key_tuple(key))
+            if shard is None and create:
+                shard = max(self.keys, default=-1) + 1
+                self.keys[shard] = key
+                self._key_ids[self._key_tuple(key)] = shard
+                self._save_manifest()
+            return shard
+
+    def shard(self, shard: int) -> FaissVectorDB:
+        with self._lock:
+            db = self._shards.get(shard)
+            if db is None:
+                path = self._shard_path(shard)
+                if not self.read_only:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                db = FaissVectorDB(db_path=path, **self.shard_args)
+                self._shards[shard] = db
+            return db
+
+    def _group(self, logs: List[Dict], create: bool = False) -> Dict[Optional[int], List[int]]:
+        groups: Dict[Optional[int], List[int]] = {}
+        for i, log in enumerate(logs):
+            groups.setdefault(self._shard_id(self.shard_key(log), create), []).append(i)
+        return groups
+
+    def matching_shards(self, filters: Optional[Dict[str, Any]] = None) -> List[int]:
+        """Shards whose key can hold rows matching ``filters``."""
+        filters = filters or {}
+        since = to_epoch_ms(filters["since"]) if filters.get("since") is not None else None
+        until = to_epoch_ms(filters["until"]) if filters.get("until") is not None else None
+        shards = []
+        for shard, key in sorted(self.keys.items()):
+            if any(filters.get(field) is not None and key.get(field) != str(filters[field])
+                   for field in self.fields):
+                continue
+            if "bucket" in key and (since is not None or until is not None):
+                start, end = bucket_range(key["bucket"], self.granularity)
+                if (since is not None and end <= since) or (until is not None and start > until):
+                    continue
+            shards.append(shard)
+        return shards
+
+    def add_logs(self, logs) -> int:
+        """Insert logs into their shards; returns the number of duplicates skipped."""
+        if not len(logs):
+            return 0
+        batch = EmbeddedBatch.from_logs(logs)
+        groups = self._group(batch.logs, create=True)
+        skipped = sum(self.shard(shard).add_logs(batch.select(rows))
+                      for shard, rows in groups.items())
+        # Shards apply the cap on their own rows; the namespace-wide cap runs here
+        checked = self._retention_checked
+        if self.namespace_max_vectors > 0 and (
+                checked is None or time.monotonic() - checked >= self.retention_interval):
+            self._enforce_namespace_cap()
+        return skipped
+
+    def drop_known(self, logs: List[Dict]) -> Tuple[List[Dict], int]:
+        keep = []
+        for shard, rows in self._group(logs).items():
+            group = [logs[i] for i in rows]
+            if shard is None:
+                # No shard for this key yet, so nothing in it is stored; repeats within the batch
+                # still go
+                seen = set()
+                for i in rows:
+                    digest = FaissVectorDB.content_digest(logs[i])
+                    if digest not in seen:
+                        seen.add(digest)
+                        keep.append(i)
+                continue
+            fresh, _ = self.shard(shard).drop_known(group)
+            fresh_ids = {id(log) for log in fresh}
+            keep.extend(i for i in rows if id(logs[i]) in fresh_ids)
+        keep.sort()
+        return [logs[i] for i in keep], len(logs) - len(keep)
+
+    def search_batch(self, queries, k: int = 5,
+                     filters: Optional[Dict[str, Any]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Fan the search out to the matching shards and merge their top-k; ids are global."""
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries.reshape(1, -1)
+        self.maybe_reload()
+        shards = self.matching_shards(filters)
+        # Shard keys already satisfy the namespace/container filters, so shards only apply the
+        # rest
+        residual = {f: v for f, v in (filters or {}).items() if f not in self.fields} or None
+
+        def search_shard(shard):
+            D, ids = self.shard(shard).search_batch(queries, k, residual)
+            return D, np.where(ids >= 0, (np.int64(shard) << ROW_BITS) | ids, -1)
+        if len(shards) > 1:
+            results = list(self.pool.map(search_shard, shards))
+        else:
+            results = [search_shard(shard) for shard in shards]
+        return merge_top_k(results, k, len(queries))
+
+    def maybe_reload(self):
+        """Read-only mode: pick up new shards and reload the open ones the writer has changed."""
+        if not self.read_only:
+            return
+        self._load_manifest()
+        with self._lock:
+            shards = list(self._shards.values())
+        for db in shards:
+            db.maybe_reload()
+
+    def set_search_params(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+        """Tune every open shard; shards opened later get the same parameters."""
+        with self._lock:
+            if nprobe is not None:
+                self.shard_args["nprobe"] = nprobe
+            if ef_search is not None:
+                self.shard_args["ef_search"] = ef_search
+            shards = list(self._shards.values())
+        for db in shards:
+            db.set_search_params(nprobe, ef_search)
+
+    @property
+    def ntotal(self) -> int:
+        return sum(self.shard(shard).ntotal for shard in sorted(self.keys))
+
+    def novelty_scores(self, queries) -> np.ndarray:
+        return nearest_distances(*self.search_batch(queries, k=1))
+
+    def get_rows(self, ids, distances=None) -> List[Dict[str, Any]]:
+        results = []
+        for pos, gid in enumerate(ids):
+            gid = int(gid)
+            if gid < 0 or (gid >> ROW_BITS) not in self.keys:
+                continue
+            row_distances = None if distances is None else [distances[pos]]
+            rows = self.shard(gid >> ROW_BITS).get_rows([gid & ((1 << ROW_BITS) - 1)],
+                                                        row_distances)
+            results.extend(rows)
+        return results
+
+    def search(self, query_emb: List[float], k: int = 5,
+               filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        D, ids = self.search_batch(query_emb, k, filters)
+        if not ids.shape[1]:
+            return []
+        return self.get_rows(ids[0], D[0])
+
+    def _each_shard(self, method: str) -> int:
+        return sum(getattr(self.shard(shard), method)() or 0 for shard in sorted(self.keys))
+
+    def _enforce_namespace_cap(self) -> int:
+        self._retention_checked = time.monotonic()
+        if len(self.keys) < 2:
+            return 0
+        parts = [(shard, *self.shard(shard).live_rows()) for shard in sorted(self.keys)]
+        shards = np.concatenate([np.full(len(ids), shard) for shard, ids, _, _ in parts])
+        ids = np.concatenate([ids for _, ids, _, _ in parts])
+        times = np.concatenate([times for _, _, times, _ in parts])
+        namespaces = np.concatenate([names for _, _, _, names in parts])
+        over = over_cap(namespaces, times, self.namespace_max_vectors)
+        deleted = sum(self.shard(int(shard)).delete(ids[over][shards[over] == shard])
+                      for shard in np.unique(shards[over]))
+        if deleted:
+            self.logger.info(f"Namespace cap removed {deleted} vectors across shards.")
+        return deleted
+
+    def enforce_retention(self) -> int:
+        deleted = self._each_shard("enforce_retention")
+        if self.namespace_max_vectors > 0:
+            deleted += self._enforce_namespace_cap()
+        return deleted
+
+    def rebuild(self) -> int:
+        return self._each_shard("rebuild")
+
+    def compact(self):
+        self._each_shard("compact")
+
+    def close(self):
+        with self._lock:
+            for db in self._shards.values():
+                db.close()
+            self._shards.clear()
+        self.pool.shutdown(wait=True)
+
+def open_vector_db(db_path: Optional[str] = None, **kwargs):
+    """
+    The pipeline's vector store: a ``ShardedVectorDB`` when ``FAISS_SHARDING=true`` (``db_path``
+    is then the shard directory), else one ``FaissVectorDB``. Other arguments go to every
+    FaissVectorDB.
+    """
+    if get_config("FAISS_SHARDING", default="false").lower() == "true":
+        return ShardedVectorDB(shard_dir=db_path, **kwargs)
+    return FaissVectorDB(db_path=db_path, **kwargs)